@@ -0,0 +1,63 @@
+from typing import Any, Hashable, Callable
+from collections import OrderedDict
+from time import monotonic
+
+
+MISSING = object()
+
+
+class TTLCache:
+    '''
+        Process wide cache with a time to live and least recently used eviction.
+
+        Parameters
+        ----------
+        maxsize: the maximum number of entries, the least recently used one is evicted first.
+        ttl: the number of seconds an entry is kept after it was set.
+
+        Notes
+        --------
+        The consumers handle one message at a time so there is no locking.
+    '''
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.get(key, MISSING)
+        if entry is MISSING:
+            return default
+        value, expires = entry
+        if expires <= monotonic():
+            del self.entries[key]
+            return default
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.entries[key] = (value, monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            value = load()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable = MISSING) -> None:
+        ''' removes one key, or everything when no key is given '''
+        if key is MISSING:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, MISSING) is not MISSING
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,12 @@
+from data_processing.cache.cache import TTLCache
+import os
+
+
+# Production cycle metadata that changes rarely but is read on every message: round start days, robot observable permissions
+# and observable precisions. The env is loaded by the controllers before this module is imported.
+# The round, robot_observable and observable tables are edited by the backend and not by these consumers, so nothing here can
+# invalidate an entry: an edited production cycle (a new start day, an observable taken from a robot, a new precision) is seen by
+# a consumer once its entry expires, at most metadata_cache_ttl seconds later. A robot that is not allowed an observable is
+# never cached, so granting it one is seen right away.
+METADATA_CACHE = TTLCache(int(os.getenv("metadata_cache_size", 4096)), float(os.getenv("metadata_cache_ttl", 3600)))
+
@@ -1,17 +1,20 @@
 from data_processing.db_connection.connection import DbConnection
+from data_processing.db_connection.bulk_upsert import UPSERT_MODE
 from data_processing.controller.factories.data_processing import read_data_processing_exporter
 import logging
 from data_processing.event_handlers.event_callables import db_events, email_events, rabbitmq_events, s3_events
 from data_processing.event_handlers.event_handler import register_event, trigger_event
 from data_processing.event_handlers.events import Events
-from data_processing.event_handlers.rabbitmq.rabbitmq import RabbitMq
-from typing import TextIO, Union
+from data_processing.event_handlers.rabbitmq.rabbitmq import RabbitMq, flush_publishers
+from typing import TextIO, Union, List
 import sys
 import os
 from datetime import datetime
 import json
 import tempfile
 import pika
+from dotenv import load_dotenv
+load_dotenv()
 
 logging.basicConfig(filename='/var/log/py/log',
                     filemode='a',
@@ -19,6 +22,10 @@ logging.basicConfig(filename='/var/log/py/log',
                     datefmt='%H:%M:%S',
                     level=logging.DEBUG)
 
+# Payloads bigger than this many bytes are written to a temporary file instead of being parsed from memory
+MAX_IN_MEMORY_PAYLOAD = int(os.getenv("max_in_memory_payload", 64 * 1024 * 1024))
+# Process every file in chunks with bounded memory, otherwise only the files spilled to disk are
+STREAMING_INGEST = os.getenv("streaming_ingest", "0") == "1"
 
 '''
     This class instantiates the data processing class and injects the dependencies into it
@@ -39,17 +46,31 @@ def main() -> None:
 
 def callback(ch, method, properties, body) -> None:
     message = json.loads(body)
-    temp = tempfile.NamedTemporaryFile(mode='w+t', delete=True)
-    try:
-        temp.writelines(message['file_content'])
-        temp.seek(0)
-        data_processing(ch, method, temp.name, message['roundId'], message['robotId'], message['observableName'], message['observableId'], message['dimension']['dimX'], message['dimension']['dimY'], message['type'], message['dataFile'])
-    finally:
-        temp.close()
+    payload = get_payload(message.pop('file_content'))
+    # Parse straight from memory and only spill to disk when the payload is too big to keep around, big files are then read in chunks
+    if len(payload) > MAX_IN_MEMORY_PAYLOAD:
+        temp = tempfile.NamedTemporaryFile(mode='w+b', delete=True)
+        try:
+            temp.write(payload)
+            temp.flush()
+            del payload
+            data_processing(ch, method, temp.name, message['roundId'], message['robotId'], message['observableName'], message['observableId'], message['dimension']['dimX'], message['dimension']['dimY'], message['type'], message['dataFile'], streaming=True)
+        finally:
+            temp.close()
+    else:
+        data_processing(ch, method, memoryview(payload), message['roundId'], message['robotId'], message['observableName'], message['observableId'], message['dimension']['dimX'], message['dimension']['dimY'], message['type'], message['dataFile'])
     
     print(f" [x] Received {message['observableName']} for robot: {message['robotId']} and round: {message['roundId']}")
-def data_processing(ch: pika.BlockingConnection.channel, method, file: Union[str, TextIO], round_id: str, robot_id: str, observable_name: str, observable_id: str, x_dim: int, y_dim: int, type_: str, s3_path: str) -> None:
-    cnx = DbConnection().connect_to_db()
+
+def get_payload(file_content: Union[str, List[str]]) -> bytes:
+    ''' file content is sent either as one string or as a list of lines like the ones temp.writelines used to take '''
+    if isinstance(file_content, list):
+        file_content = ''.join(file_content)
+    return file_content.encode()
+
+def data_processing(ch: pika.BlockingConnection.channel, method, file: Union[str, TextIO, memoryview], round_id: str, robot_id: str, observable_name: str, observable_id: str, x_dim: int, y_dim: int, type_: str, s3_path: str, streaming: bool = STREAMING_INGEST) -> None:
+    # only the bulk upsert mode loads local files
+    cnx = DbConnection(local_infile=UPSERT_MODE == "bulk").connect_to_db()
     log = logging.getLogger('data_processing')
     p = read_data_processing_exporter(type_)
     processor = p.get_exporter(
@@ -67,14 +88,19 @@ def data_processing(ch: pika.BlockingConnection.channel, method, file: Union[str
     msg = f"Data processing for {observable_name} for {round_id}  initiated."
     log.info(msg)
     try:
-        df = processor.read_file()
-        df = processor.parse_data(df)
+        if streaming:
+            df = processor.parse_data_streaming(processor.read_file_chunks())
+        else:
+            df = processor.read_file()
+            df = processor.parse_data(df)
         df = df.values.tolist()
         params = {"round_number": df[-1][3], 'day': df[-1][7], 'time': datetime.strptime(df[-1][5], "%Y-%m-%d %H:%M:%S")}
         events = processor.check_events(params)
         processor.upsert(df)
-        processor.post_time_events(**events)
+        processor.post_time_events(df, **events)
         processor.post_derived_observables()
+        # the events have to reach the broker before the file is acknowledged
+        flush_publishers()
         print("worked should acknowledge", method.delivery_tag)
         ch.basic_ack(delivery_tag=method.delivery_tag)
     except Exception as e:
@@ -84,12 +110,13 @@ def data_processing(ch: pika.BlockingConnection.channel, method, file: Union[str
         ch.basic_nack(delivery_tag=method.delivery_tag)
     finally:
         trigger_event(Events.FILE_UPLOADED, { "round_id": round_id, "object_name": s3_path, "observable_id": observable_id, "file": file, 'cnx': cnx})
-        cnx.close()
+        DbConnection().close_cnx(cnx)
 
 
 def register_events() -> None:
     register_event(Events.INVALID_ROUND, db_events.invalid_alert)
     register_event(Events.SUSPICIOUS_DATA, email_events.suspicious_data)
+    register_event(Events.FRONTEND, rabbitmq_events.trigger_frontend_events)
     register_event(Events.LATEST, rabbitmq_events.trigger_time_events)
     register_event(Events.NEW_ROUND, rabbitmq_events.trigger_time_events)
     register_event(Events.NEW_NEW_DAY, rabbitmq_events.trigger_time_events)
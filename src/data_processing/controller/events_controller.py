@@ -1,10 +1,11 @@
 from data_processing.db_connection.connection import DbConnection
+from data_processing.db_connection.bulk_upsert import UPSERT_MODE
 from data_processing.controller.factories.events import read_events_exporter
 import logging
 from data_processing.event_handlers.event_callables import db_events, email_events, rabbitmq_events, s3_events
 from data_processing.event_handlers.event_handler import register_event, trigger_event
 from data_processing.event_handlers.events import Events
-from data_processing.event_handlers.rabbitmq.rabbitmq import RabbitMq
+from data_processing.event_handlers.rabbitmq.rabbitmq import RabbitMq, flush_publishers
 from typing import TextIO, Union
 import sys
 import os
@@ -43,7 +44,8 @@ def callback(ch, method, properties, body) -> None:
     
     print(f" [x] Received {message['observableName']} for robot: {message['robotId']} and round: {message['roundId']}")
 def event_processing(ch: pika.BlockingConnection.channel, method, event_type: str, round_id: str, robot_id: str, observable_name: str, x_dim: str, y_dim: str, type_: str) -> None:
-    cnx = DbConnection().connect_to_db()
+    # the derived observables are written with upsert_rows, the only ones loading local files in the bulk upsert mode
+    cnx = DbConnection(local_infile=UPSERT_MODE == "bulk" and event_type == Events.DERIVED_OBSERVABLE.name).connect_to_db()
     log = logging.getLogger('events')
 
     # Trick to get the factory to configure derived observables well
@@ -76,8 +78,17 @@ def event_processing(ch: pika.BlockingConnection.channel, method, event_type: st
         log.exception(e)
         print(e, "didn't work should nack", method.delivery_tag)
     finally:
-        ch.basic_ack(delivery_tag=method.delivery_tag)
-        cnx.close()
+        # a failed flush is logged, the message is still acknowledged and the connection released
+        try:
+            flush_publishers()
+        except Exception as e:
+            log.exception(e)
+            print(e, "events could not be flushed", method.delivery_tag)
+        finally:
+            try:
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+            finally:
+                DbConnection().close_cnx(cnx)
 
 
 def register_events() -> None:
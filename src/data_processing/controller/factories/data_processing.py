@@ -2,8 +2,9 @@ from abc import ABC, abstractmethod
 from typing import List, Tuple, Union, Callable, Any, Dict, TextIO
 from data_processing.data_cleaning.data_processing import DataProcessing, DataProcessingAmbientCondition, DataProcessingAnomaly
 from data_processing.production_cycle_details.production_cycle_details import PCDetails
-from data_processing.data_processing_events.data_processing_events import DPEvents
-from data_processing.download.download import DownloadMainTablePandas
+from data_processing.data_processing_events.data_processing_events import DPEvents, EVENT_STATE_CACHE
+from data_processing.download.download import DownloadCellState
+from data_processing.controller.factories.events import read_window_events_exporter
 
 class DataProcessingFactories(ABC):
 
@@ -15,13 +16,15 @@ class DataProcessingFactories(ABC):
 class ExportAmbientConditions(DataProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadMainTablePandas(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadCellState(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'], state_cache=EVENT_STATE_CACHE)
+        window_events = read_window_events_exporter(kwargs['type_']).get_exporter(pc_details=pc_details, data_events=data_events, **kwargs)
         return DataProcessingAmbientCondition(
                                     download=download, 
                                     pc_details=pc_details, 
                                     data_events=data_events,
+                                    window_events=window_events,
                                     **kwargs
                                     )
 
@@ -29,13 +32,15 @@ class ExportAmbientConditions(DataProcessingFactories):
 class ExportAnomaly(DataProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadMainTablePandas(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadCellState(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'], state_cache=EVENT_STATE_CACHE)
+        window_events = read_window_events_exporter(kwargs['type_']).get_exporter(pc_details=pc_details, data_events=data_events, **kwargs)
         return DataProcessingAnomaly(
                                     download=download, 
                                     pc_details=pc_details, 
                                     data_events=data_events,
+                                    window_events=window_events,
                                     **kwargs
                                     )
 
@@ -4,12 +4,13 @@ from data_processing.data_cleaning.data_processing import DataProcessing, DataPr
 from data_processing.production_cycle_details.production_cycle_details import PCDetails
 from data_processing.data_processing_events.data_processing_events import DPEvents
 from data_processing.data_processing_events.derived_observables_processing import DerivedObservablesProcessing
-from data_processing.download.download import DownloadMainTablePandas, DownloadRound, DownloadNewDayAmbientCondition, DownloadNewDayAnomaly, DownloadTimeofDayAmbientCondition, DownloadTimeofDayAnomaly, DownloadHourlyOverviewAmbientCondition, DownloadHourlyOverviewAnomaly, DownloadLatest 
+from data_processing.download.download import DownloadMainTablePandas, DownloadLatest, DownloadRoundData, DownloadHourlyAccumulators
 from data_processing.internal_events.latest import LatestEventAmbientConditions, LatestEventAnomaly
 from data_processing.internal_events.new_day import NewDayEventAmbientConditions, NewDayEventAnomaly
 from data_processing.internal_events.round import RoundEventAmbientConditions, RoundEventAnomaly
 from data_processing.internal_events.time_of_day import TimeofDayEventAmbientConditions, TimeofDayEventAnomaly
 from data_processing.internal_events.hourly_overview import HourlyOverviewEventAmbientConditions, HourlyOverviewEventAnomaly
+from data_processing.internal_events.window_events import WindowEvents
 from data_processing.derived_observables.derived_observables import DigestionIndex, EffectiveTemperature, Humidex, HeatStressIndex
 
 
@@ -53,7 +54,7 @@ class ExportLatestAnomaly(EventFactories):
 class ExportRoundAmbientCondition(EventFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadRound(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadRoundData(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         return RoundEventAmbientConditions(
@@ -67,7 +68,7 @@ class ExportRoundAmbientCondition(EventFactories):
 class ExportRoundAnomaly(EventFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadRound(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadRoundData(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         return RoundEventAnomaly(
@@ -81,7 +82,7 @@ class ExportRoundAnomaly(EventFactories):
 class ExportTimeofDayAmbientCondition(EventFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadTimeofDayAmbientCondition(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadRoundData(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         return TimeofDayEventAmbientConditions(
@@ -94,7 +95,7 @@ class ExportTimeofDayAmbientCondition(EventFactories):
 class ExportTimeofDayAnomaly(EventFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadTimeofDayAnomaly(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadRoundData(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         return TimeofDayEventAnomaly(
@@ -107,7 +108,7 @@ class ExportTimeofDayAnomaly(EventFactories):
 class ExportNewDayAmbientCondition(EventFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadNewDayAmbientCondition(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadRoundData(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         return NewDayEventAmbientConditions(
@@ -120,7 +121,7 @@ class ExportNewDayAmbientCondition(EventFactories):
 class ExportNewDayAnomaly(EventFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadNewDayAnomaly(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadRoundData(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         return NewDayEventAnomaly(
@@ -135,7 +136,7 @@ class ExportNewDayAnomaly(EventFactories):
 class ExportHourlyOverviewAmbientCondition(EventFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadHourlyOverviewAmbientCondition(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadHourlyAccumulators(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         return HourlyOverviewEventAmbientConditions(
@@ -148,7 +149,7 @@ class ExportHourlyOverviewAmbientCondition(EventFactories):
 class ExportHourlyOverviewAnomaly(EventFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
-        download = DownloadHourlyOverviewAnomaly(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
+        download = DownloadHourlyAccumulators(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
         return HourlyOverviewEventAnomaly(
@@ -158,6 +159,42 @@ class ExportHourlyOverviewAnomaly(EventFactories):
                                     **kwargs
                                     )
 
+class ExportWindowEvents(EventFactories):
+    ''' the events aggregated by the ingest, they share its metadata and data processing events '''
+
+    def __init__(self, latest: type, round: type, new_day: type, time_of_day: type, hourly_overview: type):
+        self.latest = latest
+        self.round = round
+        self.new_day = new_day
+        self.time_of_day = time_of_day
+        self.hourly_overview = hourly_overview
+
+    def get_exporter(self, **kwargs: Dict[str, str]) -> WindowEvents:
+        cnx, round_id, observable_name = kwargs['cnx'], kwargs['round_id'], kwargs['observable_name']
+        download = DownloadRoundData(cnx, round_id, observable_name)
+        shared = dict(
+                    cnx=cnx,
+                    round_id=round_id,
+                    robot_id=kwargs['robot_id'],
+                    observable_name=observable_name,
+                    type_=kwargs['type_'],
+                    xDim=kwargs['x_dim'],
+                    yDim=kwargs['y_dim'],
+                    data_events=kwargs['data_events'],
+                    pc_details=kwargs['pc_details'],
+                    logging=kwargs['logging']
+                )
+        return WindowEvents(
+                    download=download,
+                    data_events=kwargs['data_events'],
+                    latest=self.latest(download=DownloadLatest(cnx, round_id, observable_name), **shared),
+                    round=self.round(download=download, **shared),
+                    new_day=self.new_day(download=download, **shared),
+                    time_of_day=self.time_of_day(download=download, **shared),
+                    hourly_overview=self.hourly_overview(download=DownloadHourlyAccumulators(cnx, round_id, observable_name), **shared),
+                    logging=kwargs['logging']
+                )
+
 class ExportHumidex(EventFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> DataProcessing:
@@ -213,4 +250,12 @@ def read_events_exporter(event, type_) -> EventFactories:
             "digestion_index": ExportDigestionIndex(),
         }
     }
-    return factories[event][type_]
\ No newline at end of file
+    return factories[event][type_]
+
+
+def read_window_events_exporter(type_) -> EventFactories:
+    factories = {
+        "ambient_condition": ExportWindowEvents(LatestEventAmbientConditions, RoundEventAmbientConditions, NewDayEventAmbientConditions, TimeofDayEventAmbientConditions, HourlyOverviewEventAmbientConditions),
+        "anomaly": ExportWindowEvents(LatestEventAnomaly, RoundEventAnomaly, NewDayEventAnomaly, TimeofDayEventAnomaly, HourlyOverviewEventAnomaly),
+    }
+    return factories[type_]
\ No newline at end of file
@@ -5,8 +5,6 @@ from data_processing.frontend.graph import GraphLatestAmbientCondition, GraphLat
 from data_processing.frontend.heatmap import HeatmapLatest, HeatmapNewDay, HeatmapRound, HeatmapTimeofDay
 from data_processing.frontend.hourly_overview import HourlyOverviewAmbient, HourlyOverviewAnomaly
 from data_processing.frontend.hourly import HourAmbient, HourAnomaly, DayAmbient, DayAnomaly, WeekAmbient, WeekAnomaly, MonthAmbient, MonthAnomaly
-from data_processing.production_cycle_details.production_cycle_details import PCDetails
-from data_processing.data_processing_events.data_processing_events import DPEvents
 from data_processing.event_handlers.events import Events
 
 
@@ -20,170 +18,126 @@ class FrontendProcessingFactories(ABC):
 class ExportLatestHeatmap(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return HeatmapLatest(pc_details=pc_details, data_events=data_events, **kwargs)
+        return HeatmapLatest(**kwargs)
     
 class ExportNewDayHeatmap(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return HeatmapNewDay(pc_details=pc_details, data_events=data_events, **kwargs)
+        return HeatmapNewDay(**kwargs)
     
 class ExportRoundHeatmap(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return HeatmapRound(pc_details=pc_details, data_events=data_events, **kwargs)
+        return HeatmapRound(**kwargs)
     
 class ExportTimeofDayHeatmap(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return HeatmapTimeofDay(pc_details=pc_details, data_events=data_events, **kwargs)
+        return HeatmapTimeofDay(**kwargs)
     
     
 class ExportGraphLatestAmbientCondition(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return GraphLatestAmbientCondition(pc_details=pc_details, data_events=data_events, **kwargs)
+        return GraphLatestAmbientCondition(**kwargs)
     
 class ExportGraphLatestAnomaly(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return GraphLatestAnomaly(pc_details=pc_details, data_events=data_events, **kwargs)
+        return GraphLatestAnomaly(**kwargs)
     
     
 class ExportGraphRoundAmbientCondition(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return GraphRoundAmbient(pc_details=pc_details, data_events=data_events, **kwargs)
+        return GraphRoundAmbient(**kwargs)
     
 class ExportGraphRoundAnomaly(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return GraphRoundAnomaly(pc_details=pc_details, data_events=data_events, **kwargs)
+        return GraphRoundAnomaly(**kwargs)
   
   
 class ExportGraphNewDayAmbientCondition(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return GraphNewDayAmbient(pc_details=pc_details, data_events=data_events, **kwargs)
+        return GraphNewDayAmbient(**kwargs)
     
 class ExportGraphNewDayAnomaly(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return GraphNewDayAnomaly(pc_details=pc_details, data_events=data_events, **kwargs)  
+        return GraphNewDayAnomaly(**kwargs)  
   
 class ExportGraphTimeofDayAmbientCondition(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return GraphTimeofDayAmbient(pc_details=pc_details, data_events=data_events, **kwargs)
+        return GraphTimeofDayAmbient(**kwargs)
     
 class ExportGraphTimeofDayAnomaly(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return GraphTimeofDayAnomaly(pc_details=pc_details, data_events=data_events, **kwargs)  
+        return GraphTimeofDayAnomaly(**kwargs)  
   
 class ExportHourlyOverviewAmbientCondition(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return HourlyOverviewAmbient(pc_details=pc_details, data_events=data_events, **kwargs)
+        return HourlyOverviewAmbient(**kwargs)
     
     
 class ExportHourlyOverviewAnomaly(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return HourlyOverviewAnomaly(pc_details=pc_details, data_events=data_events, **kwargs)
+        return HourlyOverviewAnomaly(**kwargs)
     
     
 class ExportHourAmbientCondition(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return HourAmbient(pc_details=pc_details, data_events=data_events, **kwargs)
+        return HourAmbient(**kwargs)
     
     
 class ExportHourAnomaly(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return HourAnomaly(pc_details=pc_details, data_events=data_events, **kwargs)
+        return HourAnomaly(**kwargs)
     
     
 class ExportDayAmbientCondition(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return DayAmbient(pc_details=pc_details, data_events=data_events, **kwargs)
+        return DayAmbient(**kwargs)
     
     
 class ExportDayAnomaly(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return DayAnomaly(pc_details=pc_details, data_events=data_events, **kwargs)
+        return DayAnomaly(**kwargs)
     
     
     
 class ExportWeekAmbientCondition(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return WeekAmbient(pc_details=pc_details, data_events=data_events, **kwargs)
+        return WeekAmbient(**kwargs)
     
     
 class ExportWeekAnomaly(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return WeekAnomaly(pc_details=pc_details, data_events=data_events, **kwargs)
+        return WeekAnomaly(**kwargs)
     
     
     
 class ExportMonthAmbientCondition(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return MonthAmbient(pc_details=pc_details, data_events=data_events, **kwargs)
+        return MonthAmbient(**kwargs)
     
     
 class ExportMonthAnomaly(FrontendProcessingFactories):
 
     def get_exporter(self, **kwargs: Dict[str, str]) -> FrontendProcessing:
-        pc_details = PCDetails(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        data_events = DPEvents(kwargs['cnx'], kwargs['round_id'], kwargs['observable_name'])
-        return MonthAnomaly(pc_details=pc_details, data_events=data_events, **kwargs)
+        return MonthAnomaly(**kwargs)
     
     
 
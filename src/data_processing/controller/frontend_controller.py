@@ -1,5 +1,7 @@
 from data_processing.db_connection.connection import DbConnection
 from data_processing.controller.factories.frontend import read_frontend_exporter
+from data_processing.frontend.context import FrontendContext
+from data_processing.frontend.frontend_processing import UPLOAD_STATS, get_skip_rate
 import logging
 from data_processing.event_handlers.event_callables import db_events, email_events, rabbitmq_events, s3_events
 from data_processing.event_handlers.event_handler import register_event, trigger_event
@@ -59,15 +61,17 @@ def frontend_processing(ch: pika.BlockingConnection.channel, method, event_type:
         heatmap = read_frontend_exporter(event_type, "heatmap", type_)
         processors = [graph, heatmap]
     
+    # the processors of the message share the metadata and the event tables they read
+    context = FrontendContext(cnx, round_id, observable_name)
     def create_processor(p):
         return p.get_exporter(
                         cnx=cnx, 
                         round_id=round_id,
-                        type_=type_,
                         x_dim=x_dim,
                         y_dim=y_dim, 
                         observable_name=observable_name, 
-                        logging=log
+                        logging=log,
+                        context=context
                 )
     processor = (create_processor(p) for p in processors )
     
@@ -82,8 +86,9 @@ def frontend_processing(ch: pika.BlockingConnection.channel, method, event_type:
             log.exception(e)
             print(e, "didn't work should nack", method.delivery_tag)
             
+    log.info(f"Frontend uploads skipped because unchanged: {UPLOAD_STATS['skipped']} of {UPLOAD_STATS['written'] + UPLOAD_STATS['skipped']} ({get_skip_rate():.1%})")
     ch.basic_ack(delivery_tag=method.delivery_tag)
-    cnx.close()
+    DbConnection().close_cnx(cnx)
 
 
 def register_events() -> None:
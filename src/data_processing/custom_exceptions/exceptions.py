@@ -10,9 +10,10 @@ class CsvException(Exception):
 
 class SuspiciousDataException(Exception):
 
-    def __init__(self, round_id: str, observable_name: str, message: str, file: TextIO):
+    def __init__(self, round_id: str, robot_id: str, observable_name: str, message: str, file: TextIO):
         self.observable_name = observable_name
         self.round_id = round_id
+        self.robot_id = robot_id
         self.message = message
         self.file = file
         self.post()
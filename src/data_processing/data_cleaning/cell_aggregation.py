@@ -0,0 +1,112 @@
+from typing import List, Union
+import pandas as pd
+import numpy as np
+
+
+KEYS = ['x', 'y', 'z', 'round_number']
+STATE_COLUMNS = ['count', 'total', 'maximum', 'timestamp_total']
+EPOCH = pd.Timestamp(0)
+
+
+class CellAggregates:
+    '''
+        Running aggregates per square meter (x, y, z, round_number).
+
+        Notes
+        --------
+        Each cell keeps the number of values, their sum, their max and the sum of their timestamps in seconds. These can be merged
+        with any other batch of values without keeping the values around, so a file can be aggregated chunk by chunk and the
+        memory needed only depends on the number of cells and not on the size of the file.
+    '''
+
+    def __init__(self, state: pd.DataFrame = None):
+        if state is None:
+            index = pd.MultiIndex.from_arrays([[] for _ in KEYS], names=KEYS)
+            state = pd.DataFrame({col: pd.Series(dtype=np.float64) for col in STATE_COLUMNS}, index=index)
+        self.state = state
+
+    def update(self, df: pd.DataFrame) -> None:
+        '''
+            Adds the values of a data frame with x, y, z, round_number, value and time columns.
+        '''
+        if df.empty:
+            return
+        seconds = (pd.to_datetime(df['time']) - EPOCH) / pd.Timedelta(seconds=1)
+        chunk = df.assign(timestamp_total=seconds).groupby(KEYS).agg(
+                    count=('value', 'count'),
+                    total=('value', 'sum'),
+                    maximum=('value', 'max'),
+                    timestamp_total=('timestamp_total', 'sum'),
+                )
+        self.merge(chunk)
+
+    def merge(self, chunk: pd.DataFrame) -> None:
+        '''
+            Merges aggregates indexed by cell into the current state.
+        '''
+        if self.state.empty:
+            self.state = chunk[STATE_COLUMNS].astype(np.float64)
+            return
+        index = {'count': 'sum', 'total': 'sum', 'maximum': 'max', 'timestamp_total': 'sum'}
+        self.state = pd.concat([self.state, chunk[STATE_COLUMNS]]).groupby(level=KEYS).agg(index)
+
+    def to_frame(self, reducer: str) -> pd.DataFrame:
+        '''
+            Returns a data frame with one row per cell, its reduced value and its average time.
+
+            Parameters
+            ----------
+            reducer: mean for ambient conditions and sum for anomalies.
+
+            Returns
+            --------
+            data frame
+        '''
+        df = self.state.reset_index()
+        if reducer == 'mean':
+            df['value'] = df['total'] / df['count']
+        else:
+            df['value'] = df['total']
+        df['time'] = pd.to_datetime(df['timestamp_total'] / df['count'], unit='s')
+        return df.astype({"x": int, "y": int, "z": int, "round_number": int})
+
+    def __len__(self) -> int:
+        return len(self.state)
+
+
+class RunningMoments:
+    '''
+        Count, mean and sum of squared deviations of a stream of values that can be updated batch by batch.
+
+        References
+        -----------
+        https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Parallel_algorithm
+    '''
+
+    def __init__(self, count: float = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, values: Union[pd.Series, np.ndarray, List[float]]) -> 'RunningMoments':
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        return self.merge(RunningMoments(len(values), values.mean(), ((values - values.mean()) ** 2).sum()))
+
+    def merge(self, other: 'RunningMoments') -> 'RunningMoments':
+        count = self.count + other.count
+        if count == 0:
+            return self
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / count
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        return self
+
+    def std(self) -> float:
+        # same as pandas std, the sample standard deviation
+        if self.count < 2:
+            return np.nan
+        return float(np.sqrt(self.m2 / (self.count - 1)))
@@ -1,17 +1,32 @@
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Union, Callable, Any, Dict, TextIO
+from typing import List, Tuple, Union, Callable, Any, Dict, TextIO, Iterator
 from dataclasses import dataclass
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 from data_processing.event_handlers.events import Events
-from data_processing.custom_exceptions.exceptions import SuspiciousDataException, ObservableNotAvailable, BadFile
+from data_processing.custom_exceptions.exceptions import SuspiciousDataException, ObservableNotAvailable, BadFile, InvalidRound
 from data_processing.download.download import Download
 from data_processing.production_cycle_details.production_cycle_details import ProductionCycleDetails
 from data_processing.data_processing_events.data_processing_events import DataProcessingEvents
 from data_processing.event_handlers.event_handler import trigger_event
+from data_processing.data_cleaning.file_readers import read_sensor_file, read_sensor_file_chunks
+from data_processing.data_cleaning.cell_aggregation import CellAggregates, RunningMoments, KEYS, STATE_COLUMNS
+from data_processing.db_connection.bulk_upsert import upsert_rows
+from data_processing.data_cleaning.hourly_accumulators import hourly_deltas, add_hourly_deltas, accumulator_lock
+from data_processing.internal_events.window_events import WindowEvents
 import logging
+import os
 from time import time
+from dotenv import load_dotenv
+load_dotenv()
+
+
+# Number of lines read at a time in the streaming mode
+INGEST_CHUNK_SIZE = int(os.getenv("ingest_chunk_size", 100000))
+ROUND_DATA_COLUMNS = ['x', 'y', 'z', 'round_number', 'value', 'time', 'round_id', 'day_of_production', 'observable_name']
+# Aggregate the event windows in the ingest, otherwise every event is posted to the events consumer
+INGEST_WINDOW_EVENTS = os.getenv("ingest_window_events", "1") == "1"
 
 
 class DataProcessing(ABC):
@@ -21,20 +36,28 @@ class DataProcessing(ABC):
 		pass
 
 	@abstractmethod
-	def agg_per_square_meter(self, df: pd.DataFrame) -> pd.DataFrame:
+	def agg_per_square_meter(self, aggregates: CellAggregates) -> pd.DataFrame:
 		pass
 
 	@abstractmethod
 	def read_file(self, file: TextIO) -> pd.DataFrame:
 		pass
 
+	@abstractmethod
+	def read_file_chunks(self) -> Iterator[pd.DataFrame]:
+		pass
+
+	@abstractmethod
+	def parse_data_streaming(self, chunks: Iterator[pd.DataFrame]) -> pd.DataFrame:
+		pass
+
 	@abstractmethod
 	def check_suspicious_data(self, df: pd.DataFrame) -> None:
 		pass
 
 
 	@abstractmethod
-	def post_time_events(self, df: pd.DataFrame) -> None:
+	def post_time_events(self, df: List[List]) -> None:
 		pass
 
 	@abstractmethod
@@ -65,6 +88,7 @@ class DataProcessingGeneric(DataProcessing):
 					download: Download = None, 
 					pc_details: ProductionCycleDetails = None, 
 					data_events: DataProcessingEvents = None, 
+					window_events: WindowEvents = None,
 					logging: logging = None
 				):
 		self.cnx = cnx
@@ -80,7 +104,12 @@ class DataProcessingGeneric(DataProcessing):
 		self.download = download
 		self.pc_details = pc_details
 		self.data_events = data_events
+		self.window_events = window_events
 		self.table = f"round_data_{observable_name}"
+		self.table_state = f"round_data_state_{observable_name}"
+		self.cell_state = None
+		self.hourly_deltas = None
+		self.events_params = None
 		self.logging = logging
 
 		self.params = { "roundId": round_id, "robotId": robot_id, "observableName": observable_name, "x_dim": x_dim, 'y_dim': y_dim, "type": type_}
@@ -89,39 +118,34 @@ class DataProcessingGeneric(DataProcessing):
 	def read_file(self) -> pd.DataFrame:
 		''' 
 			Reads the file. It is mostly expecting a csv file but legacy code has a json type structure.
-			This should raise a key exception and can be handled with try and catch.
-			Not the best code but can't think of a better way now.
+			The format is sniffed from the first line of the file so it is only parsed once.
 		'''
 		try:
-			df = pd.read_csv(self.file, sep=r'\s*,\s*', header=0, engine='python')
-			df['timestamp'] = [datetime.strptime(x, '"%Y-%m-%dT%H:%M:%SZ"') for x in df['timestamp']]
-			# honestly can't remember why I have swapped indexes too risky to change it due to backwards compatibility
-			df['coordinates'] = df['y']
-			df['y'] = df['x']
-			df['x'] = df['coordinates']
-			df['data'] = df['value']
-			df = df.drop(['coordinates', 'value'], axis=1)
-			df = df.astype({"x": int, "y": int, "z": int})
-			return df
-		except KeyError as e:
-			df = pd.read_csv(self.file, names=list('m'),sep='\t')
-			df = df['m'].apply(lambda x: pd.Series(json.loads(x)))
-			# honestly can't remember why I have swapped indexes
-			df[['x', 'y', 'z', 'timestamp']] = [ [int(list(row[0])[0]), int(list(row[0])[1]), int(list(row[0])[2]), datetime.strptime(row[1], "%Y-%m-%dT%H:%M:%SZ")] for row in zip(df['coordinates'], df['timestamp'])]
-			df = df.drop(['coordinates', 'unit'], axis=1)
-			return df
+			return read_sensor_file(self.file)
+		except Exception as e:
+			raise BadFile(self.round_id, self.robot_id, self.observable_name, f"File is bad", self.file)
+
+	def read_file_chunks(self) -> Iterator[pd.DataFrame]:
+		'''
+			Reads the file in chunks of INGEST_CHUNK_SIZE lines for the streaming mode.
+		'''
+		try:
+			yield from read_sensor_file_chunks(self.file, INGEST_CHUNK_SIZE)
 		except Exception as e:
 			raise BadFile(self.round_id, self.robot_id, self.observable_name, f"File is bad", self.file)
 
 	def check_suspicious_data(self, df: pd.DataFrame) -> None:
 		r, c = df.shape
 		if r < 2:
-			raise SuspiciousDataException(self.round_id, self.robot_id, self.observable_name, f"Suspicious data error", self.events, self.file)
+			raise SuspiciousDataException(self.round_id, self.robot_id, self.observable_name, f"Suspicious data error", self.file)
 		diff = df['timestamp'].iloc[-1] - df['timestamp'].iloc[0]
-		diff = int(diff.total_seconds())
 		values_sd = df['data'].std(axis=0)
 		x_sd = df['x'].std(axis=0)
 		y_sd = df['y'].std(axis=0)
+		self.check_suspicious_stats(diff, values_sd, x_sd, y_sd)
+
+	def check_suspicious_stats(self, diff: timedelta, values_sd: float, x_sd: float, y_sd: float) -> None:
+		diff = int(diff.total_seconds())
 		if(((values_sd < 0.01) or (x_sd == 0.00 and y_sd == 0.00)) and (diff >= 10 * 60)):
 			raise SuspiciousDataException(self.round_id, self.robot_id, self.observable_name, f"Suspicious data error", self.file)
 
@@ -131,30 +155,129 @@ class DataProcessingGeneric(DataProcessing):
 		if not self.pc_details.is_valid_observable(self.robot_id, self.observable_id):
 			raise ObservableNotAvailable(self.round_id, self.observable_name, f"{self.observable_name} is not available for this robot")
 		self.check_suspicious_data(df)
-		df.loc[:, 'round_id'] = self.round_id
-		df.loc[:, 'observable_name'] = self.observable_name
+		last_row = df.iloc[-1, :]['timestamp']
+		df = self.assign_round_number(df)
+		df = df.rename(columns={'timestamp': 'time', 'data': 'value'})
+		aggregates = CellAggregates()
+		aggregates.update(df)
+		return self.merge_cell_state(aggregates, self.pc_details.get_day_of_production(last_row))
+
+	def merge_cell_state(self, aggregates: CellAggregates, day_of_production: int) -> pd.DataFrame:
+		'''
+			Merges the aggregates of the new data into the stored state of the cells it touches.
+
+			Returns a data frame with one row per touched square meter, ready to be upserted.
+
+			Parameters
+			----------
+			aggregates: the aggregates of the new data only.
+			day_of_production: the day of production of the new data.
+
+			Notes
+			--------
+			The state table keeps the count, sum, max, timestamp sum and day of production of every cell so only the state of the
+			cells in the new data is downloaded, the stored round data is not read again. The merged state is kept in cell_state
+			and written by upsert together with the round data. Cells that already exist keep their day of production.
+			The rows replaced and the new rows also give the changes of the hourly accumulators, kept in hourly_deltas.
+
+			Returns
+			--------
+			data frame
+		'''
+		if len(aggregates) == 0:
+			self.cell_state = None
+			self.hourly_deltas = None
+			return pd.DataFrame(columns=ROUND_DATA_COLUMNS)
+		cells = aggregates.state.index
+		previous = self.download(cells=cells.tolist())
+		previous = previous.astype({"x": int, "y": int, "z": int, "round_number": int}).set_index(KEYS)
+		state = CellAggregates(previous[STATE_COLUMNS].astype(float))
+		state.merge(aggregates.state)
+		self.cell_state = state.state.loc[cells]
+
+		df = self.agg_per_square_meter(CellAggregates(self.cell_state))
+		days = previous['day_of_production'].reindex(pd.MultiIndex.from_frame(df[KEYS]))
+		df['day_of_production'] = days.fillna(day_of_production).astype(int).values
+		self.cell_state = self.cell_state.assign(day_of_production=df.set_index(KEYS)['day_of_production'].reindex(cells).values)
+		df['round_id'] = self.round_id
+		df['observable_name'] = self.observable_name
+		df = df.sort_values(by=['time']).reset_index(drop=True)
+
+		replaced = previous.index.intersection(cells)
+		old = self.agg_per_square_meter(CellAggregates(previous.loc[replaced, STATE_COLUMNS].astype(float)))
+		old['day_of_production'] = previous.loc[replaced, 'day_of_production'].fillna(day_of_production).astype(int).values
+		self.hourly_deltas = hourly_deltas(df, old)
+
+		df['time'] = df['time'].dt.strftime("%Y-%m-%d %H:%M:%S")
+		return df[ROUND_DATA_COLUMNS]
+
+	def assign_round_number(self, df: pd.DataFrame) -> pd.DataFrame:
 		first_row = df.iloc[0, :]['timestamp']
 		last_row = df.iloc[-1, :]['timestamp']
 		isRoundUnique, round_number = self.pc_details.get_round_number(first_row, last_row)
 		if isRoundUnique:
 			df['round_number'] = round_number
 		else:
-			df[['round_number', 'is_valid']] = [ round_number[time.replace(second=0)] for time in  df['timestamp']]
+			df['round_number'], df['is_valid'] = round_number.assign(df['timestamp'])
 			# Discard invalid rounds
 			df = df[df['is_valid'] == 1]
-		df.loc[:, 'day_of_production'] = self.pc_details.get_day_of_production(last_row)
-		df = df.rename(columns={'timestamp': 'time', 'data': 'value'})
-		df_download = self.download(time=list(df['time'])[0])
-		df = pd.concat([df_download, df], sort=True)
-		df['avg_timestamp'] = df['time'].apply(lambda x: x.value)
-		df = df.sort_values(by=['time']).reset_index(drop=True)
-		df = self.agg_per_square_meter(df)
-		df['time'] = df['avg_timestamp'].apply(lambda x: pd.to_datetime(x).strftime("%Y-%m-%d %H:%M:%S"))
-		df = df.drop(['avg_timestamp'], axis=1)
-		df = df.sort_values(by=['time']).reset_index(drop=True)
 		return df
 
-	def agg_per_square_meter(self, df: pd.DataFrame) -> pd.DataFrame:
+	def parse_data_streaming(self, chunks: Iterator[pd.DataFrame]) -> pd.DataFrame:
+		'''
+			Streaming version of parse_data for big files.
+
+			Returns a data frame with one row per square meter like parse_data does.
+
+			Parameters
+			----------
+			chunks: the chunks of the file as returned by read_file_chunks.
+
+			Notes
+			--------
+			Each chunk gets its round number and is folded into running aggregates per cell (x, y, z, round_number) before the
+			next one is read, so the memory used depends on the number of cells and not on the length of the file. The stats for
+			the suspicious data check are also computed on the fly. A chunk that falls in an invalid round is discarded, the
+			InvalidRound exception is only raised when the whole file is invalid. The aggregates are then merged into the stored
+			state with merge_cell_state.
+
+			Returns
+			--------
+			data frame
+		'''
+		if not self.pc_details.is_valid_observable(self.robot_id, self.observable_id):
+			raise ObservableNotAvailable(self.round_id, self.observable_name, f"{self.observable_name} is not available for this robot")
+		aggregates = CellAggregates()
+		moments = {'data': RunningMoments(), 'x': RunningMoments(), 'y': RunningMoments()}
+		rows = 0
+		first_time = None
+		last_time = None
+		invalid_round = None
+		for chunk in chunks:
+			if chunk.empty:
+				continue
+			rows += len(chunk)
+			for col, moment in moments.items():
+				moment.update(chunk[col])
+			if first_time is None:
+				first_time = chunk['timestamp'].iloc[0]
+			last_time = chunk['timestamp'].iloc[-1]
+			try:
+				chunk = self.assign_round_number(chunk)
+			except InvalidRound as e:
+				invalid_round = e
+				continue
+			aggregates.update(chunk.rename(columns={'timestamp': 'time', 'data': 'value'}))
+
+		if rows < 2:
+			raise SuspiciousDataException(self.round_id, self.robot_id, self.observable_name, f"Suspicious data error", self.file)
+		self.check_suspicious_stats(last_time - first_time, moments['data'].std(), moments['x'].std(), moments['y'].std())
+		if len(aggregates) == 0 and invalid_round is not None:
+			raise invalid_round
+
+		return self.merge_cell_state(aggregates, self.pc_details.get_day_of_production(last_time))
+
+	def agg_per_square_meter(self, aggregates: CellAggregates) -> pd.DataFrame:
 		pass
 
 	def upsert(self, df: pd.DataFrame) -> None:
@@ -169,37 +292,91 @@ class DataProcessingGeneric(DataProcessing):
 			--------
 			None
 		'''
-		query = f"INSERT INTO {self.table} (x, y, z, round_number, value, time, round_id, day_of_production, observable_name) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) \
-			ON DUPLICATE KEY UPDATE value=VALUES(value), round_number=VALUES(round_number), time=VALUES(time)"
 		tic = time()
-		self.cursor.executemany(query, df)
+		# the rows, the cell state and the hourly deltas are committed together, see accumulator_lock
+		with accumulator_lock(self.cnx, self.observable_name, self.round_id):
+			try:
+				upsert_rows(self.cnx, self.table, ROUND_DATA_COLUMNS, df, ['value', 'round_number', 'time'], commit=False)
+				self.upsert_cell_state()
+				add_hourly_deltas(self.cnx, self.observable_name, self.round_id, self.hourly_deltas, commit=False)
+				self.cnx.commit()
+			except Exception:
+				self.cnx.rollback()
+				raise
+		self.data_events.update_last_data(df[-1][3], df[-1][7], datetime.strptime(df[-1][5], "%Y-%m-%d %H:%M:%S"))
 		print('inserting data')
-		self.cnx.commit()
 		self.cnx.close	
 		toc = time()
 		total_time = toc - tic
-		msg = f'Inserting data for {self.observable_name} took {total_time} secs. File last line is {df[-1][5]} and has {len(df)} lines'
+		msg = f'Inserting data for {self.observable_name} took {total_time} secs ({len(df) / max(total_time, 1e-6):.0f} rows/sec). File last line is {df[-1][5]} and has {len(df)} lines'
 		self.logging.info(msg)
 
+	def upsert_cell_state(self) -> None:
+		'''
+			Writes the merged state of the cells touched by the last parse, committed by upsert.
+		'''
+		if self.cell_state is None:
+			return
+		state = self.cell_state.reset_index().astype({"x": int, "y": int, "z": int, "round_number": int})
+		state['round_id'] = self.round_id
+		state['observable_name'] = self.observable_name
+		columns = KEYS + STATE_COLUMNS + ['day_of_production', 'round_id', 'observable_name']
+		upsert_rows(self.cnx, self.table_state, columns, state[columns].values.tolist(), STATE_COLUMNS + ['day_of_production'], commit=False)
+
 	def check_events(self, params: Dict[str, str]) -> Dict[str, bool]:
 		new_round = self.data_events.is_new_round(params['round_number'])
 		new_time_of_day = self.data_events.is_new_time_of_day(params['time'])
 		new_day = self.data_events.is_new_day(params['day'])
 		new_hourly_overview = self.data_events.is_new_hourly_overview(params['time'])
+		self.events_params = params
 
 		return {'is_new_round': new_round, 'is_new_day': new_day, 'is_new_time_of_day': new_time_of_day, 'is_new_hourly_overview': new_hourly_overview}
 
-	def post_time_events(self, **events: Dict[str, str]) -> None:
+	def post_time_events(self, df: List[List], **events: Dict[str, str]) -> None:
+		# remove invalid rounds and post new event for db update, before the round is aggregated
+		if events['is_new_round']:
+			self.data_events.invalidate_round(self.events_params['round_number'])
+
+		if not self.aggregate_windows(df, **events):
+			self.trigger_time_events(**events)
+
+		self.data_events.record_events(self.events_params['time'], **events)
+
+	def aggregate_windows(self, df: List[List], **events: Dict[str, str]) -> bool:
+		'''
+			Aggregates the event windows from the rows of the ingest, see WindowEvents.
+
+			Parameters
+			----------
+			df: the rows written by upsert.
+			events: the events returned by check_events.
+
+			Notes
+			--------
+			The rows are already committed so a failure doesn't fail the ingest, it is logged and the events are posted to the
+			events consumer instead, which starts over from the event tables.
+
+			Returns
+			--------
+			False when the events are left to the events consumer
+		'''
+		if self.window_events is None or not INGEST_WINDOW_EVENTS:
+			return False
+		try:
+			self.window_events.process(pd.DataFrame(df, columns=ROUND_DATA_COLUMNS), **events)
+			return True
+		except Exception as e:
+			self.cnx.rollback()
+			self.logging.exception(e)
+			return False
+
+	def trigger_time_events(self, **events: Dict[str, str]) -> None:
 		# post latest event
 		trigger_event(Events.LATEST, self.params)
 
-		# check if new round
 		if events['is_new_round']:
 			trigger_event(Events.NEW_ROUND, self.params)
 
-			# remove invalid rounds and post new event for db update
-			self.data_events.invalidate_round()
-
 		if events['is_new_day']:
 			trigger_event(Events.NEW_NEW_DAY, self.params)
 
@@ -218,7 +395,7 @@ class DataProcessingGeneric(DataProcessing):
 
 class DataProcessingAmbientCondition(DataProcessingGeneric):
 
-	def agg_per_square_meter(self, df: pd.DataFrame) -> pd.DataFrame:
+	def agg_per_square_meter(self, aggregates: CellAggregates) -> pd.DataFrame:
 		'''
 			Aggregates data by square meter. Basically calculating the average of all data cordinates after round down the cordinates as int.
 
@@ -226,11 +403,11 @@ class DataProcessingAmbientCondition(DataProcessingGeneric):
 
 			Parameters
 			----------
-			df: a data frame containing the data that needs to be averaged by cordinates.
+			aggregates: the running aggregates of the cells, keyed by cordinates and round number.
 
 			Notes
 			--------
-			This function is similar to groupby function in sql. It gets average value of data given cordinates and round number.
+			The value of a cell is its total divided by its count and its time is the average of its timestamps.
 
 			References
 			-----------
@@ -240,24 +417,24 @@ class DataProcessingAmbientCondition(DataProcessingGeneric):
 			--------
 			data frame
 		'''
-		index = { 'value': 'mean', 'time': 'first', 'avg_timestamp': 'mean','round_id': 'first', 'day_of_production': 'first', 'observable_name': 'first'}
-		return df.groupby(['x', 'y', 'z', 'round_number'], as_index=False).agg(index)
+		return aggregates.to_frame('mean')
 
 
 class DataProcessingAnomaly(DataProcessingGeneric):
-	def agg_per_square_meter(self, df):
+
+	def agg_per_square_meter(self, aggregates: CellAggregates) -> pd.DataFrame:
 		'''
-			Aggregates data by square meter. Basically calculating the average of all data cordinates after round down the cordinates as int.
+			Aggregates data by square meter. Basically summing the data of each cordinate after round down the cordinates as int.
 
 			Returns a transformed data frame.
 
 			Parameters
 			----------
-			df: a data frame containing the data that needs to be averaged by cordinates.
+			aggregates: the running aggregates of the cells, keyed by cordinates and round number.
 
 			Notes
 			--------
-			This function is similar to groupby function in sql. It gets average value of data given cordinates and round number.
+			Anomalies are counted, so the value of a cell is its total and its time is the average of its timestamps.
 
 			References
 			-----------
@@ -267,5 +444,4 @@ class DataProcessingAnomaly(DataProcessingGeneric):
 			--------
 			data frame
 		'''
-		index = { 'value': 'sum', 'time': 'first', 'avg_timestamp': 'mean','round_id': 'first', 'day_of_production': 'first', 'observable_name': 'first'}
-		return df.groupby(['x', 'y', 'z', 'round_number'], as_index=False).agg(index)
+		return aggregates.to_frame('sum')
@@ -0,0 +1,231 @@
+from typing import List, Tuple, Union, TextIO, Dict, Any, Iterator
+from enum import Enum, auto
+import pandas as pd
+import numpy as np
+import json
+import io
+
+
+SensorFile = Union[str, TextIO, bytes, memoryview]
+
+
+class FileFormat(Enum):
+    CSV = auto()
+    LEGACY_JSON = auto()
+
+
+CSV_DTYPES = {"x": "float64", "y": "float64", "z": "float64", "value": "float64", "timestamp": "str"}
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def read_header(file: Union[str, TextIO]) -> str:
+    '''
+        Returns the first non empty line of the file without consuming the file handle.
+    '''
+    if isinstance(file, str):
+        with open(file, 'r') as f:
+            return first_line(f)
+    position = file.tell()
+    try:
+        return first_line(file)
+    finally:
+        file.seek(position)
+
+
+def first_line(f: TextIO) -> str:
+    for line in f:
+        if isinstance(line, bytes):
+            line = line.decode()
+        if line.strip():
+            return line.strip()
+    return ""
+
+
+def is_buffer(file: SensorFile) -> bool:
+    return isinstance(file, (bytes, bytearray, memoryview))
+
+
+def as_bytes(buffer: Union[bytes, bytearray, memoryview]) -> bytes:
+    '''
+        Returns the bytes object behind a buffer. A memoryview over a whole bytes object gives back that object so nothing is copied.
+    '''
+    if isinstance(buffer, memoryview):
+        if isinstance(buffer.obj, bytes) and buffer.nbytes == len(buffer.obj):
+            return buffer.obj
+        return buffer.tobytes()
+    return buffer
+
+
+def open_buffer(buffer: Union[bytes, bytearray, memoryview]) -> io.BytesIO:
+    # BytesIO shares the memory of a bytes object until it is written to
+    return io.BytesIO(as_bytes(buffer))
+
+
+def sniff_format(header: str) -> FileFormat:
+    '''
+        Returns the format of a sensor file given its first line.
+
+        Notes
+        --------
+        Legacy robots send one json object per line while the new ones send a csv with a header. Looking at the first line
+        is enough to tell them apart so we don't have to parse the whole file as a csv, fail and parse it again.
+    '''
+    if header.startswith('{'):
+        return FileFormat.LEGACY_JSON
+    return FileFormat.CSV
+
+
+def get_column_names(header: str) -> List[str]:
+    return [name.strip().strip('"') for name in header.split(',')]
+
+
+def read_csv(file: Union[str, TextIO], header: str) -> pd.DataFrame:
+    '''
+        Reads a csv sensor file with the c engine.
+
+        Returns a data frame with x, y, z, timestamp and data columns.
+
+        Parameters
+        ----------
+        file: the file name or file object to read.
+        header: the first line of the file as returned by read_header.
+
+        Notes
+        --------
+        The old reader used a regex separator to strip the spaces around the commas which forces pandas onto the python engine.
+        Here the column names are taken from the sniffed header and skipinitialspace takes care of the values, the timestamps are
+        quoted ISO-8601 strings that are parsed in one go with pd.to_datetime. Raises a KeyError if a required column is missing.
+
+        Returns
+        --------
+        data frame
+    '''
+    names = get_column_names(header)
+    return transform_csv(pd.read_csv(file, **csv_options(names)))
+
+
+def csv_options(names: List[str]) -> Dict[str, Any]:
+    missing = [col for col in ("x", "y", "z", "value", "timestamp") if col not in names]
+    if missing:
+        raise KeyError(f"Missing columns {missing}")
+    dtype = {col: CSV_DTYPES[col] for col in names if col in CSV_DTYPES}
+    return {"header": 0, "names": names, "skipinitialspace": True, "quotechar": '"', "dtype": dtype, "engine": 'c'}
+
+
+def transform_csv(df: pd.DataFrame) -> pd.DataFrame:
+    df['timestamp'] = pd.to_datetime(df['timestamp'].str.strip(), format=TIMESTAMP_FORMAT)
+    # honestly can't remember why I have swapped indexes too risky to change it due to backwards compatibility
+    df['coordinates'] = df['y']
+    df['y'] = df['x']
+    df['x'] = df['coordinates']
+    df['data'] = df['value']
+    df = df.drop(['coordinates', 'value'], axis=1)
+    df = df.astype({"x": int, "y": int, "z": int})
+    return df
+
+
+def read_lines(file: Union[str, TextIO]) -> List[str]:
+    if isinstance(file, str):
+        with open(file, 'r') as f:
+            return f.read().splitlines()
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode()
+    return content.splitlines()
+
+
+def read_legacy_json(file: Union[str, TextIO]) -> pd.DataFrame:
+    '''
+        Reads a legacy sensor file that has one json object per line.
+
+        Returns a data frame with x, y, z, timestamp and the remaining json fields except coordinates and unit.
+
+        Parameters
+        ----------
+        file: the file name or file object to read.
+
+        Notes
+        --------
+        All lines are joined into a single json array and decoded in one call, the records are then turned into columns directly.
+        The coordinates are unpacked as one integer array and the timestamps are parsed with pd.to_datetime, so no pandas Series
+        is created per line like the old df.apply(pd.Series) version did.
+
+        Returns
+        --------
+        data frame
+    '''
+    return decode_legacy_lines(read_lines(file))
+
+
+def decode_legacy_lines(lines: List[str]) -> pd.DataFrame:
+    lines = [line for line in lines if line.strip()]
+    records = json.loads('[' + ','.join(lines) + ']')
+    df = pd.DataFrame.from_records(records)
+    coordinates = np.array(df['coordinates'].tolist(), dtype=np.float64)[:, :3].astype(int)
+    # honestly can't remember why I have swapped indexes
+    df['x'] = coordinates[:, 0]
+    df['y'] = coordinates[:, 1]
+    df['z'] = coordinates[:, 2]
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format=TIMESTAMP_FORMAT)
+    df = df.drop(['coordinates', 'unit'], axis=1)
+    return df
+
+
+def read_sensor_file(file: SensorFile) -> pd.DataFrame:
+    '''
+        Reads a sensor file from a file name, a file object or an in memory buffer (bytes or memoryview) of the message payload.
+    '''
+    if is_buffer(file):
+        file = open_buffer(file)
+    header = read_header(file)
+    if sniff_format(header) == FileFormat.LEGACY_JSON:
+        return read_legacy_json(file)
+    return read_csv(file, header)
+
+
+
+def read_sensor_file_chunks(file: SensorFile, chunksize: int) -> Iterator[pd.DataFrame]:
+    '''
+        Reads a sensor file in chunks of at most chunksize lines.
+
+        Returns a generator of data frames with the same columns read_sensor_file returns.
+
+        Parameters
+        ----------
+        file: the file name, file object or in memory buffer to read.
+        chunksize: the number of lines in each chunk.
+
+        Notes
+        --------
+        Only one chunk is held in memory at a time so big files coming from robots that were offline for hours can be processed
+        with bounded memory.
+
+        Returns
+        --------
+        generator of data frames
+    '''
+    if is_buffer(file):
+        file = open_buffer(file)
+    header = read_header(file)
+    if isinstance(file, str):
+        with open(file, 'r') as f:
+            yield from read_chunks(f, header, chunksize)
+    else:
+        yield from read_chunks(file, header, chunksize)
+
+
+def read_chunks(f: TextIO, header: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    if sniff_format(header) == FileFormat.CSV:
+        with pd.read_csv(f, chunksize=chunksize, **csv_options(get_column_names(header))) as reader:
+            for chunk in reader:
+                yield transform_csv(chunk)
+        return
+
+    lines = []
+    for line in f:
+        lines.append(line.decode() if isinstance(line, bytes) else line)
+        if len(lines) == chunksize:
+            yield decode_legacy_lines(lines)
+            lines = []
+    if any(line.strip() for line in lines):
+        yield decode_legacy_lines(lines)
@@ -0,0 +1,243 @@
+from typing import Any, Iterator, Tuple, Union
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+import hashlib
+import os
+import pandas as pd
+import numpy as np
+from data_processing.db_connection.tables import valid_rows, ACCUMULATOR_BUILT_TABLE
+
+
+HOURLY_COLUMNS = ['count', 'total', 'sumsq']
+HOUR_FORMAT = "%Y-%m-%d %H:00:00"
+# Seconds to wait for the accumulator lock of a round, the env is loaded by the controllers before this module is imported
+ACCUMULATOR_LOCK_TIMEOUT = int(os.getenv("accumulator_lock_timeout", 60))
+
+
+def hourly_deltas(new: pd.DataFrame, old: pd.DataFrame = None) -> pd.DataFrame:
+    '''
+        Returns what rows written to a round data table change in the accumulators of their hours.
+
+        Parameters
+        ----------
+        new: the rows written, with value, time, round_number and day_of_production columns.
+        old: the rows they replace, their values are taken out of the hour they were in.
+
+        Notes
+        --------
+        An hour keeps the count, the sum and the sum of squares of the values of its rows. Unlike a mean or a Welford state these
+        can be added to and subtracted from, so a cell whose value or average time changes only moves its old value out of its
+        old hour and its new value into its new hour.
+
+        Returns
+        --------
+        data frame with one row per hour and the time, count, total, sumsq, round_number and day columns
+    '''
+    frames = [get_moments(new, 1)]
+    if old is not None and not old.empty:
+        frames.append(get_moments(old, -1))
+    df = pd.concat(frames)
+    deltas = df.groupby('time').agg(
+                count=('count', 'sum'),
+                total=('total', 'sum'),
+                sumsq=('sumsq', 'sum'),
+                round_number=('round_number', 'max'),
+                day=('day', 'max'),
+            ).reset_index()
+    return deltas[(deltas[HOURLY_COLUMNS] != 0).any(axis=1)]
+
+
+def get_moments(df: pd.DataFrame, sign: int) -> pd.DataFrame:
+    # the hourly overview leaves out the rows before the start of production
+    df = df[df['value'].notna() & (df['day_of_production'].astype(int) >= 0)]
+    value = df['value'].astype(float)
+    return pd.DataFrame({
+                'time': pd.to_datetime(df['time']).dt.floor('h'),
+                'count': float(sign),
+                'total': sign * value,
+                'sumsq': sign * value ** 2,
+                'round_number': df['round_number'].astype(int),
+                'day': df['day_of_production'].astype(int),
+            })
+
+
+def hourly_statistics(df: pd.DataFrame, aggregation: str, decimals: int = 2) -> pd.DataFrame:
+    '''
+        Returns the mean, sd and total of every hour from its accumulator.
+
+        Parameters
+        ----------
+        df: accumulators with count, total and sumsq columns, the count must be positive.
+        aggregation: ambient keeps the mean and sd, anomaly the mean and total.
+        decimals: rounded like the ROUND of the hourly overview queries.
+
+        Notes
+        --------
+        The sd is the population standard deviation of the mysql STDDEV.
+
+        Returns
+        --------
+        data frame
+    '''
+    mean = df['total'] / df['count']
+    variance = (df['sumsq'] / df['count'] - mean ** 2).clip(lower=0)
+    stats = pd.DataFrame({
+                'mean': mean.round(decimals),
+                'sd': np.sqrt(variance).round(decimals),
+                'total': df['total'].round(decimals),
+            }).astype(object)
+    if aggregation == 'anomaly':
+        stats['sd'] = None
+    else:
+        stats['total'] = None
+    return stats
+
+
+@contextmanager
+def accumulator_lock(cnx: Any, observable_name: str, round_id: str, timeout: int = ACCUMULATOR_LOCK_TIMEOUT) -> Iterator[None]:
+    '''
+        Holds the mysql named lock of the accumulators of a round.
+
+        Notes
+        --------
+        A rebuild counts the rows of round_data while the ingest adds the deltas of the rows it writes. If a rebuild ran between
+        the commit of the rows and the one of their deltas, the rows would be counted twice. The ingest writes the rows and
+        their deltas in one transaction while holding this lock and the rebuild holds it too, so one always sees all or none
+        of the other. The lock belongs to the session and can be taken again by its holder.
+    '''
+    name = "hourly_accumulator_" + hashlib.md5(f"{round_id}/{observable_name}".encode('utf-8')).hexdigest()
+    cursor = cnx.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+    row = cursor.fetchone()
+    if row is None or row[0] != 1:
+        raise TimeoutError(f"Could not lock the hourly accumulators of round_id={round_id}, observable name = {observable_name}")
+    try:
+        yield
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+        cursor.fetchone()
+
+
+def add_hourly_deltas(cnx: Any, observable_name: str, round_id: str, deltas: pd.DataFrame, commit: bool = True) -> int:
+    '''
+        Adds deltas from hourly_deltas to the stored accumulators and marks their hours dirty.
+        Without commit they are part of the transaction of the caller, which holds accumulator_lock.
+    '''
+    if deltas is None or deltas.empty:
+        return 0
+    table = f"event_hourly_accumulator_{observable_name}"
+    query = f"INSERT INTO {table} (round_id, observable_name, time, count, total, sumsq, round_number, day, dirty) \
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 1) ON DUPLICATE KEY UPDATE count=count+VALUES(count), total=total+VALUES(total), \
+        sumsq=sumsq+VALUES(sumsq), round_number=GREATEST(round_number, VALUES(round_number)), day=GREATEST(day, VALUES(day)), dirty=dirty+1"
+    rows = [
+        (round_id, observable_name, row.time.strftime(HOUR_FORMAT), float(row.count), float(row.total), float(row.sumsq), int(row.round_number), int(row.day))
+        for row in deltas.itertuples(index=False)
+    ]
+    cursor = cnx.cursor()
+    cursor.executemany(query, rows)
+    if commit:
+        cnx.commit()
+    return len(rows)
+
+
+def rebuild_hourly_accumulators(cnx: Any, observable_name: str, round_id: str, start: Union[datetime, str] = None, end: Union[datetime, str] = None) -> None:
+    '''
+        Recomputes from the round data the accumulators of the hours between start and end, every hour of the round without them.
+
+        Notes
+        --------
+        For writers that do not know the rows they replace (derived observables) and for invalidated rounds. Hours that no
+        longer have valid rows are kept with a zero count so the hourly overview event can remove them. It runs under accumulator_lock
+        so it never sees rows of an ingest without their deltas. Rebuilding a whole round records it in ACCUMULATOR_BUILT_TABLE,
+        see has_hourly_accumulators.
+    '''
+    table = f"round_data_{observable_name}"
+    table_accumulator = f"event_hourly_accumulator_{observable_name}"
+    conditions = [f"round_id = '{round_id}'", f"observable_name = '{observable_name}'"]
+    if start is not None:
+        conditions.append(f"time >= '{pd.Timestamp(start).floor('h')}'")
+    if end is not None:
+        conditions.append(f"time < '{pd.Timestamp(end).floor('h') + timedelta(hours=1)}'")
+    where = ' and '.join(conditions)
+
+    cursor = cnx.cursor()
+    with accumulator_lock(cnx, observable_name, round_id):
+        cursor.execute(f"UPDATE {table_accumulator} SET count=0, total=0, sumsq=0, dirty=dirty+1 WHERE {where}")
+        cursor.execute(f"INSERT INTO {table_accumulator} (round_id, observable_name, time, count, total, sumsq, round_number, day, dirty) \
+            SELECT round_id, observable_name, DATE_FORMAT(time, '{HOUR_FORMAT}'), COUNT(value), SUM(value), SUM(value * value), \
+            MAX(round_number), MAX(day_of_production), 1 FROM {table} WHERE {where} and day_of_production >= 0 and value IS NOT NULL \
+            and {valid_rows(table)} GROUP BY DATE_FORMAT(time, '{HOUR_FORMAT}') \
+            ON DUPLICATE KEY UPDATE count=VALUES(count), total=VALUES(total), sumsq=VALUES(sumsq), round_number=VALUES(round_number), \
+            day=VALUES(day), dirty=dirty+1")
+        if start is None and end is None:
+            cursor.execute(f"INSERT IGNORE INTO {ACCUMULATOR_BUILT_TABLE} (round_id, observable_name) VALUES (%s, %s)", (round_id, observable_name))
+        cnx.commit()
+
+
+def has_hourly_accumulators(cnx: Any, observable_name: str, round_id: str) -> bool:
+    '''
+        Returns whether the accumulators of a round were built from its round data.
+
+        Notes
+        --------
+        The ingest adds its deltas to the accumulators from the start, but the hours stored before they existed are only
+        counted by the first full rebuild, so having accumulator rows doesn't mean they are complete.
+    '''
+    cursor = cnx.cursor()
+    cursor.execute(f"SELECT 1 FROM {ACCUMULATOR_BUILT_TABLE} WHERE round_id=%s AND observable_name=%s", (round_id, observable_name))
+    return cursor.fetchone() is not None
+
+
+# The sql expression giving the first day of the period of a time, weeks start on sunday like the mysql WEEK()
+ROLLUP_PERIODS = {
+    'day': "DATE(time)",
+    'week': "DATE_SUB(DATE(time), INTERVAL DAYOFWEEK(time) - 1 DAY)",
+    'month': "DATE_FORMAT(time, '%Y-%m-01')",
+}
+
+
+def period_bounds(times: pd.Series, period: str) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    '''
+        Returns the start of the first and the end of the last day, week or month the times are in.
+    '''
+    times = pd.to_datetime(times)
+    days = times.dt.normalize()
+    if period == 'day':
+        return days.min(), days.max() + pd.Timedelta(days=1)
+    if period == 'week':
+        starts = days - pd.to_timedelta((days.dt.dayofweek + 1) % 7, unit='D')
+        return starts.min(), starts.max() + pd.Timedelta(days=7)
+    starts = days - pd.to_timedelta(days.dt.day - 1, unit='D')
+    return starts.min(), starts.max() + pd.DateOffset(months=1)
+
+
+def rollup_hourly_accumulators(cnx: Any, observable_name: str, round_id: str, times: pd.Series) -> None:
+    '''
+        Recomputes the day, week and month rollups of the periods the given hours are in.
+
+        Parameters
+        ----------
+        cnx: the db connection.
+        observable_name: the observable.
+        round_id: the round.
+        times: the hours whose accumulators changed.
+
+        Notes
+        --------
+        A rollup adds up the hourly accumulators of its period, so the mean and sd are the ones of every row of the period and
+        a period is recomputed from at most a month of hours instead of the round data.
+    '''
+    if len(times) == 0:
+        return
+    table_accumulator = f"event_hourly_accumulator_{observable_name}"
+    table_rollup = f"event_rollup_{observable_name}"
+    cursor = cnx.cursor()
+    for period, expression in ROLLUP_PERIODS.items():
+        start, end = period_bounds(times, period)
+        where = f"round_id = '{round_id}' and observable_name = '{observable_name}' and time >= '{start}' and time < '{end}'"
+        cursor.execute(f"DELETE FROM {table_rollup} WHERE period = '{period}' and {where}")
+        cursor.execute(f"INSERT INTO {table_rollup} (round_id, observable_name, period, time, count, total, sumsq, mean, sd) \
+            SELECT round_id, observable_name, '{period}', {expression} as start, SUM(count), SUM(total), SUM(sumsq), \
+            ROUND(SUM(total) / SUM(count), 2), ROUND(SQRT(GREATEST(SUM(sumsq) / SUM(count) - POW(SUM(total) / SUM(count), 2), 0)), 2) \
+            FROM {table_accumulator} WHERE {where} GROUP BY start HAVING SUM(count) > 0")
+    cnx.commit()
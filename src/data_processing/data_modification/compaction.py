@@ -0,0 +1,92 @@
+from typing import List, Tuple, Union, Any
+from datetime import datetime
+from data_processing.db_connection.connection import DbConnection
+from data_processing.db_connection.tables import INVALID_RANGE_TABLE
+import logging
+import time
+import sys
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+
+# Rows deleted per statement and seconds between two compactions
+COMPACTION_BATCH_SIZE = int(os.getenv("compaction_batch_size", 5000))
+COMPACTION_INTERVAL = int(os.getenv("compaction_interval", 300))
+
+
+class Compaction:
+    '''
+        Physically deletes the round data of invalidated rounds.
+
+        Notes
+        --------
+        DPEvents.invalidate_round only records the invalid time ranges, the downloads already ignore the rows in them. This job
+        deletes those rows in small batches, each committed on its own so the round data table is never locked for long, then the
+        state of the cells that no longer exist and finally the range itself.
+    '''
+
+    def __init__(self, cnx: Any, logging: logging = None, batch_size: int = COMPACTION_BATCH_SIZE):
+        self.cnx = cnx
+        self.cursor = cnx.cursor()
+        self.logging = logging
+        self.batch_size = batch_size
+
+    def get_ranges(self) -> List[Tuple[int, str, str, int, datetime, Union[datetime, None]]]:
+        query = f"SELECT id, round_id, observable_name, round_number, start_time, end_time FROM {INVALID_RANGE_TABLE} ORDER BY id ASC"
+        self.cursor.execute(query)
+        return self.cursor.fetchall()
+
+    def compact_range(self, id_: int, round_id: str, observable_name: str, round_number: int, start: datetime, end: Union[datetime, None]) -> int:
+        table = f"round_data_{observable_name}"
+        condition = f"time >= '{start}'" if end is None else f"time >= '{start}' AND time < '{end}'"
+        query = f"DELETE FROM {table} WHERE round_id='{round_id}' AND observable_name='{observable_name}' AND round_number={round_number} \
+            AND {condition} LIMIT {self.batch_size}"
+        deleted = 0
+        while True:
+            self.cursor.execute(query)
+            self.cnx.commit()
+            deleted += self.cursor.rowcount
+            if self.cursor.rowcount < self.batch_size:
+                break
+
+        query = f"DELETE s FROM round_data_state_{observable_name} s LEFT JOIN {table} r ON r.round_id = s.round_id \
+            AND r.observable_name = s.observable_name AND r.round_number = s.round_number AND r.x = s.x AND r.y = s.y AND r.z = s.z \
+            WHERE s.round_id='{round_id}' AND s.observable_name='{observable_name}' AND s.round_number={round_number} AND r.x IS NULL"
+        self.cursor.execute(query)
+        self.cursor.execute(f"DELETE FROM {INVALID_RANGE_TABLE} WHERE id={id_}")
+        self.cnx.commit()
+        return deleted
+
+    def run(self) -> int:
+        total = 0
+        for row in self.get_ranges():
+            deleted = self.compact_range(*row)
+            total += deleted
+            if self.logging is not None:
+                self.logging.info(f"Compaction deleted {deleted} rows of round {row[3]} of {row[1]} for {row[2]}")
+        return total
+
+
+def main() -> None:
+    log = logging.getLogger('compaction')
+    while True:
+        cnx = DbConnection().connect_to_db()
+        try:
+            Compaction(cnx, log).run()
+        except Exception as e:
+            log.exception(e)
+        finally:
+            DbConnection().close_cnx(cnx)
+        time.sleep(COMPACTION_INTERVAL)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('Interrupted')
+        try:
+            sys.exit(0)
+        except SystemExit:
+            os._exit(0)
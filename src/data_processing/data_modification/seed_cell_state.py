@@ -0,0 +1,97 @@
+from typing import List, Any
+from data_processing.db_connection.connection import DbConnection
+from data_processing.db_connection.tables import valid_rows
+import logging
+import sys
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+
+class CellStateSeeding:
+    '''
+        Creates the state of the cells stored before the cell state table existed.
+
+        Notes
+        --------
+        The ingest only reads the state of the cells in the new data, a cell without state starts over. This job is run once after
+        deploying: it adds the day of production column to the state tables that lack it, creates the state of every round data
+        row without one from its value counted once, and fills the day of production of the states written before the column
+        existed. Every round is committed on its own and rows that already have a state are left untouched, so it can be rerun.
+    '''
+
+    def __init__(self, cnx: Any, logging: logging = None):
+        self.cnx = cnx
+        self.cursor = cnx.cursor()
+        self.logging = logging
+
+    def get_observables(self) -> List[str]:
+        self.cursor.execute("SELECT code_name FROM observable")
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def get_rounds(self, observable_name: str) -> List[str]:
+        self.cursor.execute(f"SELECT DISTINCT round_id FROM round_data_{observable_name}")
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def has_tables(self, observable_name: str) -> bool:
+        query = f"SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() \
+            AND table_name IN ('round_data_{observable_name}', 'round_data_state_{observable_name}')"
+        self.cursor.execute(query)
+        return self.cursor.fetchone()[0] == 2
+
+    def add_day_column(self, observable_name: str) -> None:
+        query = f"SELECT COUNT(*) FROM information_schema.columns WHERE table_schema = DATABASE() \
+            AND table_name = 'round_data_state_{observable_name}' AND column_name = 'day_of_production'"
+        self.cursor.execute(query)
+        if self.cursor.fetchone()[0] == 0:
+            self.cursor.execute(f"ALTER TABLE round_data_state_{observable_name} ADD COLUMN `day_of_production` int NULL")
+
+    def seed_round(self, observable_name: str, round_id: str) -> int:
+        table = f"round_data_{observable_name}"
+        table_state = f"round_data_state_{observable_name}"
+        query = f"INSERT IGNORE INTO {table_state} (round_id, observable_name, round_number, x, y, z, count, total, maximum, timestamp_total, day_of_production) \
+            SELECT r.round_id, r.observable_name, r.round_number, r.x, r.y, r.z, 1, r.value, r.value, TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', r.time), \
+            r.day_of_production FROM {table} r WHERE r.round_id='{round_id}' AND r.observable_name='{observable_name}' AND r.value IS NOT NULL AND {valid_rows('r')}"
+        self.cursor.execute(query)
+        seeded = self.cursor.rowcount
+        query = f"UPDATE {table_state} s JOIN {table} r ON r.round_id = s.round_id AND r.observable_name = s.observable_name \
+            AND r.round_number = s.round_number AND r.x = s.x AND r.y = s.y AND r.z = s.z \
+            SET s.day_of_production = r.day_of_production WHERE s.round_id='{round_id}' AND s.observable_name='{observable_name}' AND s.day_of_production IS NULL"
+        self.cursor.execute(query)
+        self.cnx.commit()
+        return seeded
+
+    def run(self) -> int:
+        total = 0
+        for observable_name in self.get_observables():
+            if not self.has_tables(observable_name):
+                continue
+            self.add_day_column(observable_name)
+            for round_id in self.get_rounds(observable_name):
+                seeded = self.seed_round(observable_name, round_id)
+                total += seeded
+                if self.logging is not None:
+                    self.logging.info(f"Seeded the state of {seeded} cells of round {round_id} for {observable_name}")
+        return total
+
+
+def main() -> None:
+    log = logging.getLogger('seed_cell_state')
+    cnx = DbConnection().connect_to_db()
+    try:
+        CellStateSeeding(cnx, log).run()
+    except Exception as e:
+        log.exception(e)
+    finally:
+        DbConnection().close_cnx(cnx)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('Interrupted')
+        try:
+            sys.exit(0)
+        except SystemExit:
+            os._exit(0)
@@ -2,10 +2,21 @@ from abc import ABC, abstractmethod
 from typing import List, Tuple, Union, Callable, Any, Dict
 from dataclasses import dataclass
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta, date
 from enum import Enum, auto
 from data_processing.event_handlers.event_handler import trigger_event
+from data_processing.event_handlers.events import Events
 from data_processing.data_processing_events.derived_observables import derived_observables
+from data_processing.cache.cache import TTLCache
+from data_processing.db_connection.tables import INVALID_RANGE_TABLE, valid_rows
+from data_processing.data_cleaning.hourly_accumulators import rebuild_hourly_accumulators
+import os
+
+
+# Watermarks used by the data processing consumer to detect events, keyed by (round_id, observable_name, watermark).
+# The env is loaded by the controllers before this module is imported.
+EVENT_STATE_CACHE = TTLCache(int(os.getenv("event_state_cache_size", 4096)), float(os.getenv("event_state_cache_ttl", 900)))
 
 
 class TimeofDayPeriod(Enum):
@@ -107,6 +118,48 @@ class TimeofDayComputation:
 		return self.quadrants[ self.current_quadrant_value  - 1]
 
 
+# The quadrant windows of a day shifted so they start at MORNING_START, the night is the last 12 hours of a shifted day
+QUADRANT_SHIFT = np.timedelta64(8, 'h')
+QUADRANT_SECONDS = 4 * 60 * 60
+
+
+def label_time_of_day(times: Any) -> Tuple[np.ndarray, np.ndarray]:
+	'''
+		Labels every timestamp with its quadrant and the id of its quadrant window.
+
+		Parameters
+		----------
+		times: an array like of datetimes.
+
+		Notes
+		--------
+		The quadrant is the TimeofDay value, the window id counts the quadrant windows since the epoch so consecutive windows have
+		consecutive ids. The times are shifted back by 8 hours, after which a window is the morning, afternoon or evening 4 hours
+		or the night 12 hours of a shifted day, the night from 20:00 to 07:59:59 the next day is then a single window.
+		This does in one pass over the array what TimeofDayComputation does window by window.
+
+		Returns
+		--------
+		the quadrants and the window ids, both int64 arrays
+	'''
+	shifted = np.asarray(times, dtype='datetime64[s]') - QUADRANT_SHIFT
+	days = shifted.astype('datetime64[D]')
+	seconds = (shifted - days).astype(np.int64)
+	slot = np.minimum(seconds // QUADRANT_SECONDS, 3)
+	return slot + 1, days.astype(np.int64) * 4 + slot
+
+
+def time_of_day_window_bounds(window_ids: Any) -> Tuple[np.ndarray, np.ndarray]:
+	'''
+		Returns the start and the inclusive end (xx:59:59, like TimeofDayPeriod) of quadrant windows labelled by label_time_of_day.
+	'''
+	window_ids = np.asarray(window_ids, dtype=np.int64)
+	slot = window_ids % 4
+	start = (window_ids // 4).astype('datetime64[D]') + QUADRANT_SHIFT + (slot * QUADRANT_SECONDS).astype('timedelta64[s]')
+	length = np.where(slot == 3, 3 * QUADRANT_SECONDS, QUADRANT_SECONDS).astype('timedelta64[s]')
+	return start, start + length - np.timedelta64(1, 's')
+
+
 
 
 
@@ -149,18 +202,64 @@ class DataProcessingEvents(ABC):
 
 class DPEvents(DataProcessingEvents):
 
-	def __init__(self, cnx: Any, round_id: str, observable_name: str):
+	def __init__(self, cnx: Any, round_id: str, observable_name: str, state_cache: TTLCache = None):
 		self.cnx = cnx
 		self.cursor = self.cnx.cursor()
 		self.observable_name = observable_name
 		self.round_id = round_id
 		self.round_table = f"round_data_{observable_name}"
 		self.default_time = datetime(1970, 1, 1, 0, 0, 1)
-		self.last_data = self.get_last_main_table_row()
+		self.state_cache = state_cache
+		self.last_data = self.get_watermark('last_data', self.get_last_main_table_row)
+
+	def get_watermark(self, name: str, load: Callable[[], Any]) -> Any:
+		'''
+			Returns a watermark from the state cache, loading it from the db when it is missing or expired.
+
+			Parameters
+			----------
+			name: the name of the watermark.
+			load: the function querying it.
+
+			Notes
+			--------
+			Without a state cache every watermark is queried like before. The data processing factories pass EVENT_STATE_CACHE so
+			checking the events of a message needs no query once the watermarks of the round are cached. The cache is kept up to date
+			by update_last_data and record_events. A stale watermark can at worst trigger an event twice, which the events consumer
+			handles since it always starts from the event tables.
+
+			Returns
+			--------
+			the watermark
+		'''
+		if self.state_cache is None:
+			return load()
+		return self.state_cache.get_or_load((self.round_id, self.observable_name, name), load)
+
+	def set_watermark(self, name: str, value: Any) -> None:
+		if self.state_cache is not None:
+			self.state_cache.set((self.round_id, self.observable_name, name), value)
+
+	def invalidate_watermark(self, name: str) -> None:
+		if self.state_cache is not None:
+			self.state_cache.invalidate((self.round_id, self.observable_name, name))
+
+	def update_last_data(self, round_number: int, day: int, time: datetime) -> None:
+		''' write through of the last row of the main table after an upsert '''
+		if time >= self.last_data[2]:
+			self.last_data = (round_number, day, time)
+			self.set_watermark('last_data', self.last_data)
+
+	def record_events(self, time: datetime, **events: Dict[str, bool]) -> None:
+		''' write through of the watermarks of the events that were just triggered '''
+		if events['is_new_time_of_day']:
+			self.set_watermark('time_of_day', time)
+		if events['is_new_hourly_overview']:
+			self.set_watermark('hourly_overview', time)
 
 
 	def get_last_main_table_row(self):
-		query = f"SELECT round_number, day_of_production, time FROM {self.round_table} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' ORDER BY time DESC LIMIT 1"
+		query = f"SELECT round_number, day_of_production, time FROM {self.round_table} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' AND {valid_rows(self.round_table)} ORDER BY time DESC LIMIT 1"
 		self.cursor.execute(query)
 		row = self.cursor.fetchone()
 		if row is not None:
@@ -169,7 +268,7 @@ class DPEvents(DataProcessingEvents):
 			return (0, 0, self.default_time)
 
 	def get_first_main_table_row(self):
-		query = f"SELECT round_number, day_of_production, time FROM {self.round_table} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' ORDER BY time ASC LIMIT 1"
+		query = f"SELECT round_number, day_of_production, time FROM {self.round_table} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' AND {valid_rows(self.round_table)} ORDER BY time ASC LIMIT 1"
 		self.cursor.execute(query)
 		row = self.cursor.fetchone()
 		if row is not None:
@@ -181,6 +280,9 @@ class DPEvents(DataProcessingEvents):
 		return self.last_data[0] != round_number
 
 	def get_last_time_of_day(self) -> Union[datetime, None]:
+		return self.get_watermark('time_of_day', self.query_last_time_of_day)
+
+	def query_last_time_of_day(self) -> Union[datetime, None]:
 		query = f"SELECT time FROM event_time_of_day_over_space_{self.observable_name} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' ORDER BY time DESC LIMIT 1"
 		self.cursor.execute(query)
 		row = self.cursor.fetchone()
@@ -190,6 +292,9 @@ class DPEvents(DataProcessingEvents):
 			return self.default_time
 
 	def get_last_updated_latest(self) -> Union[datetime, None]:
+		return self.get_watermark('latest', self.query_last_updated_latest)
+
+	def query_last_updated_latest(self) -> Union[datetime, None]:
 		query = f"SELECT latest_time FROM event_latest_over_space_{self.observable_name} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' ORDER BY latest_time DESC LIMIT 1"
 		self.cursor.execute(query)
 		row = self.cursor.fetchone()
@@ -199,6 +304,9 @@ class DPEvents(DataProcessingEvents):
 			return self.default_time
 
 	def get_last_updated_round(self) -> Union[int, None]:
+		return self.get_watermark('round', self.query_last_updated_round)
+
+	def query_last_updated_round(self) -> Union[int, None]:
 		query = f"SELECT round_number FROM event_round_over_space_{self.observable_name} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' ORDER BY time DESC LIMIT 1"
 		self.cursor.execute(query)
 		row = self.cursor.fetchone()
@@ -208,6 +316,9 @@ class DPEvents(DataProcessingEvents):
 			return 0
 
 	def get_last_updated_day_number(self) -> Union[int, None]:
+		return self.get_watermark('day', self.query_last_updated_day_number)
+
+	def query_last_updated_day_number(self) -> Union[int, None]:
 		query = f"SELECT day FROM event_new_day_over_space_{self.observable_name} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' ORDER BY time DESC LIMIT 1"
 		self.cursor.execute(query)
 		row = self.cursor.fetchone()
@@ -217,6 +328,9 @@ class DPEvents(DataProcessingEvents):
 			return 0
 
 	def get_last_hourly_overview(self) -> Union[datetime, None]:
+		return self.get_watermark('hourly_overview', self.query_last_hourly_overview)
+
+	def query_last_hourly_overview(self) -> Union[datetime, None]:
 		query = f"SELECT time FROM event_hourly_overview_{self.observable_name} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' ORDER BY time DESC LIMIT 1"
 		self.cursor.execute(query)
 		row = self.cursor.fetchone()
@@ -272,7 +386,7 @@ class DPEvents(DataProcessingEvents):
 
 			Parameters
 			----------
-			round_number: the round number.
+			round_number: the round number that just started, the previous one is checked.
 
 			Notes
 			--------
@@ -281,6 +395,12 @@ class DPEvents(DataProcessingEvents):
 			1) When the good round happens before all the bad ones.
 			2) When the good round happens after all the bad ones.
 			3) When the good round is in between the bad ones.
+			Every invalid time range is computed first and recorded in the invalid range table, the round data
+			is not touched. Downloads filter the recorded ranges out with valid_rows and the rows are deleted later by the compaction
+			job, so invalidating doesn't lock the round data table while files are being ingested. The alert is sent once for the
+			whole batch. The hourly accumulators of the invalidated hours are recomputed without the ranges.
+			A stale watermark of another consumer can invalidate a round twice, a range is unique by its start so it is only
+			recorded, recomputed and alerted the first time.
 
 			Returns
 			--------
@@ -289,46 +409,53 @@ class DPEvents(DataProcessingEvents):
 
 		# check if there is bad round
 		round_number -= 1
-		query = f"Select count(*) from round_counter where round_id = '{self.round_id}' and round_number={round_number}"
+		query = f"Select time, is_valid_round from round_counter where round_id='{self.round_id}' and round_number={round_number} order by time asc"
 		self.cursor.execute(query)
-		number = self.cursor.fetchone()
-		# Check if none
-		if number is None:
-			return
+		rows = self.cursor.fetchall()
 
 		# If there is no bad round return
-		if number[0] == 1 or number[0] == 0:
+		if len(rows) < 2 or all(is_valid == 1 for time, is_valid in rows):
 			return
-		else:
-			# get valid time
-			query = f"Select time, round_number from round_counter where round_id='{self.round_id}' and round_number={round_number} and is_valid_round = 1 order by time desc limit 1"
-			self.cursor.execute(query)
-			valid_time, round_number = self.cursor.fetchone()
-
-
-			# get other invalid time
-			query = f"Select time, round_number from round_counter where round_id='{self.round_id}' and round_number={round_number} and is_valid_round=0 order by time asc"
-			self.cursor.execute(query)
-			invalid_times = self.cursor.fetchall()
-
-
-			for invalid_time in invalid_times:
-				time, round_number = invalid_time
-
-				# condition one (where all the invalid times are greater than the good one)
-				if time > valid_time:
-					# This should delete all the invalid times so break out from the loop
-					query = f"delete from {self.table} where time>='{time}' and round_number={round_number} and round_id='{self.round_id}'"
-					self.cursor.execute(query)
-					self.cnx.commit()
-					trigger_event('invalid_round', {'round_id': self.round_id, 'round_number': round_number, 'time': time})
-					break
-				else:
-					# This should delete all the invalid times till the valid one
-					query = f"delete from {self.table} where time>='{time}' and time <'{valid_time}' and round_number={round_number} and round_id='{self.round_id}'"
-					self.cursor.execute(query)
-					self.cnx.commit()
-					trigger_event('invalid_round', {'round_id': self.round_id, 'round_number': round_number, 'time': time})
+
+		ranges = self.get_invalid_ranges(rows)
+		if not ranges:
+			return
+		query = f"INSERT IGNORE INTO {INVALID_RANGE_TABLE} (round_id, observable_name, round_number, start_time, end_time) VALUES (%s, %s, %s, %s, %s)"
+		recorded = []
+		for start, end in ranges:
+			self.cursor.execute(query, (self.round_id, self.observable_name, round_number, start, end))
+			if self.cursor.rowcount > 0:
+				recorded.append((start, end))
+		self.cnx.commit()
+		if not recorded:
+			return
+		for start, end in recorded:
+			rebuild_hourly_accumulators(self.cnx, self.observable_name, self.round_id, start, end)
+		self.invalidate_watermark('last_data')
+		trigger_event(Events.INVALID_ROUND, {'round_id': self.round_id, 'round_number': round_number, 'time': recorded[0][0], 'ranges': recorded, 'cnx': self.cnx})
+
+	def get_invalid_ranges(self, rows: List[Tuple[datetime, int]]) -> List[Tuple[datetime, Union[datetime, None]]]:
+		'''
+			Returns the [start, end) time ranges to delete given the round counter rows of a round sorted by time, end is None when the range is open.
+
+			Notes
+			--------
+			The last valid row is kept. Invalid rows before it are deleted up to it, the earliest one covers the others. Everything
+			from the first invalid row after it is deleted. Without a valid row everything from the first invalid row is deleted.
+		'''
+		valid_times = [time for time, is_valid in rows if is_valid == 1]
+		invalid_times = [time for time, is_valid in rows if is_valid != 1]
+		if not valid_times:
+			return [(invalid_times[0], None)]
+		valid_time = valid_times[-1]
+		ranges = []
+		before = [time for time in invalid_times if time < valid_time]
+		after = [time for time in invalid_times if time > valid_time]
+		if before:
+			ranges.append((before[0], valid_time))
+		if after:
+			ranges.append((after[0], None))
+		return ranges
 
 
 	def is_derived_observable(self) -> Dict[str, str]:
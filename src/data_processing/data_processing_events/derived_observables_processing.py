@@ -4,6 +4,7 @@ from abc import ABC, abstractmethod
 from typing import List, Tuple, Union, Callable, Any, Dict, Generator
 from data_processing.data_processing_events.data_processing_events import DPEvents
 from data_processing.data_processing_events.derived_observables import derived_observables
+from data_processing.db_connection.tables import valid_rows
 import pandas as pd
 
 class DerivedObservablesProcessing(DPEvents):
@@ -132,7 +133,7 @@ class DerivedObservablesProcessing(DPEvents):
 			A Generator object of pandas dataframe.
 		'''
 		for observable in self.dependencies:
-			query =  f"SELECT * FROM round_data_{observable} WHERE time >'{self.last_data[2]}' AND round_id = '{self.round_id}' AND round_number = {index} AND observable_name ='{observable}'"
+			query =  f"SELECT * FROM round_data_{observable} WHERE time >'{self.last_data[2]}' AND round_id = '{self.round_id}' AND round_number = {index} AND observable_name ='{observable}' AND {valid_rows(f'round_data_{observable}')}"
 			df = pd.read_sql(query, con=self.cnx)
 			df = df.rename(columns = {'value': f'{observable}'})
 			yield df
@@ -0,0 +1,84 @@
+from typing import List, Any
+import tempfile
+import csv
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+
+# executemany sends the rows in batches of upsert_batch_size, bulk loads them in a staging table first
+UPSERT_MODE = os.getenv("upsert_mode", "executemany")
+UPSERT_BATCH_SIZE = int(os.getenv("upsert_batch_size", 5000))
+# The only directory the bulk mode connections may load local files from, see DbConnection
+BULK_STAGING_DIR = os.path.join(tempfile.gettempdir(), "data_processing_staging")
+
+
+def upsert_rows(cnx: Any, table: str, columns: List[str], rows: List[List[Any]], update_columns: List[str], mode: str = UPSERT_MODE, commit: bool = True) -> int:
+    '''
+        Inserts rows into a table and on duplicate key, updates the given columns.
+
+        Returns the number of rows sent.
+
+        Parameters
+        ----------
+        cnx: the db connection.
+        table: the table to write to.
+        columns: the column names in the order of the values of each row.
+        rows: the rows to write.
+        update_columns: the columns updated when the key already exists.
+        mode: executemany or bulk.
+        commit: commits every batch, without it the caller commits all the rows in its own transaction.
+
+        Notes
+        --------
+        executemany is fine for the few hundred rows of a normal upload but backfills spend most of their time in it. The bulk mode
+        writes the rows to a csv, loads it with LOAD DATA LOCAL INFILE into a temporary copy of the table and merges that copy with one
+        INSERT ... SELECT ... ON DUPLICATE KEY UPDATE. The connection has to be opened with DbConnection(local_infile=True), which
+        only allows the files of BULK_STAGING_DIR, and the server needs local_infile.
+
+        Returns
+        --------
+        int
+    '''
+    if len(rows) == 0:
+        return 0
+    cursor = cnx.cursor()
+    if mode == "bulk":
+        bulk_upsert(cnx, cursor, table, columns, rows, update_columns, commit)
+    else:
+        query = get_upsert_query(table, columns, update_columns)
+        for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+            cursor.executemany(query, rows[i:i + UPSERT_BATCH_SIZE])
+            if commit:
+                cnx.commit()
+    return len(rows)
+
+
+def get_upsert_query(table: str, columns: List[str], update_columns: List[str]) -> str:
+    placeholders = ', '.join(['%s'] * len(columns))
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {get_update_clause(update_columns)}"
+
+
+def get_update_clause(update_columns: List[str]) -> str:
+    return ', '.join(f"{col}=VALUES({col})" for col in update_columns)
+
+
+def bulk_upsert(cnx: Any, cursor: Any, table: str, columns: List[str], rows: List[List[Any]], update_columns: List[str], commit: bool = True) -> None:
+    staging = f"{table}_staging"
+    # mysql connector can only stream a local infile from a path, so the rows go through a temporary file
+    os.makedirs(BULK_STAGING_DIR, mode=0o700, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', dir=BULK_STAGING_DIR) as f:
+        writer = csv.writer(f, lineterminator='\n')
+        for row in rows:
+            writer.writerow(['\\N' if value is None else value for value in row])
+        f.flush()
+        cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} LIKE {table}")
+        # not TRUNCATE, which commits implicitly even on a temporary table
+        cursor.execute(f"DELETE FROM {staging}")
+        cursor.execute(f"LOAD DATA LOCAL INFILE '{f.name}' INTO TABLE {staging} FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' \
+            LINES TERMINATED BY '\\n' ({', '.join(columns)})")
+        cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {staging} \
+            ON DUPLICATE KEY UPDATE {get_update_clause(update_columns)}")
+        if commit:
+            cnx.commit()
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
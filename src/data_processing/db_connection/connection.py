@@ -1,41 +1,123 @@
 import mysql.connector
+import mysql.connector.pooling
 import os
 from mysql.connector import errorcode
+from data_processing.db_connection.bulk_upsert import BULK_STAGING_DIR
 from dotenv import load_dotenv
 load_dotenv()
 
 
+# Number of connections kept open per process, 0 opens a new connection for every message like before
+DB_POOL_SIZE = int(os.getenv("db_pool_size", 5))
+
+
 class DbConnection():
-	
-	def __init__(self):
+	'''
+		Opens the db connections of a process.
+
+		Parameters
+		----------
+		local_infile: allows LOAD DATA LOCAL INFILE of the files in BULK_STAGING_DIR, for the bulk upsert mode only.
+	'''
+
+	# One pool per process and configuration shared by every DbConnection
+	pools = {}
+
+	def __init__(self, local_infile: bool = False):
 		self.user = os.getenv("dbuser")
 		self.password = os.getenv("password")
 		self.host = os.getenv("host")
 		self.database = os.getenv("database")
+		self.local_infile = local_infile
+
+	def get_config(self):
+		config = {
+				"user": self.user,
+				"password": self.password,
+				"host": self.host,
+				"database": self.database,
+				"buffered": True,
+				"connection_timeout": 1000
+			}
+		if self.local_infile:
+			# a server can make the client send any file it can read with LOAD DATA LOCAL, so only the staging files are allowed
+			os.makedirs(BULK_STAGING_DIR, mode=0o700, exist_ok=True)
+			config["allow_local_infile_in_path"] = BULK_STAGING_DIR
+		return config
 
 	def connect_to_db(self):
+		'''
+			Returns a connection borrowed from the pool, or a new one when pooling is disabled or the pool is exhausted.
+
+			Notes
+			--------
+			A borrowed connection is pinged before it is handed out and reconnected if the server dropped it (wait_timeout,
+			restarts). Closing it with close_cnx or cnx.close() gives it back to the pool instead of closing the socket. A
+			connection that can't be reconnected is discarded and a new one is opened.
+		'''
+		if DB_POOL_SIZE > 0:
+			try:
+				cnx = self.get_pool().get_connection()
+			except mysql.connector.errors.PoolError as err:
+				print(err)
+			except mysql.connector.Error as err:
+				self.print_error(err)
+			else:
+				try:
+					cnx.ping(reconnect=True, attempts=3, delay=1)
+				except mysql.connector.Error as err:
+					print(err)
+					self.discard(cnx)
+				else:
+					return cnx
+		return self.connect()
+
+	def get_pool(self):
+		if self.local_infile not in DbConnection.pools:
+			DbConnection.pools[self.local_infile] = mysql.connector.pooling.MySQLConnectionPool(
+				pool_name="data_processing_local_infile" if self.local_infile else "data_processing",
+				pool_size=DB_POOL_SIZE,
+				pool_reset_session=True,
+				**self.get_config())
+		return DbConnection.pools[self.local_infile]
+
+	def discard(self, cnx) -> None:
+		'''
+			Closes the socket of a broken pooled connection and puts it back in the pool without resetting the session.
+
+			Notes
+			--------
+			cnx.close() would give the broken socket to the next borrower, or fail on the session reset and lose the slot. The
+			pool reconnects a connection that is not connected when it is borrowed next, so the slot is kept without the socket.
+		'''
+		raw, cnx._cnx = cnx._cnx, None
 		try:
-			cnx = mysql.connector.connect(
-				user=self.user, 
-				password=self.password, 
-				host=self.host, 
-				database=self.database, 
-				buffered=True, 
-				connection_timeout=1000)
+			raw.disconnect()
 		except mysql.connector.Error as err:
-			if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
-				print("Something is wrong with your user name or password")
-			elif err.errno == errorcode.ER_BAD_DB_ERROR:
-				print("Database does not exist")
-			else:
-				print(err)
+			print(err)
+		self.get_pool().add_connection(raw)
+
+	def connect(self):
+		try:
+			cnx = mysql.connector.connect(**self.get_config())
+		except mysql.connector.Error as err:
+			self.print_error(err)
 		else:
 			return cnx
 
+	def print_error(self, err) -> None:
+		if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
+			print("Something is wrong with your user name or password")
+		elif err.errno == errorcode.ER_BAD_DB_ERROR:
+			print("Database does not exist")
+		else:
+			print(err)
+
 	def close_cnx(self, cnx) -> None:
+		# a pooled connection goes back to the pool
 		cnx.close()
-		
-		
+
+
 	def create_table(self, cursor, TABLES):
 		for table_name in TABLES:
 			table_description = TABLES[table_name]
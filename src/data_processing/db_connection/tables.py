@@ -0,0 +1,109 @@
+from typing import Dict
+
+
+# Time ranges of rounds that were invalidated but are not deleted yet, see data_modification.compaction
+INVALID_RANGE_TABLE = "round_data_invalid_range"
+# The round and day slices already in the heatmap documents of frontend_data, see frontend.heatmap
+HEATMAP_CACHE_TABLE = "frontend_heatmap_cache"
+# The content hash of every document of frontend_data, see frontend.frontend_processing
+FRONTEND_HASH_TABLE = "frontend_data_hash"
+# The rounds whose hourly accumulators were built from the round data, see data_cleaning.hourly_accumulators
+ACCUMULATOR_BUILT_TABLE = "event_hourly_accumulator_built"
+
+
+def valid_rows(table: str, time: str = None) -> str:
+    '''
+        Returns the sql condition that keeps the rows of a round data table (or alias) that are not in an invalidated range of their round.
+        time is the sql expression of the time of a row, {table}.time by default.
+    '''
+    time = f"{table}.time" if time is None else time
+    return f"NOT EXISTS (SELECT 1 FROM {INVALID_RANGE_TABLE} i WHERE i.round_id = {table}.round_id AND i.observable_name = {table}.observable_name \
+        AND i.round_number = {table}.round_number AND {time} >= i.start_time AND (i.end_time IS NULL OR {time} < i.end_time))"
+
+
+def get_tables(observable_name: str) -> Dict[str, str]:
+    '''
+        Returns the definitions of the tables this project maintains on top of the round data tables, to be used with DbConnection.create_table.
+    '''
+    return {
+        f"round_data_state_{observable_name}": (
+            f"CREATE TABLE `round_data_state_{observable_name}` ("
+            "  `round_id` varchar(7) NOT NULL,"
+            "  `observable_name` varchar(64) NOT NULL,"
+            "  `round_number` int NOT NULL,"
+            "  `x` int NOT NULL,"
+            "  `y` int NOT NULL,"
+            "  `z` int NOT NULL,"
+            "  `count` double NOT NULL,"
+            "  `total` double NOT NULL,"
+            "  `maximum` double NOT NULL,"
+            "  `timestamp_total` double NOT NULL,"
+            "  `day_of_production` int NULL,"
+            "  PRIMARY KEY (`round_id`, `observable_name`, `round_number`, `x`, `y`, `z`)"
+            ") ENGINE=InnoDB"),
+        INVALID_RANGE_TABLE: (
+            f"CREATE TABLE `{INVALID_RANGE_TABLE}` ("
+            "  `id` int NOT NULL AUTO_INCREMENT,"
+            "  `round_id` varchar(7) NOT NULL,"
+            "  `observable_name` varchar(64) NOT NULL,"
+            "  `round_number` int NOT NULL,"
+            "  `start_time` datetime NOT NULL,"
+            "  `end_time` datetime NULL,"
+            "  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+            "  PRIMARY KEY (`id`),"
+            "  UNIQUE KEY `round` (`round_id`, `observable_name`, `round_number`, `start_time`)"
+            ") ENGINE=InnoDB"),
+        ACCUMULATOR_BUILT_TABLE: (
+            f"CREATE TABLE `{ACCUMULATOR_BUILT_TABLE}` ("
+            "  `round_id` varchar(7) NOT NULL,"
+            "  `observable_name` varchar(64) NOT NULL,"
+            "  `built_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+            "  PRIMARY KEY (`round_id`, `observable_name`)"
+            ") ENGINE=InnoDB"),
+        HEATMAP_CACHE_TABLE: (
+            f"CREATE TABLE `{HEATMAP_CACHE_TABLE}` ("
+            "  `round_id` varchar(7) NOT NULL,"
+            "  `observable_name` varchar(64) NOT NULL,"
+            "  `event_type` varchar(32) NOT NULL,"
+            "  `slice` int NOT NULL,"
+            "  `label` varchar(64) NOT NULL,"
+            "  `day_of_production` int NOT NULL,"
+            "  PRIMARY KEY (`round_id`, `observable_name`, `event_type`, `slice`)"
+            ") ENGINE=InnoDB"),
+        FRONTEND_HASH_TABLE: (
+            f"CREATE TABLE `{FRONTEND_HASH_TABLE}` ("
+            "  `round_id` varchar(7) NOT NULL,"
+            "  `observable_name` varchar(64) NOT NULL,"
+            "  `event_type` varchar(32) NOT NULL,"
+            "  `type_of_plot` varchar(32) NOT NULL,"
+            "  `content_hash` char(64) NOT NULL,"
+            "  PRIMARY KEY (`round_id`, `observable_name`, `event_type`, `type_of_plot`)"
+            ") ENGINE=InnoDB"),
+        f"event_hourly_accumulator_{observable_name}": (
+            f"CREATE TABLE `event_hourly_accumulator_{observable_name}` ("
+            "  `round_id` varchar(7) NOT NULL,"
+            "  `observable_name` varchar(64) NOT NULL,"
+            "  `time` datetime NOT NULL,"
+            "  `count` double NOT NULL,"
+            "  `total` double NOT NULL,"
+            "  `sumsq` double NOT NULL,"
+            "  `round_number` int NOT NULL,"
+            "  `day` int NOT NULL,"
+            "  `dirty` int NOT NULL DEFAULT 0,"
+            "  PRIMARY KEY (`round_id`, `observable_name`, `time`),"
+            "  KEY `dirty` (`round_id`, `observable_name`, `dirty`)"
+            ") ENGINE=InnoDB"),
+        f"event_rollup_{observable_name}": (
+            f"CREATE TABLE `event_rollup_{observable_name}` ("
+            "  `round_id` varchar(7) NOT NULL,"
+            "  `observable_name` varchar(64) NOT NULL,"
+            "  `period` varchar(5) NOT NULL,"
+            "  `time` date NOT NULL,"
+            "  `count` double NOT NULL,"
+            "  `total` double NOT NULL,"
+            "  `sumsq` double NOT NULL,"
+            "  `mean` double NULL,"
+            "  `sd` double NULL,"
+            "  PRIMARY KEY (`round_id`, `observable_name`, `period`, `time`)"
+            ") ENGINE=InnoDB"),
+    }
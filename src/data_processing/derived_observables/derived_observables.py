@@ -6,6 +6,8 @@ from data_processing.data_processing_events.derived_observables import derived_o
 from data_processing.data_processing_events.derived_observables_processing import DerivedObservablesProcessing
 from data_processing.event_handlers.event_handler import trigger_event
 from data_processing.event_handlers.events import Events
+from data_processing.db_connection.bulk_upsert import upsert_rows
+from data_processing.data_cleaning.hourly_accumulators import rebuild_hourly_accumulators
 import time
 import logging
 
@@ -99,13 +101,13 @@ class DerivedObservableImplementation(DerivedObservables):
 				self.post_events(**self.events_params)
 
 	def upsert(self, df: List[str]) -> None:
-		query = f"INSERT INTO {self.round_data_table} (x, y, z, round_number, value, time, round_id, day_of_production, observable_name) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) \
-					ON DUPLICATE KEY UPDATE value=VALUES(value), round_number=VALUES(round_number), time=VALUES(time)"
-		self.cursor.executemany(query, df)
-		self.cnx.commit()
+		columns = ['x', 'y', 'z', 'round_number', 'value', 'time', 'round_id', 'day_of_production', 'observable_name']
+		upsert_rows(self.cnx, self.round_data_table, columns, df, ['value', 'round_number', 'time'])
+		# the rows replaced are not known here, the hours written are recomputed instead
+		rebuild_hourly_accumulators(self.cnx, self.observable_name, self.round_id, df[0][5], df[-1][5])
 		toc = time.time()
 		total_time = toc - tic	
-		msg = f"Inserting data for {self.observable_name} took {total_time} secs. File last line is {df[-1][5]} and has {len(df)} lines"
+		msg = f"Inserting data for {self.observable_name} took {total_time} secs ({len(df) / max(total_time, 1e-6):.0f} rows/sec). File last line is {df[-1][5]} and has {len(df)} lines"
 		self.logging.info(msg)
 
 	def post_events(self, **events) -> None:
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from typing import List, Tuple, Union, Callable, Any, Dict
 from dataclasses import dataclass
 import pandas as pd
+import os
+from data_processing.db_connection.tables import valid_rows
 
 
 @dataclass
@@ -28,7 +30,7 @@ class DownloadMainTablePandas(Download):
         self.table = f"round_data_{self.observable_name}"
 
     def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
-        query = f"Select * from {self.table} where round_id = '{self.round_id}' and time > '{kwargs['time']}' order by time asc"
+        query = f"Select * from {self.table} where round_id = '{self.round_id}' and time > '{kwargs['time']}' and {valid_rows(self.table)} order by time asc"
         return pd.read_sql(query, con=self.cnx)
 
 
@@ -45,7 +47,7 @@ class DownloadRound(Download):
     def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
         query = f"Select value, time, x, y, z, round_id, round_number, observable_name from {self.table} \
                     where round_id = '{self.round_id}' and round_number = '{kwargs['round_number']}' and \
-                    observable_name = '{self.observable_name}' and day_of_production >= 0 order by time desc"
+                    observable_name = '{self.observable_name}' and day_of_production >= 0 and {valid_rows(self.table)} order by time desc"
         return pd.read_sql(query, con=self.cnx)
 
 @dataclass
@@ -63,7 +65,7 @@ class DownloadNewDayAmbientCondition(Download):
     def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
         query = f"SELECT round(SUM(value)/COUNT(value), 2) as value, ADDTIME(DATE_FORMAT(time, '%Y-%m-%d 00:00:00'), '12:00:00') AS time, \
                 x, y, z, round_id, day_of_production, observable_name  from {self.table} where round_id = '{self.round_id}' \
-                and day_of_production = '{kwargs['day']}' and day_of_production >= 0 and observable_name = '{self.observable_name}' and x != -1 GROUP BY x, y"
+                and day_of_production = '{kwargs['day']}' and day_of_production >= 0 and observable_name = '{self.observable_name}' and x != -1 and {valid_rows(self.table)} GROUP BY x, y"
         return pd.read_sql(query, con=self.cnx)
 
 
@@ -81,7 +83,7 @@ class DownloadNewDayAnomaly(Download):
     def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
         query = f"SELECT max(value) as value, ADDTIME(DATE_FORMAT(time, '%Y-%m-%d 00:00:00'), '12:00:00') AS time, \
                 x, y, z, round_id, day_of_production, observable_name  from {self.table} where round_id = '{self.round_id}' \
-                and day_of_production = '{kwargs['day']}' and day_of_production >= 0 and observable_name = '{self.observable_name}' and x != -1 GROUP BY x, y"
+                and day_of_production = '{kwargs['day']}' and day_of_production >= 0 and observable_name = '{self.observable_name}' and x != -1 and {valid_rows(self.table)} GROUP BY x, y"
         return pd.read_sql(query, con=self.cnx)
 
 @dataclass
@@ -97,7 +99,7 @@ class DownloadTimeofDayAmbientCondition(Download):
     def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
         query = f"SELECT round(SUM(value)/COUNT(value), 2) as value, '{kwargs['midpoint']}' as time, x, y, z, \
                 round_id, day_of_production, {kwargs['quadrant']} as time_of_day, observable_name  from {self.table} where round_id = '{self.round_id}' \
-                and time >= '{kwargs['time_start']}' and time <= '{kwargs['time_end']}' and observable_name = '{self.observable_name}' and x != -1 and day_of_production >= 0 GROUP BY x, y"
+                and time >= '{kwargs['time_start']}' and time <= '{kwargs['time_end']}' and observable_name = '{self.observable_name}' and x != -1 and day_of_production >= 0 and {valid_rows(self.table)} GROUP BY x, y"
         return pd.read_sql(query, con=self.cnx)
 
 @dataclass
@@ -114,7 +116,7 @@ class DownloadTimeofDayAnomaly(Download):
     def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
         query = f"SELECT max(value) as value, {kwargs['midpoint']} as time, x, y, z, \
                 round_id, day_of_production, {kwargs['quadrant']}, observable_name  from {self.table} where round_id = '{self.round_id}' \
-                and time >= '{kwargs['time_start']}' and time <= '{kwargs['time_end']}' and observable_name = '{self.observable_name}' and x != -1 and day_of_production >= 0 GROUP BY x, y"
+                and time >= '{kwargs['time_start']}' and time <= '{kwargs['time_end']}' and observable_name = '{self.observable_name}' and x != -1 and day_of_production >= 0 and {valid_rows(self.table)} GROUP BY x, y"
         return pd.read_sql(query, con=self.cnx)
 
 
@@ -132,7 +134,7 @@ class DownloadHourlyOverviewAmbientCondition(Download):
     def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
         query = f"SELECT ROUND(AVG(value), 2) as mean, ROUND(STDDEV(value), 2) as sd, null as total,\
                 DATE_FORMAT(time, '%Y-%m-%d %H:00:00') as time, round_number, day_of_production, round_id ,observable_name FROM \
-                {self.table} where round_id = '{self.round_id}' and time >= '{kwargs['time']}' and observable_name = '{self.observable_name}' and day_of_production >= 0 GROUP BY DATE_FORMAT(time, '%Y-%m-%d %H:00:00')"
+                {self.table} where round_id = '{self.round_id}' and time >= '{kwargs['time']}' and observable_name = '{self.observable_name}' and day_of_production >= 0 and {valid_rows(self.table)} GROUP BY DATE_FORMAT(time, '%Y-%m-%d %H:00:00')"
         return pd.read_sql(query, con=self.cnx)
 
 
@@ -149,7 +151,7 @@ class DownloadHourlyOverviewAnomaly(Download):
     def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
         query = f"SELECT ROUND(AVG(value), 2) as mean, null as sd, ROUND(SUM(value), 2) as total,\
                 DATE_FORMAT(time, '%Y-%m-%d %H:00:00') as time, round_number, day_of_production, round_id ,observable_name FROM \
-                {self.table} where round_id = '{self.round_id}' and time > '{kwargs['time']}' and observable_name = '{self.observable_name}' and day_of_production >= 0 GROUP BY DATE_FORMAT(time, '%Y-%m-%d %H:00:00')"
+                {self.table} where round_id = '{self.round_id}' and time > '{kwargs['time']}' and observable_name = '{self.observable_name}' and day_of_production >= 0 and {valid_rows(self.table)} GROUP BY DATE_FORMAT(time, '%Y-%m-%d %H:00:00')"
         return pd.read_sql(query, con=self.cnx)
 
 
@@ -165,5 +167,125 @@ class DownloadLatest(Download):
 
     def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
         query = f"SELECT value, time, x, y, z, round_id, observable_name\
-                 FROM {self.table} where round_id = '{self.round_id}' and time > '{kwargs['time']}' and observable_name = '{self.observable_name}' and day_of_production >= 0"
-        return pd.read_sql(query, con=self.cnx)
\ No newline at end of file
+                 FROM {self.table} where round_id = '{self.round_id}' and time > '{kwargs['time']}' and observable_name = '{self.observable_name}' and day_of_production >= 0 and {valid_rows(self.table)}"
+        return pd.read_sql(query, con=self.cnx)
+
+# Cells whose state is read by one query, the env is loaded by the controllers before this module is imported
+CELL_STATE_BATCH_SIZE = int(os.getenv("cell_state_batch_size", 1000))
+
+
+@dataclass
+class DownloadCellState(Download):
+
+    cnx: Any
+    round_id: str
+    observable_name: str
+
+    def __post_init__(self):
+        self.table = f"round_data_{self.observable_name}"
+        self.table_state = f"round_data_state_{self.observable_name}"
+
+    def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
+        '''
+            Downloads the running aggregates of the given cells.
+
+            Parameters
+            ----------
+            cells: the (x, y, z, round_number) keys of the cells in the new data.
+
+            Notes
+            --------
+            Only the state table is read, by primary key in batches of CELL_STATE_BATCH_SIZE cells, so an ingest costs the number
+            of new cells and not the number of rows stored for their rounds. A cell in an invalidated range of its round, judged
+            by its average time like its round data row, starts over. Cells stored before the state table existed are seeded once
+            by data_modification.seed_cell_state.
+
+            Returns
+            --------
+            data frame
+        '''
+        cells = list(kwargs['cells'])
+        frames = []
+        for i in range(0, len(cells), CELL_STATE_BATCH_SIZE):
+            keys = ', '.join(f"({int(x)}, {int(y)}, {int(z)}, {int(r)})" for x, y, z, r in cells[i:i + CELL_STATE_BATCH_SIZE])
+            query = f"SELECT s.x, s.y, s.z, s.round_number, s.day_of_production, s.count, s.total, s.maximum, s.timestamp_total \
+                    FROM {self.table_state} s WHERE s.round_id = '{self.round_id}' AND s.observable_name = '{self.observable_name}' \
+                    AND (s.x, s.y, s.z, s.round_number) IN ({keys}) AND {valid_rows('s', self.average_time('s'))}"
+            frames.append(pd.read_sql(query, con=self.cnx))
+        if not frames:
+            return pd.DataFrame(columns=['x', 'y', 'z', 'round_number', 'day_of_production', 'count', 'total', 'maximum', 'timestamp_total'])
+        return pd.concat(frames, ignore_index=True)
+
+    def average_time(self, table: str) -> str:
+        return f"TIMESTAMPADD(SECOND, FLOOR({table}.timestamp_total / {table}.count), '1970-01-01 00:00:00')"
+
+
+@dataclass
+class DownloadRoundData(Download):
+
+    cnx: Any
+    round_id: str
+    observable_name: str
+
+    def __post_init__(self):
+        self.table = f"round_data_{self.observable_name}"
+
+    def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
+        '''
+            Downloads the cell rows of a range in one query for the aggregation engine.
+            The range is given by any of time (after), time_start and time_end (inclusive), day_start and day_end (end excluded), round_start and round_end (end excluded).
+            ranges, a list of such ranges, downloads the rows in any of them with the same query, see select.
+        '''
+        ranges = kwargs.get('ranges', [kwargs])
+        conditions = [f"round_id = '{self.round_id}'", f"observable_name = '{self.observable_name}'", "day_of_production >= 0", valid_rows(self.table)]
+        conditions.append('(' + ' or '.join(f"({self.range_condition(**window)})" for window in ranges) + ')')
+        query = f"SELECT value, time, x, y, z, round_id, round_number, day_of_production, observable_name FROM {self.table} \
+                WHERE {' and '.join(conditions)} order by time asc"
+        return pd.read_sql(query, con=self.cnx)
+
+    def range_condition(self, **kwargs: Dict[str, str]) -> str:
+        conditions = ['1 = 1']
+        if 'time' in kwargs:
+            conditions.append(f"time > '{kwargs['time']}'")
+        if 'time_start' in kwargs:
+            conditions.append(f"time >= '{kwargs['time_start']}' and time <= '{kwargs['time_end']}'")
+        if 'day_start' in kwargs:
+            conditions.append(f"day_of_production >= {int(kwargs['day_start'])} and day_of_production < {int(kwargs['day_end'])}")
+        if 'round_start' in kwargs:
+            conditions.append(f"round_number >= {int(kwargs['round_start'])} and round_number < {int(kwargs['round_end'])}")
+        return ' and '.join(conditions)
+
+    def select(self, df: pd.DataFrame, **kwargs: Dict[str, str]) -> pd.Series:
+        '''
+            Returns the mask of the rows of a downloaded frame in a range, the range_condition of the query evaluated in memory.
+        '''
+        mask = pd.Series(True, index=df.index)
+        time = pd.to_datetime(df['time'])
+        if 'time' in kwargs:
+            mask &= time > pd.Timestamp(kwargs['time'])
+        if 'time_start' in kwargs:
+            mask &= (time >= pd.Timestamp(kwargs['time_start'])) & (time <= pd.Timestamp(kwargs['time_end']))
+        if 'day_start' in kwargs:
+            mask &= (df['day_of_production'] >= int(kwargs['day_start'])) & (df['day_of_production'] < int(kwargs['day_end']))
+        if 'round_start' in kwargs:
+            mask &= (df['round_number'] >= int(kwargs['round_start'])) & (df['round_number'] < int(kwargs['round_end']))
+        return mask
+
+
+@dataclass
+class DownloadHourlyAccumulators(Download):
+
+    cnx: Any
+    round_id: str
+    observable_name: str
+
+    def __post_init__(self):
+        self.table = f"event_hourly_accumulator_{self.observable_name}"
+
+    def __call__(self, **kwargs: Dict[str, str]) -> pd.DataFrame:
+        '''
+            Downloads the accumulators of the hours changed since the last hourly overview.
+        '''
+        query = f"SELECT time, count, total, sumsq, round_number, day, dirty FROM {self.table} WHERE round_id = '{self.round_id}' \
+                and observable_name = '{self.observable_name}' and dirty > 0 order by time asc"
+        return pd.read_sql(query, con=self.cnx)
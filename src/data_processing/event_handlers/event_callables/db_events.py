@@ -14,27 +14,31 @@ def invalid_alert(self, params: Dict[str, str]):
         ----------
         time: start time of deleted round.
         round_number: round number of deleted round
+        ranges: the (start, end) time ranges deleted in the batch, end is None when everything after start was deleted.
+        cnx: the db connection.
 
         Returns
         --------
         None
     '''
-    # update alert notification.
-    message = f"Round with id {params['round_id']}, at time - {params['time']} and number {params['round_number']} has been discarded."
+    # update alert notification, one for the whole batch.
+    ranges = ', '.join(f"{start} - {end if end is not None else 'end of round'}" for start, end in params.get('ranges', [(params['time'], None)]))
+    message = f"Round with id {params['round_id']}, at times {ranges} and number {params['round_number']} has been discarded."
     subject = "Discarded robot round"
     notification_method_id = "none"
     alert_id = "0000000"
-    id_ = generate_random_id(params, 'round_invalidation')
+    cnx = params['cnx']
+    id_ = generate_random_id(self, params, 'round_invalidation')
     level = "high"
     user_id = "0000000"
     event_type = "robot round discarded"
     created_by = "0000000"
     user_id = "0000000"
-    params = (id_, params['round_id'], alert_id, notification_method_id, user_id, params['time'], subject, message, level, created_by, event_type)
+    row = (id_, params['round_id'], alert_id, notification_method_id, user_id, params['time'], subject, message, level, created_by, event_type)
     query = "insert into alert_notification (id, robot_id, alert_id, notification_method_id, user_id, time, subject, message, level, created_by, event_type) values \
         (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
-    params['cnx'].cursor.execute(query, params)
-    params['cnx'].commit()
+    cnx.cursor().execute(query, row)
+    cnx.commit()
 
 
 def generate_random_id(self, params: Dict[str, str], col: str):
@@ -51,20 +55,21 @@ def generate_random_id(self, params: Dict[str, str], col: str):
         --------
         id
     '''
+    cursor = params['cnx'].cursor()
     id_ = ''.join(choice(string.ascii_lowercase + string.digits) for _ in range(7))
     query = f"Select id from global_id where id = '{id_}'"
-    params['cnx'].cursor.execute(query)
-    res = params['cnx'].cursor.fetchone()
+    cursor.execute(query)
+    res = cursor.fetchone()
     while res is not None:
         id_ = ''.join(choice(string.ascii_uppercase + string.ascii_lowercase + string.digits) for _ in range(7))
         query = f"Select id from global_id where id = '{id_}'"
-        params['cnx'].cursor.execute(query)
-        res = params['cnx'].cursor.fetchone()
+        cursor.execute(query)
+        res = cursor.fetchone()
 
-    params_ = (id_,  'round_invalidation', '0000000')
+    params_ = (id_,  col, '0000000')
     query = "insert into global_id (id, type, created_by) values \
         (%s, %s, %s)"
-    params['cnx'].cursor.execute(query, params_)
+    cursor.execute(query, params_)
     params['cnx'].commit()
     return id_
 
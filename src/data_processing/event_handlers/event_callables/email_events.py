@@ -5,6 +5,7 @@ from botocore.exceptions import ClientError
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
+from data_processing.data_cleaning.file_readers import is_buffer, as_bytes
 
 class Email:
 
@@ -67,6 +68,14 @@ class Email:
 
         # Add attachments
         for attachment in kwargs['file'] or []:
+            if attachment is None:
+                continue
+            if is_buffer(attachment):
+                # files parsed from memory don't have a name on disk
+                part = MIMEApplication(as_bytes(attachment))
+                part.add_header('Content-Disposition', 'attachment', filename='data_file.csv')
+                msg.attach(part)
+                continue
             with open(attachment, 'rb') as f:
                 part = MIMEApplication(f.read())
                 part.add_header('Content-Disposition', 'attachment', filename=os.path.basename(attachment))
@@ -1,4 +1,4 @@
-from data_processing.event_handlers.rabbitmq.rabbitmq import RabbitMq
+from data_processing.event_handlers.rabbitmq.rabbitmq import get_publisher
 from data_processing.event_handlers.events import Events
 from typing import Dict
 import json
@@ -21,25 +21,15 @@ ROUTING_KEY = {
 }
 
 def trigger_time_events(event: str, body: Dict[str, str]) -> None:
-    ''' connect to rabbitmq and create round, time of day, new day or daily event '''
+    ''' publish round, time of day, new day or daily event on the process wide event_manager publisher '''
     print(f"rabbitmq getting notified of {event} with params: {body}")
-    rmq = RabbitMq()
-    cnx = rmq.connect('event_manager')
-    channel = rmq.get_channel()
     body = {"event_type": event, **body}
-    channel.basic_publish(exchange='chickenboy', routing_key=ROUTING_KEY[event], body=json.dumps(body, default=lambda x: x.name))
-    channel.close()
-    cnx.close()
+    get_publisher('event_manager').publish(exchange='chickenboy', routing_key=ROUTING_KEY[event], body=json.dumps(body, default=lambda x: x.name))
 
 def trigger_frontend_events(event: str, body: Dict[str, str]) -> None:
-    ''' connect to rabbitmq and create round, time of day, new day or daily frontend events '''
+    ''' publish round, time of day, new day or daily frontend events on the process wide frontend_events publisher '''
     print(f"rabbitmq getting notified of {event} with params: {body}")
-    rmq = RabbitMq()
-    cnx = rmq.connect('frontend_events')
-    channel = rmq.get_channel()
-    channel.basic_publish(exchange='chickenboy', routing_key=ROUTING_KEY[event][body["event_type"]], body=json.dumps(body, default=lambda x: x.name))
-    channel.close()
-    cnx.close()
+    get_publisher('frontend_events').publish(exchange='chickenboy', routing_key=ROUTING_KEY[event][body["event_type"]], body=json.dumps(body, default=lambda x: x.name))
 
 def connect_rabbitmq() -> None:
     pass
@@ -2,6 +2,7 @@ import os
 import boto3
 from botocore.exceptions import ClientError
 from typing import Dict
+from data_processing.data_cleaning.file_readers import is_buffer, open_buffer
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -14,7 +15,11 @@ class S3:
 
     def upload(self, params):
         try:
-            response = self.client.upload_file(params['file'], self.bucket, params['object_name'])
+            if is_buffer(params['file']):
+                # in memory payloads are archived from the same buffer the data was parsed from
+                response = self.client.upload_fileobj(open_buffer(params['file']), self.bucket, params['object_name'])
+            else:
+                response = self.client.upload_file(params['file'], self.bucket, params['object_name'])
         except ClientError as e:
             params.log.error(e)
             return False
@@ -1,9 +1,15 @@
 import pika
+import pika.exceptions
 import os
+from typing import Dict, List, Tuple
 from dotenv import load_dotenv
 load_dotenv()
 
 
+# Number of events published before the publisher waits for the broker to confirm them
+PUBLISH_BATCH_SIZE = int(os.getenv("publish_batch_size", 50))
+
+
 class RabbitMq:
 
 	def __init__(self):
@@ -27,3 +33,81 @@ class RabbitMq:
 		self.connection.close()
 
 
+class Publisher:
+	'''
+		Long lived publisher that keeps one connection and channel per process.
+
+		Notes
+		--------
+		Opening a connection for every event costs much more than the publish itself, so the connection is opened on the first
+		publish and reused. The channel is put in transaction mode, the events are published right away and confirmed in batches
+		with tx_commit when the batch is full or when flush is called at the end of a message. If the connection was dropped
+		(heartbeat timeout, broker restart) it is reopened and the unconfirmed events are published again.
+	'''
+
+	def __init__(self, queue: str):
+		self.queue = queue
+		self.rmq = None
+		self.channel = None
+		self.pending: List[Tuple[str, str, str]] = []
+
+	def get_channel(self) -> pika.BlockingConnection:
+		if self.channel is None or not self.channel.is_open or not self.rmq.connection.is_open:
+			self.close()
+			self.rmq = RabbitMq()
+			self.rmq.connect(self.queue)
+			self.channel = self.rmq.get_channel()
+			self.channel.tx_select()
+		return self.channel
+
+	def publish(self, exchange: str, routing_key: str, body: str) -> None:
+		self.pending.append((exchange, routing_key, body))
+		try:
+			self.get_channel().basic_publish(exchange=exchange, routing_key=routing_key, body=body)
+		except pika.exceptions.AMQPError as e:
+			print(e)
+			self.retry()
+		if len(self.pending) >= PUBLISH_BATCH_SIZE:
+			self.flush()
+
+	def flush(self) -> None:
+		''' waits for the broker to confirm the pending events '''
+		if not self.pending:
+			return
+		try:
+			self.get_channel().tx_commit()
+		except pika.exceptions.AMQPError as e:
+			print(e)
+			self.retry()
+			self.channel.tx_commit()
+		self.pending = []
+
+	def retry(self) -> None:
+		# uncommitted events are dropped by the broker with the connection so they are all sent again
+		self.channel = None
+		channel = self.get_channel()
+		for exchange, routing_key, body in self.pending:
+			channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body)
+
+	def close(self) -> None:
+		try:
+			if self.rmq is not None and self.rmq.connection.is_open:
+				self.rmq.close_connection()
+		except pika.exceptions.AMQPError as e:
+			print(e)
+		self.rmq = None
+		self.channel = None
+
+
+publishers: Dict[str, Publisher] = {}
+
+
+def get_publisher(queue: str) -> Publisher:
+	if queue not in publishers:
+		publishers[queue] = Publisher(queue)
+	return publishers[queue]
+
+
+def flush_publishers() -> None:
+	for publisher in publishers.values():
+		publisher.flush()
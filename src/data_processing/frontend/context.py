@@ -0,0 +1,64 @@
+from typing import Any, Dict
+import pandas as pd
+from data_processing.production_cycle_details.production_cycle_details import PCDetails, ProductionCycleDetails
+from data_processing.data_processing_events.data_processing_events import DPEvents, DataProcessingEvents
+
+
+
+class FrontendContext:
+    '''
+        The state shared by the frontend processors of one message.
+
+        Parameters
+        ----------
+        cnx: the db connection.
+        round_id: the round.
+        observable_name: the observable.
+        pc_details: the production cycle details, created on first use when not given.
+        data_events: the data processing events, created on first use when not given.
+
+        Notes
+        --------
+        Every processor of a message used to get its own PCDetails and DPEvents, each with its startup queries, and to download
+        the event table it plots on its own, so the graph and the heatmap of an event both read its over space table and the
+        five processors of the hourly overview read the hourly overview table twice and the rollup table three times. The
+        controller now creates one context per message, the metadata is created once on first use and every table is read
+        once, the processors select and format their rows from the in-memory frame.
+
+        Returns
+        --------
+        None
+    '''
+
+    def __init__(self, cnx: Any, round_id: str, observable_name: str, pc_details: ProductionCycleDetails = None, data_events: DataProcessingEvents = None):
+        self.cnx = cnx
+        self.round_id = round_id
+        self.observable_name = observable_name
+        self._pc_details = pc_details
+        self._data_events = data_events
+        self.tables: Dict[str, pd.DataFrame] = {}
+
+    @property
+    def pc_details(self) -> ProductionCycleDetails:
+        if self._pc_details is None:
+            self._pc_details = PCDetails(self.cnx, self.round_id, self.observable_name)
+        return self._pc_details
+
+    @property
+    def data_events(self) -> DataProcessingEvents:
+        if self._data_events is None:
+            self._data_events = DPEvents(self.cnx, self.round_id, self.observable_name)
+        return self._data_events
+
+    def get_table(self, table: str) -> pd.DataFrame:
+        '''
+            Returns the rows of the round and observable in an event table, read from the db the first time only.
+
+            Notes
+            --------
+            The rows are in no particular order and the frame is shared, callers sort and filter a copy.
+        '''
+        if table not in self.tables:
+            query = f"SELECT * FROM {table} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}'"
+            self.tables[table] = pd.read_sql(query, con=self.cnx)
+        return self.tables[table]
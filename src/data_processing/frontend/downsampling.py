@@ -0,0 +1,93 @@
+from typing import List, Tuple
+import os
+import pandas as pd
+import numpy as np
+
+
+# Graph series longer than graph_display_points are downsampled with graph_downsampling (lttb, minmax or none) for display.
+# The env is loaded by the frontend controller before this module is imported.
+DOWNSAMPLING_METHODS = ('lttb', 'minmax', 'none')
+DISPLAY_POINTS = int(os.getenv("graph_display_points", 1000))
+DOWNSAMPLING = os.getenv("graph_downsampling", "lttb")
+
+
+def downsample(values: np.ndarray, points: int = DISPLAY_POINTS, method: str = DOWNSAMPLING) -> np.ndarray:
+    '''
+        Returns the positions of the points of a series kept for display, in order.
+
+        Parameters
+        ----------
+        values: the values of the series, NaN where a time has no value.
+        points: the maximum number of points kept.
+        method: lttb keeps the points that preserve the visual shape, minmax the extremes of every bucket, none keeps everything.
+
+        Notes
+        --------
+        The points are taken as evenly spaced, the graphs have one point per round, day, time of day window or period. The NaN
+        points are left out of a downsampled series, a series short enough is returned whole with them.
+
+        References
+        --------
+        S. Steinarsson, Downsampling Time Series for Visual Representation, 2013.
+
+        Returns
+        --------
+        array of positions
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    if method not in DOWNSAMPLING_METHODS or method == 'none' or len(values) <= points:
+        return np.arange(len(values))
+    finite = np.flatnonzero(np.isfinite(values))
+    if method == 'minmax':
+        return finite[minmax(values[finite], points)]
+    return finite[lttb(values[finite], points)]
+
+
+def lttb(values: np.ndarray, points: int) -> np.ndarray:
+    '''
+        Largest-Triangle-Three-Buckets: keeps the first and last points and, from each of points - 2 buckets, the point making
+        the largest triangle with the point kept in the previous bucket and the average of the next bucket.
+    '''
+    n = len(values)
+    if points >= n or points < 3:
+        return np.arange(n)
+    every = (n - 2) / (points - 2)
+    edges = (np.arange(points - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    kept = np.empty(points, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = (end + next_end - 1) / 2
+        avg_y = values[end:next_end].mean()
+        x = np.arange(start, end)
+        area = np.abs((a - avg_x) * (values[start:end] - values[a]) - (a - x) * (avg_y - values[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def minmax(values: np.ndarray, points: int) -> np.ndarray:
+    '''
+        Keeps the first and last points and the minimum and maximum of each of (points - 2) // 2 buckets.
+    '''
+    n = len(values)
+    buckets = max((points - 2) // 2, 1)
+    if points >= n or n < 3:
+        return np.arange(n)
+    series = pd.Series(values[1:-1])
+    labels = np.arange(n - 2) * buckets // (n - 2)
+    grouped = series.groupby(labels)
+    kept = np.concatenate([[0], grouped.idxmin().values + 1, grouped.idxmax().values + 1, [n - 1]])
+    return np.unique(kept)
+
+
+def display_series(values: np.ndarray, dates: List[str], points: int = DISPLAY_POINTS, method: str = DOWNSAMPLING) -> Tuple[np.ndarray, List[str]]:
+    '''
+        Returns the values and dates of the display resolution of a series.
+    '''
+    index = downsample(values, points, method)
+    return np.asarray(values)[index], [dates[i] for i in index]
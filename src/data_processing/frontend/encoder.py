@@ -0,0 +1,171 @@
+from typing import Any, Dict, List, Tuple
+import math
+import json
+import base64
+import zlib
+import os
+import pandas as pd
+import numpy as np
+
+
+# Decimals used when the observable has no precision, the heatmaps were always rounded to 3
+DEFAULT_DECIMALS = 3
+
+# Heatmap payload formats, heatmap_format_{plot} (latest, round, new_day, time_of_day) overrides heatmap_format for one plot.
+# The env is loaded by the frontend controller before this module is imported.
+HEATMAP_FORMATS = ('dense', 'sparse', 'float32', 'delta')
+HEATMAP_FORMAT = os.getenv("heatmap_format", "dense")
+# The quantized value of an empty cell in the delta format, quantized values and deltas have to be within +-QUANTIZED_LIMIT
+QUANTIZED_NAN = int(np.iinfo(np.int32).min)
+QUANTIZED_LIMIT = int(np.iinfo(np.int32).max)
+
+
+def get_decimals(precision: Any) -> int:
+    '''
+        Returns the number of decimals of an observable precision given either as a step (0.01) or as a number of decimals (2).
+    '''
+    if precision is None:
+        return DEFAULT_DECIMALS
+    precision = float(precision)
+    if 0 < precision < 1:
+        decimals = round(-math.log10(precision))
+    else:
+        decimals = int(precision)
+    return min(max(decimals, 0), 15)
+
+
+def encode(value: Any, decimals: int = DEFAULT_DECIMALS) -> str:
+    '''
+        Returns the json text of a frontend payload made of dicts, lists, scalars and numpy arrays.
+
+        Parameters
+        ----------
+        value: the payload.
+        decimals: the number of decimals of the floats.
+
+        Notes
+        --------
+        json.dumps needs the grids as nested python lists (ndarray.tolist()) and writes NaN, which then had to be replaced by
+        null in the whole text. Here the arrays are written by the C json writer of pandas with a fixed number of decimals and
+        NaN written as null, the nested brackets are added around its rows so no python float object is ever created.
+
+        Returns
+        --------
+        str
+    '''
+    if isinstance(value, np.ndarray):
+        return encode_array(value, decimals)
+    if isinstance(value, dict):
+        return '{' + ','.join(json.dumps(str(k)) + ':' + encode(v, decimals) for k, v in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(encode(v, decimals) for v in value) + ']'
+    if isinstance(value, (float, np.floating)):
+        return 'null' if not math.isfinite(value) else json.dumps(round(float(value), decimals))
+    if isinstance(value, np.integer):
+        return str(int(value))
+    return json.dumps(value)
+
+
+def encode_array(array: np.ndarray, decimals: int = DEFAULT_DECIMALS) -> str:
+    array = np.asarray(array)
+    if not np.issubdtype(array.dtype, np.integer):
+        array = array.astype(np.float64)
+    if array.ndim == 0:
+        return encode(array.item(), decimals)
+    if array.size == 0:
+        return json.dumps(array.tolist(), separators=(',', ':'))
+    if array.ndim == 1:
+        return pd.Series(array).to_json(orient='values', double_precision=decimals)
+    # a single call writes all the innermost rows, which are then grouped back into the shape of the array
+    rows = pd.DataFrame(array.reshape(-1, array.shape[-1])).to_json(orient='values', double_precision=decimals)[2:-2].split('],[')
+    rows = ['[' + row + ']' for row in rows]
+    for size in reversed(array.shape[1:-1]):
+        rows = ['[' + ','.join(rows[i:i + size]) + ']' for i in range(0, len(rows), size)]
+    return '[' + ','.join(rows) + ']'
+
+
+def get_heatmap_format(plot: str) -> str:
+    format_ = os.getenv(f"heatmap_format_{plot}", HEATMAP_FORMAT)
+    return format_ if format_ in HEATMAP_FORMATS else 'dense'
+
+
+def encode_grids(grids: List[np.ndarray], format_: str, decimals: int = DEFAULT_DECIMALS) -> List[Any]:
+    '''
+        Returns the payload of every grid of a heatmap in the given format.
+
+        Parameters
+        ----------
+        grids: the [x_dim, y_dim] grids in the order of the document, NaN where a cell has no data.
+        format_: one of HEATMAP_FORMATS.
+        decimals: the precision of the values.
+
+        Notes
+        --------
+        dense: the grid as nested arrays, like before.
+        sparse: {"index": [x * y_dim + y, ...], "value": [...]} of the cells with data, robots do not visit every cell each round.
+        float32: base64 of the zlib compressed little endian float32 grid in row major order, NaN stays NaN.
+        delta: the grid quantized to int32 (value * 10 ** decimals, QUANTIZED_NAN for empty cells), every cell that had a value
+        in the previous grid stored as the difference with it, then zlib compressed and base64 encoded like float32. A client
+        decodes a cell as empty when it is QUANTIZED_NAN, as the value itself when the cell of the previous grid was empty and as
+        the previous value plus the delta otherwise. Grids whose quantized values or deltas do not fit in an int32, or that would
+        collide with QUANTIZED_NAN, raise an OverflowError instead of wrapping around, the caller falls back to float32.
+
+        Returns
+        --------
+        list
+    '''
+    if format_ == 'sparse':
+        return [encode_sparse(grid) for grid in grids]
+    if format_ == 'float32':
+        return [pack(np.asarray(grid, dtype='<f4')) for grid in grids]
+    if format_ == 'delta':
+        return encode_delta(grids, decimals)
+    return list(grids)
+
+
+def encode_sparse(grid: np.ndarray) -> Dict[str, np.ndarray]:
+    flat = np.asarray(grid, dtype=np.float64).ravel()
+    index = np.flatnonzero(~np.isnan(flat))
+    return {'index': index, 'value': flat[index]}
+
+
+def encode_delta(grids: List[np.ndarray], decimals: int) -> List[str]:
+    payloads = []
+    previous = None
+    for grid in grids:
+        grid = np.asarray(grid, dtype=np.float64)
+        empty = np.isnan(grid)
+        scaled = np.round(np.where(empty, 0, grid) * 10 ** decimals)
+        check_quantized(scaled, decimals)
+        quantized = scaled.astype(np.int64)
+        delta = quantized.copy()
+        if previous is not None:
+            both = ~empty & (previous != QUANTIZED_NAN)
+            delta[both] = quantized[both] - previous[both]
+        check_quantized(delta, decimals)
+        delta[empty] = QUANTIZED_NAN
+        payloads.append(pack(delta.astype('<i4')))
+        previous = np.where(empty, QUANTIZED_NAN, quantized)
+    return payloads
+
+
+def check_quantized(values: np.ndarray, decimals: int) -> None:
+    # also false for infinite values
+    if not np.all(np.abs(values) <= QUANTIZED_LIMIT):
+        raise OverflowError(f"Heatmap values do not fit in the int32 delta format with {decimals} decimals")
+
+
+def pack(array: np.ndarray) -> str:
+    return base64.b64encode(zlib.compress(array.tobytes())).decode('ascii')
+
+
+def heatmap_document(data: Dict[str, Any], date: List[Any], format_: str, shape: Tuple[int, int], decimals: int) -> Dict[str, Any]:
+    '''
+        Returns the heatmap document stored in frontend_data, tagged with its format.
+    '''
+    document = {'format': format_, 'data': data, 'date': date}
+    if format_ != 'dense':
+        document['shape'] = list(shape)
+    if format_ == 'delta':
+        document['decimals'] = decimals
+    return document
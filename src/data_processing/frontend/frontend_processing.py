@@ -1,12 +1,31 @@
 from abc import ABC, abstractmethod
 from typing import List, Any
 import pandas as pd
+import numpy as np
 from data_processing.production_cycle_details.production_cycle_details import ProductionCycleDetails
 from data_processing.data_processing_events.data_processing_events import DataProcessingEvents
+from data_processing.cache.metadata import METADATA_CACHE
+from data_processing.db_connection.tables import FRONTEND_HASH_TABLE
+from data_processing.frontend.encoder import encode, get_decimals
+from data_processing.frontend.downsampling import display_series
+from data_processing.frontend.context import FrontendContext
 import logging
 import json
+import hashlib
 
 
+# The uploads written and skipped by this consumer since it started
+UPLOAD_STATS = {'written': 0, 'skipped': 0}
+
+
+def content_hash(data: str) -> str:
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def get_skip_rate() -> float:
+    total = UPLOAD_STATS['written'] + UPLOAD_STATS['skipped']
+    return UPLOAD_STATS['skipped'] / total if total else 0.0
+
 
 class FrontendProcessing(ABC):
 
@@ -52,7 +71,8 @@ class FrontendProcessingImplementation(FrontendProcessing):
                     y_dim: int = None,
                     pc_details: ProductionCycleDetails = None,
                     data_events: DataProcessingEvents = None,  
-                    logging: logging = None
+                    logging: logging = None,
+                    context: FrontendContext = None
                 ):
         
         self.cnx = cnx
@@ -63,10 +83,18 @@ class FrontendProcessingImplementation(FrontendProcessing):
         self.y_dim = y_dim + 1
         self.table = f"frontend_data"
         self.table_time = f""
-        self.pc_details = pc_details
-        self.data_events = data_events
+        # the processors of a message share one context, see FrontendContext
+        self.context = context if context is not None else FrontendContext(cnx, round_id, observable_name, pc_details, data_events)
         self.logging = logging
 
+    @property
+    def pc_details(self) -> ProductionCycleDetails:
+        return self.context.pc_details
+
+    @property
+    def data_events(self) -> DataProcessingEvents:
+        return self.context.data_events
+
     def download(self) -> pd.DataFrame:
         pass
 
@@ -78,18 +106,87 @@ class FrontendProcessingImplementation(FrontendProcessing):
         pass
 
     def upload(self, data: json = None, event_type: str = None, type_of_plot: str = None) -> None:
-        
+        '''
+            Writes a document to frontend_data unless it is the one already stored.
+
+            Parameters
+            ----------
+            data: the json document.
+            event_type: the event of the plot.
+            type_of_plot: graph or heatmap.
+
+            Notes
+            --------
+            The sha256 of every written document is kept in FRONTEND_HASH_TABLE, so an event that produces the same document
+            again, like a latest event that does not change the hourly graph, doesn't rewrite the blob. The stored hash is read on
+            every upload, another consumer may have written the document since, and the hash is written before the document in
+            the same transaction so its row lock keeps concurrent writers of a document from leaving a hash of another document.
+            UPLOAD_STATS counts the written and skipped uploads, the controller logs the skip rate.
+
+            Returns
+            --------
+            None
+        '''
+        hash_ = content_hash(data)
+        if self.query_content_hash(event_type, type_of_plot) == hash_:
+            UPLOAD_STATS['skipped'] += 1
+            return
+        query = f"INSERT INTO {FRONTEND_HASH_TABLE} (content_hash, event_type, type_of_plot, round_id, observable_name) VALUES (%s, %s, %s, %s, %s) \
+                ON DUPLICATE KEY UPDATE content_hash=VALUES(content_hash)"
+        self.cursor.execute(query, (hash_, event_type, type_of_plot, self.round_id, self.observable_name))
         query = f"INSERT INTO {self.table} (data, event_type, type_of_plot, round_id, observable_name) VALUES (%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE data=VALUES(data)"
         row = (data, event_type, type_of_plot, self.round_id, self.observable_name)
         self.cursor.execute(query, row)
         self.cnx.commit()
+        UPLOAD_STATS['written'] += 1
+
+    def upload_graph(self, data: np.ndarray, timestamp: List[str], event_type: str) -> None:
+        '''
+            Uploads a graph series, downsampled for display when it is longer than graph_display_points.
+
+            Notes
+            --------
+            The "graph" document keeps its format and holds the display resolution, so the payload and the render time of the
+            browser are bounded. When points were dropped the full resolution is uploaded as a "graph_full" document for zooming,
+            a graph without one is at full resolution already, so the one of an earlier longer series is deleted.
+        '''
+        display, display_timestamp = display_series(data, timestamp)
+        if len(display) < len(data):
+            self.upload(data=self.get_json(data, timestamp), event_type=event_type, type_of_plot="graph_full")
+        else:
+            self.delete_document(event_type, "graph_full")
+        self.upload(data=self.get_json(display, display_timestamp), event_type=event_type, type_of_plot="graph")
+
+    def query_content_hash(self, event_type: str, type_of_plot: str) -> str:
+        query = f"SELECT content_hash FROM {FRONTEND_HASH_TABLE} WHERE event_type='{event_type}' AND type_of_plot='{type_of_plot}' AND round_id='{self.round_id}' AND observable_name='{self.observable_name}'"
+        self.cursor.execute(query)
+        row = self.cursor.fetchone()
+        return None if row is None else row[0]
+
+    def forget_content_hash(self, event_type: str, type_of_plot: str) -> None:
+        # for writers that change a document in place, its next upload is always written
+        query = f"DELETE FROM {FRONTEND_HASH_TABLE} WHERE event_type=%s AND type_of_plot=%s AND round_id=%s AND observable_name=%s"
+        self.cursor.execute(query, (event_type, type_of_plot, self.round_id, self.observable_name))
+
+    def delete_document(self, event_type: str, type_of_plot: str) -> None:
+        self.forget_content_hash(event_type, type_of_plot)
+        query = f"DELETE FROM {self.table} WHERE event_type=%s AND type_of_plot=%s AND round_id=%s AND observable_name=%s"
+        self.cursor.execute(query, (event_type, type_of_plot, self.round_id, self.observable_name))
+        self.cnx.commit()
         
         
     def get_observable_precision(self) -> float:
-        query = f"SELECT observable_precision FROM observable WHERE code_name ='{self.observable_name}"
+        return METADATA_CACHE.get_or_load(('observable_precision', self.observable_name), self.query_observable_precision)
+
+    def query_observable_precision(self) -> float:
+        query = f"SELECT observable_precision FROM observable WHERE code_name ='{self.observable_name}'"
         self.cursor.execute(query)
         precision = self.cursor.fetchone()
-        return precision[0]
+        return None if precision is None else precision[0]
+
+    def get_decimals(self) -> int:
+        return get_decimals(self.get_observable_precision())
     
-    def get_json(self, df: List[str], date: List[str]) -> pd.DataFrame:
-        return json.dumps({'data': df, 'date': date}).replace('NaN', 'null')
\ No newline at end of file
+    def get_json(self, df: List[str], date: List[str]) -> str:
+        # numpy arrays are written directly with the precision of the observable, NaN as null
+        return encode({'data': df, 'date': date}, self.get_decimals())
\ No newline at end of file
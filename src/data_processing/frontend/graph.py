@@ -10,27 +10,27 @@ class Graph(FrontendProcessingImplementation):
 
 
     def download(self, time: str, col: str, date_format: str) -> pd.DataFrame:
-        query = f"SELECT DATE_FORMAT({time}, '{date_format}') as time, {col} as value from {self.table_space} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' GROUP BY {time}"
-        df = pd.read_sql(query, con=self.cnx)
-        return df      
+        # the over space table is shared with the heatmap of the event, one row per time like the former GROUP BY
+        df = self.context.get_table(self.table_space)
+        df = df.assign(time=pd.to_datetime(df[time])).sort_values(by=['time'], kind='stable').drop_duplicates(subset=['time'])
+        return pd.DataFrame({'time': df['time'].dt.strftime(date_format).values, 'value': df[col].values})
                 
     def process(self) -> None:
         
         df = self.get_download()
         if df.empty:
             raise EmptyFrontendException(self.round_id, self.observable_name, f"Frontend graph for {self.event} has failed because there is not data for round_id={self.round_id}, observable name = {self.observable_name}")
-        data = df.loc[:, 'value'].values.tolist()
+        data = df.loc[:, 'value'].values.astype(np.float64)
         timestamp = df.loc[:, 'time'].values.tolist()
-        data = self.get_json(data, timestamp)
-        # upload data
-        self.upload(data=data, event_type=self.event, type_of_plot="graph")
+        # upload data, full and display resolution
+        self.upload_graph(data, timestamp, self.event)
         
         
         
 class GraphLatest(Graph):
     
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
         self.table_time = f"event_latest_over_time_{observable_name}"
         self.table_space = f"event_latest_over_space_{observable_name}"
         self.event = "latest"
@@ -45,22 +45,22 @@ class GraphLatestAmbientCondition(GraphLatest):
         time = "latest_time"
         col = "mean"
         date_format = '%Y-%m-%d %H:00:00'
-        return self.download(col, time, date_format)
+        return self.download(time, col, date_format)
     
     
-class GraphLatestAnomaly(Graph):
+class GraphLatestAnomaly(GraphLatest):
     
     def get_download(self) -> pd.DataFrame:
         time = "latest_time"
         col = "total"
         date_format = '%Y-%m-%d %H:00:00'
-        return self.download(col, time, date_format)
+        return self.download(time, col, date_format)
         
         
 class GraphRound(Graph):
     
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
         self.table_time = f"event_round_over_time_{observable_name}"
         self.table_space = f"event_round_over_space_{observable_name}"
         self.event = "round"
@@ -74,16 +74,16 @@ class GraphRoundAmbient(GraphRound):
     def get_download(self) -> pd.DataFrame:
         time = "time"
         col = "mean"
-        date_format = "%Y-%m-%d %H:%i:00"
+        date_format = "%Y-%m-%d %H:%M:00"
         return self.download(time, col, date_format)
     
     
-class GraphRoundAnomaly(Graph):
+class GraphRoundAnomaly(GraphRound):
     
     def get_download(self) -> pd.DataFrame:
         time = "time"
         col = "total"
-        date_format = "%Y-%m-%d %H:%i:00"
+        date_format = "%Y-%m-%d %H:%M:00"
         return self.download(time, col, date_format)
         
         
@@ -91,8 +91,8 @@ class GraphRoundAnomaly(Graph):
         
 class GraphNewDay(Graph):
     
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
         self.table_time = f"event_new_day_over_time_{observable_name}"
         self.table_space = f"event_new_day_over_space_{observable_name}"
         self.event = "new_day"
@@ -121,10 +121,10 @@ class GraphNewDayAnomaly(GraphNewDay):
         
         
         
-class GraphTimeofDay(GraphNewDay):
+class GraphTimeofDay(Graph):
     
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
         self.table_time = f"event_time_of_day_over_time_{observable_name}"
         self.table_space = f"event_time_of_day_over_space_{observable_name}"
         self.event = "time_of_day"
@@ -134,24 +134,24 @@ class GraphTimeofDay(GraphNewDay):
         pass
     
     
-class GraphTimeofDayAmbient(GraphNewDay):
+class GraphTimeofDayAmbient(GraphTimeofDay):
      
     def get_download(self) -> pd.DataFrame:
         time = "time"
         col = "mean"
-        date_format = "%Y-%m-%d %H:%i:00"
-        return self.download(col, time, date_format)
+        date_format = "%Y-%m-%d %H:%M:00"
+        return self.download(time, col, date_format)
     
     
     
     
-class GraphTimeofDayAnomaly(Graph):
+class GraphTimeofDayAnomaly(GraphTimeofDay):
     
     def get_download(self) -> pd.DataFrame:
         time = "time"
         col = "total"
-        date_format = "%Y-%m-%d %H:%i:00"
-        return self.download(col, time, date_format)
+        date_format = "%Y-%m-%d %H:%M:00"
+        return self.download(time, col, date_format)
         
         
         
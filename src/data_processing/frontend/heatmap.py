@@ -3,23 +3,29 @@ import pandas as pd
 import numpy as np
 from data_processing.frontend.frontend_processing import FrontendProcessingImplementation
 from data_processing.custom_exceptions.exceptions import EmptyFrontendException, WrongCordinatesException
+from data_processing.db_connection.tables import HEATMAP_CACHE_TABLE
+from data_processing.frontend.encoder import encode, encode_grids, heatmap_document, get_heatmap_format
 
 
 
 class Heatmap(FrontendProcessingImplementation):
 
 
-    def download(self, col: str) -> pd.DataFrame:
+    def download(self, col: str, start: int = None) -> pd.DataFrame:
+        since = "" if start is None else f" AND {col} >= {int(start)}"
         query = f"SELECT value, time, x, y, z, {col} FROM {self.table_time} WHERE round_id ='{self.round_id}' \
-                AND observable_name = '{self.observable_name}' AND x >= 0 and y >= 0 ORDER BY TIME ASC"
+                AND observable_name = '{self.observable_name}' AND x >= 0 and y >= 0{since} ORDER BY TIME ASC"
         df = pd.read_sql(query, con=self.cnx)
         return df
                 
                 
-    def get_time_stamps(self, col: str) -> pd.DataFrame:
-        query = f"SELECT DISTINCT {col}, time FROM {self.table_space} WHERE round_id='{self.round_id}' and observable_name='{self.observable_name}' ORDER BY TIME ASC"
-        df = pd.read_sql(query, con=self.cnx)
-        return df
+    def get_time_stamps(self, col: str, start: int = None) -> pd.DataFrame:
+        # the over space table is shared with the graph of the event
+        df = self.context.get_table(self.table_space)[[col, 'time']]
+        if start is not None:
+            df = df[df[col] >= int(start)]
+        df = df.assign(time=pd.to_datetime(df['time'])).drop_duplicates()
+        return df.sort_values(by=['time'], kind='stable').reset_index(drop=True)
     
     
     def check_cordinates(self, x, y) -> None:
@@ -28,6 +34,27 @@ class Heatmap(FrontendProcessingImplementation):
         
         if is_x or is_y:
             raise WrongCordinatesException(self.round_id, x, y, "Wrong cordinates exception")
+
+    def get_heatmap_json(self, labels: List[str], grids: List[np.ndarray], date: List, plot: str) -> str:
+        '''
+            Returns the heatmap document of the grids in the format configured for the plot, see encoder.encode_grids.
+        '''
+        format_ = get_heatmap_format(plot)
+        decimals = self.get_decimals()
+        try:
+            payloads = encode_grids(grids, format_, decimals)
+        except OverflowError as e:
+            self.log_overflow(e)
+            format_ = 'float32'
+            payloads = encode_grids(grids, format_, decimals)
+        return self.get_document_json(dict(zip(labels, payloads)), date, format_, decimals)
+
+    def log_overflow(self, e: OverflowError) -> None:
+        if self.logging is not None:
+            self.logging.warning(f"{e} for round_id={self.round_id}, observable name = {self.observable_name}, using float32")
+
+    def get_document_json(self, data: dict, date: List, format_: str, decimals: int) -> str:
+        return encode(heatmap_document(data, date, format_, (self.x_dim, self.y_dim), decimals), decimals)
         
         
         
@@ -35,8 +62,8 @@ class Heatmap(FrontendProcessingImplementation):
         
 class HeatmapLatest(Heatmap):
     
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
         self.table_time = f"event_latest_over_time_{observable_name}"
         self.table_space = f"event_latest_over_space_{observable_name}"
         
@@ -46,7 +73,6 @@ class HeatmapLatest(Heatmap):
         
         if df.empty:
             raise EmptyFrontendException(self.round_id, self.observable_name, f"There is no latest event data and frontend event for latest has failed round_id={self.round_id}, observable name = {self.observable_name}")
-        latest = {}
         
         x = df.loc[:, 'x'].values
         y = df.loc[:, 'y'].values
@@ -61,119 +87,171 @@ class HeatmapLatest(Heatmap):
         ts = pd.to_datetime(str(t[-1])) 
         timestamp = ts.strftime("%d-%m-%y")
         day_of_production = [str(self.pc_details.get_day_of_production(ts))]
-        latest[timestamp] = out.tolist()
-  
-
-        data = self.get_json(latest, day_of_production)
+        data = self.get_heatmap_json([timestamp], [out], day_of_production, "latest")
         
         # upload data
         self.upload(data=data, event_type="latest", type_of_plot="heatmap")
         
         
-class HeatmapRound(Heatmap):
-    
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
-        self.table_time = f"event_round_over_time_{observable_name}"
-        self.table_space = f"event_round_over_space_{observable_name}"
-        
+class HeatmapSlices(Heatmap):
+    '''
+        A heatmap with one grid per round or day, updated incrementally.
+
+        Notes
+        --------
+        The slices already in the heatmap document of frontend_data are recorded in HEATMAP_CACHE_TABLE. An event only downloads
+        the slices from the last cached one on, since that one can still change, builds their grids and patches the stored
+        document with JSON_MERGE_PATCH. The grids of the previous slices are neither rebuilt nor serialized again. Without a
+        cached document in the configured format the whole heatmap is built and uploaded like before. The slice before the
+        last cached one is downloaded too as the base of the delta format, it is not patched.
+    '''
+
+    col = None
+    event_type = None
+
     def process(self) -> None:
-        last_dim = self.data_events.get_last_updated_round()
-        df = self.download(col="round_number")
-        
-        if df.empty:
-            raise EmptyFrontendException(self.round_id, self.observable_name, f"There is no round data and frontend event for round has failed round_id={self.round_id}, observable name = {self.observable_name}")
-        timestamp = self.get_time_stamps(col="round_number")
-        ts = timestamp['time'].values
-        round_number = timestamp['round_number'].values
-
-        x = df['x'].values
-        y = df['y'].values
-        v = df['value'].values
-        r = df['round_number'].values
+        self.format = get_heatmap_format(self.event_type)
+        self.decimals = self.get_decimals()
+        try:
+            self.update()
+        except OverflowError as e:
+            # the values do not fit in the delta format, the whole heatmap is built as float32
+            self.log_overflow(e)
+            self.format = 'float32'
+            self.update()
+
+    def update(self) -> None:
+        cached = self.get_cached_slices()
+        if not cached.empty and self.has_document():
+            last = int(cached['slice'].iloc[-1])
+            base = int(cached['slice'].iloc[-2]) if len(cached) > 1 else last
+            slices = self.encode_slices(self.get_slices(base))
+            slices = slices[slices['slice'] >= last]
+            self.patch(cached, slices)
+        else:
+            slices = self.encode_slices(self.get_slices())
+            if slices.empty:
+                raise EmptyFrontendException(self.round_id, self.observable_name, f"There is no {self.event_type} data and frontend event for {self.event_type} has failed round_id={self.round_id}, observable name = {self.observable_name}")
+            data = self.get_document_json(dict(zip(slices['label'], slices['grid'])), slices['day_of_production'].tolist(), self.format, self.decimals)
+            # upload data
+            self.upload(data=data, event_type=self.event_type, type_of_plot="heatmap")
+            self.clear_cache()
+        self.update_cache(slices)
+
+    def get_slices(self, start: int = None) -> pd.DataFrame:
+        '''
+            Returns the slice, label, day of production and grid of every slice from start on, all of them without start.
+        '''
+        df = self.download(col=self.col, start=start)
+        timestamp = self.get_time_stamps(col=self.col, start=start).drop_duplicates(subset=[self.col], keep='last')
+        timestamp = timestamp.sort_values(by=[self.col]).reset_index(drop=True)
+        slices = timestamp[self.col].values.astype(np.int64)
+
+        df = df[df[self.col].isin(slices)]
+        x = df['x'].values.astype(np.int64)
+        y = df['y'].values.astype(np.int64)
         self.check_cordinates(x, y)
-        out = np.full([last_dim + 1, self.x_dim, self.y_dim], np.nan, dtype=np.float64)
-        out[r, x, y] = v
+        out = np.full([len(slices), self.x_dim, self.y_dim], np.nan, dtype=np.float64)
+        out[np.searchsorted(slices, df[self.col].values.astype(np.int64)), x, y] = df['value'].values
         with np.errstate(invalid='ignore'):
             out[out < 0] = 0
             out = np.round(out, decimals=3)
-        round, day_of_production = self.dict_(out.tolist(), ts, round_number)
-        data = self.get_json(round, day_of_production)
-        # upload data
-        self.upload(data=data, event_type="round", type_of_plot="heatmap")
-        
-        
+
+        times = pd.to_datetime(timestamp['time'])
+        return pd.DataFrame({
+                    'slice': slices,
+                    'label': [self.get_label(n, ts) for n, ts in zip(slices, times)],
+                    'day_of_production': [self.get_day(n, ts) for n, ts in zip(slices, times)],
+                    'grid': list(out),
+                })
+
+    def encode_slices(self, slices: pd.DataFrame) -> pd.DataFrame:
+        slices['grid'] = encode_grids(list(slices['grid']), self.format, self.decimals)
+        return slices
+
+    def get_label(self, n: int, ts: pd.Timestamp) -> str:
+        pass
+
+    def get_day(self, n: int, ts: pd.Timestamp) -> int:
+        pass
+
+    def patch(self, cached: pd.DataFrame, slices: pd.DataFrame) -> None:
+        # a recomputed slice whose label changed is removed, merge patch deletes the keys set to null
+        replaced = cached[cached['slice'].isin(slices['slice'])]
+        data = {label: None for label in replaced['label'] if label not in set(slices['label'])}
+        data.update(zip(slices['label'], slices['grid']))
+        kept = cached[~cached['slice'].isin(slices['slice'])]
+        days = pd.concat([kept[['slice', 'day_of_production']], slices[['slice', 'day_of_production']]]).sort_values(by=['slice'])
+        query = f"UPDATE {self.table} SET data = JSON_MERGE_PATCH(data, %s) WHERE event_type=%s AND type_of_plot=%s AND round_id=%s AND observable_name=%s"
+        data = self.get_document_json(data, [int(day) for day in days['day_of_production']], self.format, self.decimals)
+        row = (data, self.event_type, "heatmap", self.round_id, self.observable_name)
+        self.forget_content_hash(self.event_type, "heatmap")
+        self.cursor.execute(query, row)
+        self.cnx.commit()
+
+    def has_document(self) -> bool:
+        # documents written before the format tag or in another format are rebuilt
+        query = f"SELECT JSON_UNQUOTE(JSON_EXTRACT(data, '$.format')) FROM {self.table} WHERE event_type='{self.event_type}' AND type_of_plot='heatmap' AND round_id='{self.round_id}' AND observable_name='{self.observable_name}' LIMIT 1"
+        self.cursor.execute(query)
+        row = self.cursor.fetchone()
+        return row is not None and row[0] == self.format
+
+    def get_cached_slices(self) -> pd.DataFrame:
+        query = f"SELECT slice, label, day_of_production FROM {HEATMAP_CACHE_TABLE} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' AND event_type='{self.event_type}' ORDER BY slice ASC"
+        return pd.read_sql(query, con=self.cnx)
+
+    def clear_cache(self) -> None:
+        query = f"DELETE FROM {HEATMAP_CACHE_TABLE} WHERE round_id=%s AND observable_name=%s AND event_type=%s"
+        self.cursor.execute(query, (self.round_id, self.observable_name, self.event_type))
+        self.cnx.commit()
+
+    def update_cache(self, slices: pd.DataFrame) -> None:
+        query = f"INSERT INTO {HEATMAP_CACHE_TABLE} (round_id, observable_name, event_type, slice, label, day_of_production) VALUES (%s, %s, %s, %s, %s, %s) \
+                ON DUPLICATE KEY UPDATE label=VALUES(label), day_of_production=VALUES(day_of_production)"
+        rows = [(self.round_id, self.observable_name, self.event_type, int(n), label, int(day)) for n, label, day in zip(slices['slice'], slices['label'], slices['day_of_production'])]
+        self.cursor.executemany(query, rows)
+        self.cnx.commit()
         
-    # This version only shows available data
-    def dict_(self, data, timestamp, r):
-        updated_data = {}
-        day_of_production = []
-        for (r, timestamp) in zip(r, timestamp):
-            ts = pd.to_datetime(str(timestamp)) 
-            day_of_production.append(int(self.pc_details.get_day_of_production(ts)))
-            date = ts.strftime("%d-%m %H:%M")
-            '''
-                Try and catch here because I am getting the round numbers from temperature and sometimes especially for anomalies they might not be equal. I am doing this so that the
-                Time stamps are consisitent. When we move to the round counter this can be removed.
-            '''
-            try:
-                updated_data[f"Round {r} ({date})"] = data[r]
-            except:
-                continue
-        return updated_data, day_of_production
         
+class HeatmapRound(HeatmapSlices):
+
+    col = "round_number"
+    event_type = "round"
+    
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
+        self.table_time = f"event_round_over_time_{observable_name}"
+        self.table_space = f"event_round_over_space_{observable_name}"
+
+    def get_label(self, n: int, ts: pd.Timestamp) -> str:
+        return f"Round {n} ({ts.strftime('%d-%m %H:%M')})"
+
+    def get_day(self, n: int, ts: pd.Timestamp) -> int:
+        return int(self.pc_details.get_day_of_production(ts))
         
         
-class HeatmapNewDay(Heatmap):
+class HeatmapNewDay(HeatmapSlices):
+
+    col = "day"
+    event_type = "new_day"
     
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
         self.table_time = f"event_new_day_over_time_{observable_name}"
         self.table_space = f"event_new_day_over_space_{observable_name}"
-        
-    
-    def process(self):
-        last_dim = self.data_events.get_last_updated_day_number()
-        df = self.download(col="day")
-        if df.empty:
-            raise EmptyFrontendException(self.round_id, self.observable_name, f"There is no new day data and frontend event for new day has failed round_id={self.round_id}, observable name = {self.observable_name}")
-
-        timestamp = self.get_time_stamps(col="day")
-        ts = timestamp['time'].values
-        day_unique = timestamp['day'].values
-        x = df['x'].values
-        y = df['y'].values
-        v = df['value'].values
-        d = df['day'].values
-        t = df['time'].values
-        self.check_cordinates(x, y)
-        out = np.full([last_dim + 1, self.x_dim, self.y_dim], np.nan, dtype=np.float64)
-        out[d, x, y] = v
-        with np.errstate(invalid='ignore'):
-            out[out < 0] = 0
-            out = np.round(out, decimals=3)
-        days = self.dict_(out.tolist(), ts, day_unique)
-        
-        data = self.get_json(days, day_unique.tolist())
-        
-        # upload data
-        self.upload(data=data, event_type="new_day", type_of_plot="heatmap")
 
-    # This version only shows available data
-    def dict_(self, data, timestamp, days):
-        updated_data = {}
-        for (day, timestamp) in zip(days, timestamp):
-            ts = pd.to_datetime(str(timestamp)) 
-            date = ts.strftime("%d-%m-%y")
-            updated_data[f"Day {day} ({date})"] = data[day]
-        return updated_data
+    def get_label(self, n: int, ts: pd.Timestamp) -> str:
+        return f"Day {n} ({ts.strftime('%d-%m-%y')})"
+
+    def get_day(self, n: int, ts: pd.Timestamp) -> int:
+        return int(n)
         
         
         
 class HeatmapTimeofDay(Heatmap):
     
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
         self.table_time = f"event_time_of_day_over_time_{observable_name}"
         self.table_space = f"event_time_of_day_over_space_{observable_name}"
         
@@ -183,34 +261,27 @@ class HeatmapTimeofDay(Heatmap):
         if df.empty:
             raise EmptyFrontendException(self.round_id, self.observable_name, f"There is no time of day data and frontend event for time of day has failed round_id={self.round_id}, observable name = {self.observable_name}")
         timestamp = self.get_time_stamps(col="time_of_day")
-        timestamp = timestamp.loc[:, "time"].values
-        df = df.set_index('time')
-        days = {}
-        day_of_production = []
-        default = np.full([self.x_dim, self.y_dim], np.nan, dtype=np.float64)
-        for time in timestamp:
-            val = df.loc[df.index == time, :]
-            x = val[ 'x'].values
-            y = val['y'].values
-            v = val['value'].values
-            t = val.index.values
-            d = val['day'].values
-            self.check_cordinates(x, y)
-            out = default.copy()
-            out[x, y] = v
-            with np.errstate(invalid='ignore'):
-                out[out == 0] = np.nan
-                out[out < 0] = 0
-                out = np.round(out, decimals=3)
-            try:
-                ts = pd.to_datetime(str(t[0])) 
-                day_of_production.append(int(d[-1]))
-                date = ts.strftime("%d-%m %H:%M")
-                days[f'{date}'] = out.tolist()
-            except:
-                continue
-        data = self.get_json(days, day_of_production)
+        windows = pd.Index(pd.to_datetime(timestamp.loc[:, "time"]).drop_duplicates())
+
+        # every row goes to the grid of its window in one scatter instead of masking the table once per window
+        index = windows.get_indexer(pd.to_datetime(df['time']))
+        df = df[index >= 0]
+        index = index[index >= 0]
+        x = df['x'].values.astype(np.int64)
+        y = df['y'].values.astype(np.int64)
+        self.check_cordinates(x, y)
+        out = np.full([len(windows), self.x_dim, self.y_dim], np.nan, dtype=np.float64)
+        out[index, x, y] = df['value'].values
+        with np.errstate(invalid='ignore'):
+            out[out == 0] = np.nan
+            out[out < 0] = 0
+            out = np.round(out, decimals=3)
+
+        # the windows without rows are left out and the day of a window is the one of its last row
+        last_day = pd.Series(df['day'].values).groupby(index).last()
+        day_of_production = [int(day) for day in last_day.values]
+        labels = [windows[i].strftime("%d-%m %H:%M") for i in last_day.index]
+        data = self.get_heatmap_json(labels, [out[i] for i in last_day.index], day_of_production, "time_of_day")
         
         # upload data
         self.upload(data=data, event_type="time_of_day", type_of_plot="heatmap")
-        
\ No newline at end of file
@@ -8,34 +8,38 @@ from data_processing.custom_exceptions.exceptions import EmptyFrontendException
 
 class TimeInterval(FrontendProcessingImplementation):
 
-    def download(self, col: str, group_by: str) -> pd.DataFrame:
-        query = f"SELECT {col} as value, DATE_FORMAT(time, '%Y-%m-%d') AS time from {self.table_hourly} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' GROUP BY {group_by}(time)"
-        df = pd.read_sql(query, con=self.cnx)
-        return df      
+    def download(self, col: str) -> pd.DataFrame:
+        # the rollups are maintained by the hourly overview event
+        # the day, week and month graphs share one read of the rollup table
+        df = self.context.get_table(self.table_rollup)
+        df = df[df['period'] == self.event]
+        return self.get_series(df, col, '%Y-%m-%d')
+
+    def get_series(self, df: pd.DataFrame, col: str, date_format: str) -> pd.DataFrame:
+        df = df.assign(time=pd.to_datetime(df['time'])).sort_values(by=['time'], kind='stable')
+        return pd.DataFrame({'value': df[col].values, 'time': df['time'].dt.strftime(date_format).values})
                 
     def process(self) -> None:
         df = self.get_download()
         if df.empty:
             raise EmptyFrontendException(self.round_id, self.observable_name, f"Frontend graph for {self.event} has failed because there is not data for round_id={self.round_id}, observable name = {self.observable_name}")
-        data = df.loc[:, 'value'].values.tolist()
+        data = df.loc[:, 'value'].values.astype(np.float64)
         timestamp = df.loc[:, 'time'].values.tolist()
-        data = self.get_json(data, timestamp)
         
-        # upload data
-        self.upload(data=data, event_type=self.event, type_of_plot="graph")
+        # upload data, full and display resolution
+        self.upload_graph(data, timestamp, self.event)
         
         
         
 class Hour(TimeInterval):
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
         self.table_hourly = f"event_hourly_overview_{observable_name}"
         self.event = "hour"
         
     def download(self, col: str) -> pd.DataFrame:
-        query = f"SELECT {col} as value, DATE_FORMAT(time, '%Y-%m-%d %H') as time from {self.table_hourly} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' ORDER BY time ASC"
-        df = pd.read_sql(query, con=self.cnx)
-        return df
+        # the hourly overview table is shared with the hourly overview heatmap
+        return self.get_series(self.context.get_table(self.table_hourly), col, '%Y-%m-%d %H')
         
 class HourAmbient(Hour):
     
@@ -50,50 +54,50 @@ class HourAnomaly(Hour):
     
     
 class Day(TimeInterval):
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
-        self.table_hourly = f"event_hourly_overview_{observable_name}"
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
+        self.table_rollup = f"event_rollup_{observable_name}"
         self.event = "day"   
     
 class DayAmbient(Day):
     
     def get_download(self):
-        return self.download(col="mean", group_by="DAYOFYEAR")
+        return self.download(col="mean")
     
 class DayAnomaly(Day):
     
     def get_download(self):
-        return self.download(col="total", group_by="DAYOFYEAR")
+        return self.download(col="total")
     
     
 class Week(TimeInterval):
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
-        self.table_hourly = f"event_hourly_overview_{observable_name}"
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
+        self.table_rollup = f"event_rollup_{observable_name}"
         self.event = "week"      
     
 class WeekAmbient(Week):
     
     def get_download(self):
-        return self.download(col="mean", group_by="WEEK")
+        return self.download(col="mean")
     
 class WeekAnomaly(Week):
     
     def get_download(self):
-        return self.download(col="total", group_by="WEEK")
+        return self.download(col="total")
     
 class Month(TimeInterval):
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
-        self.table_hourly = f"event_hourly_overview_{observable_name}"
-        self.event = "week"      
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
+        self.table_rollup = f"event_rollup_{observable_name}"
+        self.event = "month"      
     
 class MonthAmbient(Month):
     
     def get_download(self):
-        return self.download(col="mean", group_by="MONTH")
+        return self.download(col="mean")
     
 class MonthAnomaly(Month):
     
     def get_download(self):
-        return self.download(col="total", group_by="MONTH")
+        return self.download(col="total")
@@ -8,16 +8,18 @@ from data_processing.custom_exceptions.exceptions import EmptyFrontendException
 
 class HourlyOverview(FrontendProcessingImplementation):
     
-    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging):
-        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging)
+    def __init__(self, cnx, round_id, observable_name, x_dim, y_dim, pc_details=None, data_events=None, logging=None, context=None):
+        super().__init__(cnx, round_id, observable_name, x_dim, y_dim, pc_details, data_events, logging, context)
         self.table_hourly = f"event_hourly_overview_{observable_name}"
         self.event = "hourly_overview"
 
 
     def download(self, col: str) -> pd.DataFrame:
-        query = f"SELECT {col} as value, time, day, CAST(DATE_FORMAT(time, '%k')AS UNSIGNED) AS hour from {self.table_hourly} WHERE round_id='{self.round_id}' AND observable_name='{self.observable_name}' GROUP BY DATE_FORMAT(time, '%Y-%m-%d %H:00:00')"
-        df = pd.read_sql(query, con=self.cnx)
-        return df      
+        # the hourly overview table is shared with the hour graph, one row per hour like the former GROUP BY
+        df = self.context.get_table(self.table_hourly)
+        time = pd.to_datetime(df['time'])
+        df = pd.DataFrame({'value': df[col].values, 'time': time.values, 'day': df['day'].values, 'hour': time.dt.hour.values})
+        return df[~time.dt.floor('h').duplicated().values].reset_index(drop=True)
                 
     def process(self) -> None:
         dim = self.data_events.last_data[1] + 1
@@ -36,7 +38,6 @@ class HourlyOverview(FrontendProcessingImplementation):
         hour_matrix[hour, days_data] = value
         with np.errstate(invalid='ignore'):
             hour_matrix[hour_matrix < 0] = 0
-        hour_matrix = hour_matrix.tolist()
         day = day.tolist()
         data = self.get_json(hour_matrix, day)
         
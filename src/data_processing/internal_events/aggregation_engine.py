@@ -0,0 +1,108 @@
+from typing import List, Union
+import pandas as pd
+
+
+SPACE_COLUMNS = ['mean', 'sd', 'total', 'time']
+
+
+class AggregationEngine:
+    '''
+        Aggregates a batch of round data rows for every event window in memory.
+
+        Parameters
+        ----------
+        aggregation: ambient or anomaly, the same split as get_aggregations_ambient and get_aggregations_anomaly.
+
+        Notes
+        --------
+        The events used to run one sql GROUP BY per window (latest, round, day, time of day quadrant, hour). Here the rows are
+        downloaded once and every window is a column of the batch (round_number, day_of_production, a quadrant window id, the hour),
+        so all windows of a type are aggregated by one groupby instead of one query each.
+        Over space: ambient gives the mean and the sample standard deviation, anomaly the standard deviation and the sum, like
+        get_aggregations_ambient and get_aggregations_anomaly. Over time (day and time of day): one value per x, y, the rounded
+        mean for ambient conditions and the max for anomalies, like the DownloadNewDay* and DownloadTimeofDay* queries.
+
+        References
+        -----------
+        https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.core.groupby.DataFrameGroupBy.agg.html
+    '''
+
+    def __init__(self, aggregation: str):
+        self.aggregation = aggregation
+
+    def prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy()
+        df['time'] = pd.to_datetime(df['time'])
+        return df.sort_values(by=['time'], kind='stable').reset_index(drop=True)
+
+    def over_space(self, df: pd.DataFrame, keys: Union[str, List[str], None] = None, ddof: int = 1, decimals: int = None) -> pd.DataFrame:
+        '''
+            Returns the mean, sd, total and last time of every window.
+
+            Parameters
+            ----------
+            df: the rows sorted by time.
+            keys: the window column(s), None aggregates all the rows as one window.
+            ddof: 1 for the pandas standard deviation, 0 for the mysql STDDEV.
+            decimals: round the aggregations like the sql ROUND does.
+
+            Returns
+            --------
+            data frame with the keys, mean, sd, total and time columns
+        '''
+        if keys is None:
+            df = df.assign(_all=0)
+            keys = ['_all']
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        grouped = df.groupby(keys, sort=True)
+        space = grouped['value'].agg(mean='mean', total='sum')
+        space['sd'] = grouped['value'].std(ddof=ddof)
+        space['time'] = grouped['time'].last()
+        if decimals is not None:
+            space[['mean', 'sd', 'total']] = space[['mean', 'sd', 'total']].round(decimals)
+        space = space.astype({'mean': object, 'sd': object, 'total': object})
+        if self.aggregation == 'anomaly':
+            space['mean'] = None
+        else:
+            space['total'] = None
+        space = space[SPACE_COLUMNS].reset_index()
+        if keys == ['_all']:
+            space = space.drop(columns=['_all'])
+        return space
+
+    def over_time(self, df: pd.DataFrame, keys: Union[str, List[str]]) -> pd.DataFrame:
+        '''
+            Returns one row per window and x, y with the cell value, the first time and the first of the other columns.
+
+            Parameters
+            ----------
+            df: the rows sorted by time.
+            keys: the window column(s).
+
+            Returns
+            --------
+            data frame
+        '''
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        df = df[df['x'] != -1]
+        grouped = df.groupby(keys + ['x', 'y'], sort=True)
+        if self.aggregation == 'anomaly':
+            value = grouped['value'].max()
+        else:
+            value = grouped['value'].mean().round(2)
+        cells = grouped.first()
+        cells['value'] = value
+        return cells.reset_index()
+
+    def midday(self, time: pd.Series) -> pd.Series:
+        return time.dt.normalize() + pd.Timedelta(hours=12)
+
+    def to_rows(self, df: pd.DataFrame, columns: List[str]) -> List[List]:
+        df = df[columns].copy()
+        if 'time' in df:
+            df['time'] = pd.to_datetime(df['time']).dt.strftime("%Y-%m-%d %H:%M:%S")
+        return df.astype(object).where(df.notna(), None).values.tolist()
+
+    def get_aggregations(self, space: pd.Series) -> tuple:
+        ''' the (mean, sd, total) tuple of one window as get_aggregations returns it '''
+        return tuple(None if value is None else float(value) for value in space[['mean', 'sd', 'total']])
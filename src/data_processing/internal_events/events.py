@@ -4,8 +4,9 @@ from data_processing.data_processing_events.data_processing_events import DataPr
 from data_processing.production_cycle_details.production_cycle_details import ProductionCycleDetails
 from data_processing.event_handlers.event_handler import trigger_event
 from data_processing.event_handlers.events import Events
+from data_processing.internal_events.aggregation_engine import AggregationEngine
 import pandas as pd
-from typing import Union, Tuple, Any, List
+from typing import Union, Tuple, Any, List, Dict
 import datetime
 import logging
 
@@ -55,6 +56,9 @@ class InternalEvents(ABC):
 
 class InternalEventsGeneric(InternalEvents):
 
+    # ambient or anomaly, set by the subclasses that aggregate with the engine
+    aggregation = None
+
     def __init__(
                     self,
                     cnx: Any = None,
@@ -79,10 +83,19 @@ class InternalEventsGeneric(InternalEvents):
             self.data_events = data_events
             self.table = f"round_data_{observable_name}"
             self.logging = logging
+            self.engine = AggregationEngine(self.aggregation)
     
     def process(self) -> None:
         pass
 
+    def pending_window(self) -> Union[Dict[str, Any], None]:
+        ''' the DownloadRoundData range of the windows completed since the last run, None when there is none '''
+        return None
+
+    def aggregate(self, df: pd.DataFrame) -> None:
+        ''' writes the over time and over space rows of the windows in the rows of pending_window, sorted by time '''
+        pass
+
     def get_mean(self, df: pd.DataFrame) -> float:
         return df.mean()["value"]
 
@@ -1,6 +1,7 @@
 from data_processing.internal_events.events import InternalEventsGeneric
 import pandas as pd
 from data_processing.event_handlers.events import Events
+from data_processing.data_cleaning.hourly_accumulators import hourly_statistics, rebuild_hourly_accumulators, rollup_hourly_accumulators, has_hourly_accumulators, HOUR_FORMAT
 from typing import Tuple, List, Union
 
 
@@ -9,40 +10,80 @@ class HourlyOverviewEvent(InternalEventsGeneric):
     def __init__(self, cnx, round_id, robot_id, observable_name, type_, xDim, yDim, download, data_events, pc_details, logging):
         super().__init__(cnx, round_id, robot_id, observable_name, type_,  xDim, yDim, download, data_events, pc_details, logging)
         self.table_over_space = f"event_hourly_overview_{self.observable_name}"
+        self.table_accumulator = f"event_hourly_accumulator_{self.observable_name}"
         self.params = { "roundId": round_id, "robotId": robot_id, "observableName": observable_name, "xDim": xDim, 'yDim': yDim, "event_type": Events.NEW_HOURLY_OVERVIEW}
 
 
-    def download_data(self, time: int) -> pd.DataFrame:
-        return self.download(time=time)
+    def download_data(self) -> pd.DataFrame:
+        return self.download()
 
     def process(self) -> None:
-        time = self.data_events.get_last_hourly_overview()
-        df = self.download_data(time)
+        '''
+            Updates the overview of the hours whose accumulators changed since the last run.
+
+            Notes
+            --------
+            The ingest adds every upload to the hourly accumulators and marks their hours dirty, so only those hours are read and
+            written here instead of grouping every row since the last overview. The first run of a round builds the accumulators
+            from the round data, which also covers the hours stored before they existed. The day, week and month rollups read by
+            the frontend are updated from the accumulators of the periods of the changed hours.
+        '''
+        if not has_hourly_accumulators(self.cnx, self.observable_name, self.round_id):
+            rebuild_hourly_accumulators(self.cnx, self.observable_name, self.round_id)
+        df = self.download_data()
         if df.empty:
             return
-        print(df)
-        df = self.convert_time_to_string(df)
-        to_list = df.values.tolist()
-        self.update_average_over_space(to_list)
+        df['time'] = pd.to_datetime(df['time'])
+
+        hours = df[df['count'] > 0].reset_index(drop=True)
+        stats = hourly_statistics(hours, self.aggregation)
+        stats['time'] = hours['time']
+        stats['round_number'] = hours['round_number']
+        stats['day'] = hours['day']
+        stats['round_id'] = self.round_id
+        stats['observable_name'] = self.observable_name
+        self.update_average_over_space(self.engine.to_rows(stats, ['mean', 'sd', 'total', 'time', 'round_number', 'day', 'round_id', 'observable_name']))
+        self.delete_empty_hours(df[df['count'] <= 0])
+        rollup_hourly_accumulators(self.cnx, self.observable_name, self.round_id, df['time'])
+        self.clear_dirty(df)
         self.create_frontend_events(self.params)
 
-    def update_average_over_space(self, df: Tuple[Union[float, str]]) -> None:
+    def update_average_over_space(self, df: List[Tuple[Union[float, str]]]) -> None:
         # Going to have a problem with None
         query = f"INSERT INTO {self.table_over_space} (mean, sd, total, time, round_number, day, round_id, observable_name) \
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE mean =VALUES(mean), sd=VALUES(sd), total=VALUES(total), time=VALUES(time)"
         self.cursor.executemany(query, df)
         self.cnx.commit()
 
+    def delete_empty_hours(self, df: pd.DataFrame) -> None:
+        # hours left without valid rows after a round was invalidated
+        if df.empty:
+            return
+        query = f"DELETE FROM {self.table_over_space} WHERE time=%s AND round_id=%s AND observable_name=%s"
+        self.cursor.executemany(query, [(time, self.round_id, self.observable_name) for time in df['time'].dt.strftime(HOUR_FORMAT)])
+        self.cnx.commit()
+
+    def clear_dirty(self, df: pd.DataFrame) -> None:
+        # an hour changed again while this ran keeps a different dirty counter and stays dirty
+        query = f"UPDATE {self.table_accumulator} SET dirty=0 WHERE round_id=%s AND observable_name=%s AND time=%s AND dirty=%s"
+        rows = [(self.round_id, self.observable_name, time, int(dirty)) for time, dirty in zip(df['time'].dt.strftime(HOUR_FORMAT), df['dirty'])]
+        self.cursor.executemany(query, rows)
+        self.cnx.commit()
+
     def update_average_over_time(self, df: List[str]) -> None:
         pass
 
 class HourlyOverviewEventAmbientConditions(HourlyOverviewEvent):
 
+    aggregation = 'ambient'
+
     def get_aggregations(self, df: pd.DataFrame) -> Tuple[Union[float, None]]:
         pass
 
 class HourlyOverviewEventAnomaly(HourlyOverviewEvent):
 
+    aggregation = 'anomaly'
+
     def get_aggregations(self, df: pd.DataFrame) -> None:
         pass
         
\ No newline at end of file
@@ -24,22 +24,23 @@ class LatestEvent(InternalEventsGeneric):
         df = self.download_data(old_time)
         if df.empty:
             return
-        df = self.convert_time_to_string(df)
-        to_list = df.values.tolist()
-        self.update_average_over_time(to_list)
-        mean, sd, total = self.get_aggregations(df)
-        latest_time = self.get_time(df)
+        self.aggregate(self.engine.prepare(df), old_time)
+        self.create_frontend_events(self.params)
+
+    def aggregate(self, df: pd.DataFrame, old_time: datetime) -> None:
+        self.update_average_over_time(self.engine.to_rows(df, ['value', 'time', 'x', 'y', 'z', 'round_id', 'observable_name']))
+        space = self.engine.over_space(df).iloc[0]
+        mean, sd, total = self.engine.get_aggregations(space)
+        latest_time = space['time'].strftime("%Y-%m-%d %H:%M:%S")
         params = (mean, sd, total, latest_time, str(old_time), self.round_id, self.observable_name)
         self.update_average_over_space(params)
 
-        self.create_frontend_events(self.params)
-
 
     def update_average_over_space(self, df: Tuple[Union[float, str]]) -> None:
         # I have not set a restriction on the db so I can't use upsert here
-        if df[4] == date(1970, 1, 1):
+        if df[4] == str(self.data_events.default_time):
             query = f"INSERT INTO {self.table_over_space} (mean, sd, total, latest_time, old_time, round_id, observable_name) \
-                    VALUES (%s, %s, %s, %s, %s, %s)"
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)"
         else:
             query = f"UPDATE {self.table_over_space} set mean=%s, sd=%s, total=%s, latest_time=%s, old_time=%s WHERE round_id=%s AND observable_name=%s" 
         self.cursor.execute(query, df)
@@ -57,11 +58,15 @@ class LatestEvent(InternalEventsGeneric):
 
 class LatestEventAmbientConditions(LatestEvent):
 
+    aggregation = 'ambient'
+
     def get_aggregations(self, df: pd.DataFrame) -> Tuple[Union[float, None]]:
         return self.get_aggregations_ambient(df)
 
 class LatestEventAnomaly(LatestEvent):
 
+    aggregation = 'anomaly'
+
     def get_aggregations(self, df: pd.DataFrame) -> None:
         return self.get_aggregations_anomaly(df)
         
\ No newline at end of file
@@ -1,7 +1,7 @@
 from data_processing.internal_events.events import InternalEventsGeneric
 import pandas as pd
 from data_processing.event_handlers.events import Events
-from typing import Tuple, List, Union
+from typing import Tuple, List, Union, Dict
 
 
 
@@ -14,32 +14,38 @@ class NewDayEvent(InternalEventsGeneric):
         self.params = { "roundId": round_id, "robotId": robot_id, "observableName": observable_name, "xDim": xDim, 'yDim': yDim, "event_type": Events.NEW_NEW_DAY}
 
 
-    def download_data(self, day: int) -> pd.DataFrame:
-        return self.download(day=day)
+    def download_data(self, day_start: int, day_end: int) -> pd.DataFrame:
+        return self.download(day_start=day_start, day_end=day_end)
 
-    def process(self) -> None:
+    def pending_window(self) -> Union[Dict[str, int], None]:
         old_day = max(self.data_events.get_last_updated_day_number(), 0)
         current_day = max(self.data_events.last_data[1], 0)
+        if old_day < current_day:
+            return {'day_start': old_day, 'day_end': current_day}
+        return None
 
-        for day in range(old_day, current_day):
-            df = self.download_data(day)
-
-            if df.empty:
-                continue
-            df = self.convert_time_to_string(df)
-            to_list = df.values.tolist()
-            self.update_average_over_time(to_list)
-            mean, sd, total = self.get_aggregations(df)
-            time = self.get_time(df)
-            params = (mean, sd, total, time, day, self.round_id, self.observable_name)
-            self.update_average_over_space(params)
+    def process(self) -> None:
+        # every pending day is downloaded at once and aggregated per day by the engine
+        window = self.pending_window()
+        df = self.download_data(**window) if window is not None else pd.DataFrame()
+        if not df.empty:
+            self.aggregate(self.engine.prepare(df))
         self.create_frontend_events(self.params)
 
-    def update_average_over_space(self, df: Tuple[Union[float, str]]) -> None:
+    def aggregate(self, df: pd.DataFrame) -> None:
+        cells = self.engine.over_time(df, 'day_of_production')
+        cells['time'] = self.engine.midday(cells['time'])
+        self.update_average_over_time(self.engine.to_rows(cells, ['value', 'time', 'x', 'y', 'z', 'round_id', 'day_of_production', 'observable_name']))
+        space = self.engine.over_space(cells, 'day_of_production')
+        space['round_id'] = self.round_id
+        space['observable_name'] = self.observable_name
+        self.update_average_over_space(self.engine.to_rows(space, ['mean', 'sd', 'total', 'time', 'day_of_production', 'round_id', 'observable_name']))
+
+    def update_average_over_space(self, df: List[Tuple[Union[float, str]]]) -> None:
         # Going to have a problem with None
         query = f"INSERT INTO {self.table_over_space} (mean, sd, total, time, day, round_id, observable_name) \
         VALUES (%s, %s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE mean =VALUES(mean), sd=VALUES(sd), total=VALUES(total), time=VALUES(time)"
-        self.cursor.execute(query, df)
+        self.cursor.executemany(query, df)
         self.cnx.commit()
 
     def update_average_over_time(self, df: List[str]) -> None:
@@ -52,11 +58,15 @@ class NewDayEvent(InternalEventsGeneric):
 
 class NewDayEventAmbientConditions(NewDayEvent):
 
+    aggregation = 'ambient'
+
     def get_aggregations(self, df: pd.DataFrame) -> Tuple[Union[float, None]]:
         return self.get_aggregations_ambient(df)
 
 class NewDayEventAnomaly(NewDayEvent):
 
+    aggregation = 'anomaly'
+
     def get_aggregations(self, df: pd.DataFrame) -> None:
         return self.get_aggregations_anomaly(df)
         
\ No newline at end of file
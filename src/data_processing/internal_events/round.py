@@ -1,7 +1,7 @@
 from data_processing.internal_events.events import InternalEventsGeneric
 import pandas as pd
 from data_processing.event_handlers.events import Events
-from typing import Tuple, List, Union
+from typing import Tuple, List, Union, Dict
 
 
 
@@ -14,45 +14,52 @@ class RoundEvent(InternalEventsGeneric):
 		self.params = { "roundId": round_id, "robotId": robot_id, "observableName": observable_name, "xDim": xDim, 'yDim': yDim, "event_type": Events.NEW_ROUND}
 
 
-	def download_data(self, round_number: str) -> pd.DataFrame:
-		return self.download(round_number=round_number)
+	def download_data(self, round_start: int, round_end: int) -> pd.DataFrame:
+		return self.download(round_start=round_start, round_end=round_end)
 
-	def process(self) -> None:
+	def pending_window(self) -> Union[Dict[str, int], None]:
 		current_round = self.data_events.get_last_updated_round()
 		old_round = self.data_events.last_data[0]
-		for round_number in range(current_round, old_round):
-			df = self.download_data(round_number)
-
-			if df.empty:
-				continue
-			df = self.convert_time_to_string(df)
-			to_list = df.values.tolist()
-			self.update_average_over_time(to_list)
-			mean, sd, total = self.get_aggregations(df)
-			time = self.get_time(df, round_number)
-			params = (mean, sd, total, time, round_number, self.round_id, self.observable_name)
-			self.update_average_over_space(params)
+		if current_round < old_round:
+			return {'round_start': current_round, 'round_end': old_round}
+		return None
+
+	def process(self) -> None:
+		# all the missing rounds are downloaded with one query and aggregated per round_number in memory
+		window = self.pending_window()
+		df = self.download_data(**window) if window is not None else pd.DataFrame()
+		if not df.empty:
+			self.aggregate(self.engine.prepare(df))
 		self.create_frontend_events(self.params)
 
-	def get_time(self, df, round_number) -> str:
-		query = f"Select time from round_counter where round_number='{round_number}' and round_id='{self.round_id}' and is_valid_round=1"
+	def aggregate(self, df: pd.DataFrame) -> None:
+		self.update_average_over_time(self.engine.to_rows(df, ['value', 'time', 'x', 'y', 'z', 'round_id', 'round_number', 'observable_name']))
+		space = self.engine.over_space(df, 'round_number')
+		space['time'] = self.get_time(df, space['round_number'])
+		space['round_id'] = self.round_id
+		space['observable_name'] = self.observable_name
+		self.update_average_over_space(self.engine.to_rows(space, ['mean', 'sd', 'total', 'time', 'round_number', 'round_id', 'observable_name']))
+
+	def get_time(self, df: pd.DataFrame, round_numbers: pd.Series) -> pd.Series:
+		'''
+			Returns the time of every round, the one of the round counter or else the middle of the first and last row of the round.
+		'''
+		rounds = ', '.join(f"'{round_number}'" for round_number in round_numbers)
+		query = f"Select round_number, time from round_counter where round_number in ({rounds}) and round_id='{self.round_id}' and is_valid_round=1"
 		self.cursor.execute(query)
-		time = self.cursor.fetchone()[0]
-
-		# Test this bit of code
-		if time is None:
-			x, y = df.shape
-			first_time = df.loc[0, "time"]
-			last_time = df.loc[x-1, "time"]
-			return start_time + (( end_time - start_time ) / 2 )
-		else:
-			return time
-
-	def update_average_over_space(self, df: Tuple[Union[float, str]]) -> None:
+		counter = {int(round_number): time for round_number, time in self.cursor.fetchall() if time is not None}
+
+		grouped = df.groupby('round_number')['time']
+		start_time, end_time = grouped.min(), grouped.max()
+		middle = start_time + ((end_time - start_time) / 2)
+		time = pd.to_datetime(round_numbers.map(counter))
+		return time.fillna(round_numbers.map(middle))
+
+	def update_average_over_space(self, df: List[Tuple[Union[float, str]]]) -> None:
 		# Going to have a problem with None
 		query = f"INSERT INTO {self.table_over_space} (mean, sd, total, time, round_number, round_id, observable_name) \
 		VALUES (%s, %s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE mean =VALUES(mean), sd=VALUES(sd), total=VALUES(total), time=VALUES(time)"
-		self.cursor.execute(query, df)
+		self.cursor.executemany(query, df)
 		self.cnx.commit()
 
 	def update_average_over_time(self, df: List[str]) -> None:
@@ -64,11 +71,15 @@ class RoundEvent(InternalEventsGeneric):
 
 class RoundEventAmbientConditions(RoundEvent):
 
+	aggregation = 'ambient'
+
 	def get_aggregations(self, df: pd.DataFrame) -> Tuple[Union[float, None]]:
 		return self.get_aggregations_ambient(df)
 
 class RoundEventAnomaly(RoundEvent):
 
+	aggregation = 'anomaly'
+
 	def get_aggregations(self, df: pd.DataFrame) -> None:
 		return self.get_aggregations_anomaly(df)
 		
\ No newline at end of file
@@ -1,9 +1,10 @@
 from data_processing.internal_events.events import InternalEventsGeneric
 import pandas as pd
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import datetime
 from data_processing.event_handlers.events import Events
-from data_processing.data_processing_events.data_processing_events import TimeofDayComputation
-from typing import Tuple, List, Union
+from data_processing.data_processing_events.data_processing_events import label_time_of_day, time_of_day_window_bounds
+from typing import Tuple, List, Union, Dict
 
 
 
@@ -16,44 +17,46 @@ class TimeofDayEvent(InternalEventsGeneric):
         self.params = { "roundId": round_id, "robotId": robot_id, "observableName": observable_name, "xDim": xDim, 'yDim': yDim, "event_type": Events.NEW_TIME_OF_DAY}
 
 
-    def download_data(self, time_start, time_end, quadrant, midpoint: int) -> pd.DataFrame:
-        return self.download(time_start=time_start, time_end=time_end, quadrant=quadrant, midpoint=midpoint)
+    def download_data(self, time_start: datetime, time_end: datetime) -> pd.DataFrame:
+        return self.download(time_start=time_start, time_end=time_end)
 
-    def process(self) -> None:
+    def pending_window(self) -> Union[Dict[str, datetime], None]:
         last_time = self.data_events.get_last_time_of_day()
         final_time = self.data_events.last_data[2]
-        current_quadrant = self.data_events.get_quadrant(last_time.time())
-        future_quadrant = self.data_events.get_quadrant(final_time.time())
-        t = TimeofDayComputation(last_time, current_quadrant)
-        final_start_time, final_end_time = t.reset_quadrants(final_time, future_quadrant)
-
-        # Trick / spaghetti code to reduce the hour in order to end while loop outside of the quadrant gotten in the round_data_table
-        final_start_time = final_start_time - timedelta(hours=1)
-        while last_time < final_start_time:
-            start_time, last_time = t.next_quadrant_times()
-            midpoint = start_time + (( last_time - start_time ) / 2 ) + timedelta(microseconds=500000)
-            quadrant = t.get_current_quadrant().value
-            df = self.download_data(start_time, last_time, quadrant, midpoint)
-
-            if df.empty:
-                continue
-            df = self.convert_time_to_string(df)
-            to_list = df.values.tolist()
-            self.update_average_over_time(to_list)
-            mean, sd, total = self.get_aggregations(df)
-            last_series = self.get_last_line(df)
-            day = last_series["day_of_production"]
-            time = last_series["time"]
-            params = (mean, sd, total, time, int(day), quadrant, self.round_id, self.observable_name)
-            self.update_average_over_space(params)
-        self.create_frontend_events(self.params)
+        # the windows after the one of the last event and before the one still being filled
+        _, (last_window, final_window) = label_time_of_day([last_time, final_time])
+        if last_window + 1 < final_window:
+            start, end = time_of_day_window_bounds([last_window + 1, final_window - 1])
+            return {'time_start': pd.Timestamp(start[0]).to_pydatetime(), 'time_end': pd.Timestamp(end[1]).to_pydatetime()}
+        return None
 
+    def process(self) -> None:
+        window = self.pending_window()
+        df = self.download_data(**window) if window is not None else pd.DataFrame()
+        if not df.empty:
+            self.aggregate(self.engine.prepare(df))
+        self.create_frontend_events(self.params)
 
-    def update_average_over_space(self, df: Tuple[Union[float, str]]) -> None:
+    def aggregate(self, df: pd.DataFrame) -> None:
+        df['time_of_day'], df['window'] = label_time_of_day(df['time'])
+        cells = self.engine.over_time(df, 'window')
+        start, end = time_of_day_window_bounds(cells['window'])
+        # the middle of the window, like the midpoint of the DownloadTimeofDay* queries
+        cells['time'] = start + (end - start + np.timedelta64(1, 's')) / 2
+        self.update_average_over_time(self.engine.to_rows(cells, ['value', 'time', 'x', 'y', 'z', 'round_id', 'day_of_production', 'time_of_day', 'observable_name']))
+
+        space = self.engine.over_space(cells, 'window')
+        last = cells.groupby('window')[['day_of_production', 'time_of_day']].last().reset_index()
+        space = space.merge(last, on='window')
+        space['round_id'] = self.round_id
+        space['observable_name'] = self.observable_name
+        self.update_average_over_space(self.engine.to_rows(space, ['mean', 'sd', 'total', 'time', 'day_of_production', 'time_of_day', 'round_id', 'observable_name']))
+
+    def update_average_over_space(self, df: List[Tuple[Union[float, str]]]) -> None:
         # Going to have a problem with None
         query = f"INSERT INTO {self.table_over_space} (mean, sd, total, time, day, time_of_day, round_id, observable_name) \
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE mean =VALUES(mean), sd=VALUES(sd), total=VALUES(total), time=VALUES(time)"
-        self.cursor.execute(query, df)
+        self.cursor.executemany(query, df)
         self.cnx.commit()
 
     def update_average_over_time(self, df: List[str]) -> None:
@@ -67,11 +70,15 @@ class TimeofDayEvent(InternalEventsGeneric):
 
 class TimeofDayEventAmbientConditions(TimeofDayEvent):
 
+    aggregation = 'ambient'
+
     def get_aggregations(self, df: pd.DataFrame) -> Tuple[Union[float, None]]:
         return self.get_aggregations_ambient(df)
 
 class TimeofDayEventAnomaly(TimeofDayEvent):
 
+    aggregation = 'anomaly'
+
     def get_aggregations(self, df: pd.DataFrame) -> None:
         return self.get_aggregations_anomaly(df)
         
\ No newline at end of file
@@ -0,0 +1,94 @@
+from data_processing.download.download import DownloadRoundData
+from data_processing.data_processing_events.data_processing_events import DataProcessingEvents
+from data_processing.internal_events.events import InternalEventsGeneric
+import pandas as pd
+from typing import Any, Dict
+import logging
+
+
+class WindowEvents:
+    '''
+        Aggregates the event windows of an ingest from the rows the ingest holds.
+
+        Parameters
+        ----------
+        download: reads the rows of the windows completed by the ingest.
+        data_events: the data processing events of the ingest, after the upsert.
+        latest, round, new_day, time_of_day, hourly_overview: the events of the observable.
+
+        Notes
+        --------
+        The events consumer runs every event on its own and each one downloads the round data of its window, an ingest closing
+        every window read the round data five times. Here the ingest feeds its batch to the engine once: the latest event is
+        aggregated from the rows just written and the hourly overview from the hourly accumulators the ingest updated, neither
+        reads the round data. The rounds, days and time of day windows completed by the ingest span many uploads, the batch only
+        holds their last rows, so their ranges are downloaded with one query and every event aggregates its rows of that frame.
+        An ingest then reads the round data once when it completes a window and otherwise not at all.
+        The watermarks of the events are read from the event tables, like the events consumer does, they are written by
+        whichever process ran the events last.
+
+        Returns
+        --------
+        None
+    '''
+
+    def __init__(
+                    self,
+                    download: DownloadRoundData = None,
+                    data_events: DataProcessingEvents = None,
+                    latest: InternalEventsGeneric = None,
+                    round: InternalEventsGeneric = None,
+                    new_day: InternalEventsGeneric = None,
+                    time_of_day: InternalEventsGeneric = None,
+                    hourly_overview: InternalEventsGeneric = None,
+                    logging: logging = None
+                ):
+        self.download = download
+        self.data_events = data_events
+        self.latest = latest
+        self.round = round
+        self.new_day = new_day
+        self.time_of_day = time_of_day
+        self.hourly_overview = hourly_overview
+        self.logging = logging
+
+    def process(self, batch: pd.DataFrame, **events: Dict[str, bool]) -> None:
+        '''
+            Aggregates the windows of the events triggered by an ingest and posts their frontend events.
+
+            Parameters
+            ----------
+            batch: the round data rows written by the ingest.
+            events: the events returned by check_events.
+
+            Returns
+            --------
+            None
+        '''
+        for name in ('latest', 'round', 'day'):
+            self.data_events.invalidate_watermark(name)
+        self.process_latest(batch)
+
+        triggered = [(self.round, events['is_new_round']), (self.new_day, events['is_new_day']), (self.time_of_day, events['is_new_time_of_day'])]
+        windows = [(event, event.pending_window()) for event, is_new in triggered if is_new]
+        ranges = [window for _, window in windows if window is not None]
+        df = self.latest.engine.prepare(self.download(ranges=ranges)) if ranges else None
+        for event, window in windows:
+            if window is not None:
+                rows = df[self.download.select(df, **window)].reset_index(drop=True)
+                if not rows.empty:
+                    event.aggregate(rows)
+            event.create_frontend_events(event.params)
+
+        if events['is_new_hourly_overview']:
+            self.hourly_overview.process()
+
+    def process_latest(self, batch: pd.DataFrame) -> None:
+        # the rows DownloadLatest would read back: newer than the last latest event and of a production day
+        old_time = self.data_events.get_last_updated_latest()
+        df = self.latest.engine.prepare(batch)
+        df = df[(df['time'] > pd.Timestamp(old_time)) & (df['day_of_production'] >= 0)].reset_index(drop=True)
+        if df.empty:
+            return
+        self.latest.aggregate(df, old_time)
+        self.latest.create_frontend_events(self.latest.params)
@@ -3,6 +3,8 @@ from typing import List, Tuple, Union, Callable, Any, Dict
 from dataclasses import dataclass
 import pandas as pd
 from data_processing.custom_exceptions.exceptions import InvalidRound
+from data_processing.production_cycle_details.round_intervals import RoundIntervals
+from data_processing.cache.metadata import METADATA_CACHE
 from datetime import datetime, timedelta
 import mysql.connector as con
 
@@ -39,7 +41,7 @@ class PCDetails(ProductionCycleDetails):
 		self.observable_name = observable_name
 		self.round_id = round_id
 		self.round_table = f"round_data_{observable_name}"
-		self.first_day = self.get_first_day()
+		self.first_day = METADATA_CACHE.get_or_load(('first_day', round_id), self.get_first_day)
 
 	def get_first_day(self) -> int:
 		query = f"SELECT `from` FROM round WHERE id='{self.round_id}'"
@@ -69,7 +71,7 @@ class PCDetails(ProductionCycleDetails):
 		self.cursor.execute(query)
 		return self.cursor.fetchone()
 
-	def get_round_number(self, start_time: str, end_time: str) -> Tuple[bool, Union[int, Dict[str, List[int]]]]:
+	def get_round_number(self, start_time: str, end_time: str) -> Tuple[bool, Union[int, RoundIntervals]]:
 		'''
 			This function returns the current round number for uploaded data
 
@@ -85,7 +87,7 @@ class PCDetails(ProductionCycleDetails):
 
 			Returns
 			--------
-			Returns a scalar if the round counters of the first time stamp is the same as that of the second one else it creates a class obj
+			Returns a scalar if the round counters of the first time stamp is the same as that of the second one else a RoundIntervals index over the round counter rows
 		'''
 		# handle where round is empty and invalid
 		start = self.get_round_time(start_time)
@@ -103,68 +105,15 @@ class PCDetails(ProductionCycleDetails):
 			else:
 				return True, end[1]
 
-		query = f"Select round_number, is_valid_round, time from round_counter where round_id='{ self.round_id }'  and time >='{ start[0] }' and time <='{ end[0] }'"
+		query = f"Select round_number, is_valid_round, time from round_counter where round_id='{ self.round_id }'  and time >='{ start[0] }' and time <='{ end[0] }' order by time asc"
 		round_number = pd.read_sql(query, con=self.cnx)
-		d = round_number.iloc[-1, :]
-		last = pd.DataFrame([{ 'round_number': d['round_number'], 'is_valid_round': d['is_valid_round'], 'time': end_time + timedelta(minutes=1)}])
-		round_number = pd.concat([round_number, last]).values.tolist()
-		
-		return False, self.create_dict(round_number)
-
-	def create_dict(self, df: pd.DataFrame) -> Dict[datetime, List[int]]:
-		'''
-			This function creates a dictionary object in class scope
-
-			Returns None
-
-			Parameters
-			----------
-			df: a data frame object with the round counter table within specific time range and the last data value appended to it.
-
-			Notes
-			----------
-			The idea was to prevent querying the db for each line of code in uploaded file to obtain the round number.
-			Another alternative solution would have been to use pandas and query the like I would in the db for each time stamp entry.
-			I have implemented it this way because dictionary search is O(1) and even though this will lead to a bit memory inefficiency
-
-			Returns
-			--------
-			Returns a None
-		'''
-		obj = {}
-
-		for i in range(0, len(df) - 1):
-			res = self.between_minutes( df[i][2], df[i+1][2], df[i][0], df[i][1])
-			obj.update(res)
-		return obj
-
-	def between_minutes(self, start: datetime, stop: datetime, round_number: int, is_valid: int) -> Dict[datetime, List[int]]:
-		'''
-			This function creates all the minutes between two specified time stamps and creates a dictionary comprehension that comprises
-			the the timestamps for all minutes created as key and a list value that contains the round number and whether the round is valid or not
-
-			Returns the round number
-
-			Parameters
-			----------
-			start: the start time.
-			stop: the stop time.
-			round number: the round number corresponding to start time.
-			is valid: round validity associated with start time.
-
-			Returns
-			--------
-			Returns a dictionary with key as in between mintues and value as list of round number and validity
-		'''
-		start_time = start.replace(second=0)
-		end_time = stop.replace(second=0)
-
-		diff = end_time - start_time
-		minutes = int(diff.total_seconds() / 60)
-		dictionary = { start_time + timedelta(minutes=i) : [ round_number, is_valid] for i in range( minutes + 1) }
-		return dictionary
+		return False, RoundIntervals(round_number['time'], round_number['round_number'], round_number['is_valid_round'])
 
 	def is_valid_observable(self, robot_id: str, observable_id) -> bool:
+		# Only granted permissions are cached so a newly granted observable isn't refused until the entry expires
+		key = ('robot_observable', robot_id, observable_id)
+		if key in METADATA_CACHE:
+			return True
 		query = f"select observable_id from robot_observable where observable_id='{observable_id}' and robot_id='{robot_id}' limit 1"
 		self.cursor.execute(query)
 		observable = self.cursor.fetchone()
@@ -172,4 +121,5 @@ class PCDetails(ProductionCycleDetails):
 		if observable is None:
 			return False
 		else:
+			METADATA_CACHE.set(key, True)
 			return True
\ No newline at end of file
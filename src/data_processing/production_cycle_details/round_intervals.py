@@ -0,0 +1,54 @@
+from typing import List, Tuple, Union
+import pandas as pd
+import numpy as np
+
+
+class RoundIntervals:
+    '''
+        Sorted index over the rows of the round counter table.
+
+        Notes
+        --------
+        This replaces the dictionary with one key per minute between round counter rows. A timestamp belongs to the last round
+        counter row that started at or before its minute, so the minutes of the round counter rows are kept sorted and the whole
+        timestamp column is looked up at once with np.searchsorted. Like the dictionary it works at minute granularity, seconds
+        are ignored on both sides.
+
+        References
+        -----------
+        https://numpy.org/doc/stable/reference/generated/numpy.searchsorted.html
+    '''
+
+    def __init__(self, times: Union[pd.Series, List], round_numbers: Union[pd.Series, List], is_valid: Union[pd.Series, List]):
+        starts = self.to_minutes(times)
+        order = np.argsort(starts, kind='stable')
+        self.starts = starts[order]
+        self.round_numbers = np.asarray(round_numbers)[order]
+        self.is_valid = np.asarray(is_valid)[order]
+
+    @staticmethod
+    def to_minutes(times: Union[pd.Series, List]) -> np.ndarray:
+        return np.asarray(pd.DatetimeIndex(pd.to_datetime(times)).floor('min'), dtype='datetime64[ns]')
+
+    def assign(self, timestamps: Union[pd.Series, List]) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+            Returns the round number and validity of each timestamp.
+
+            Parameters
+            ----------
+            timestamps: the timestamps of the uploaded data.
+
+            Notes
+            --------
+            Timestamps before the first round counter row don't belong to any round and are returned as invalid.
+
+            Returns
+            --------
+            A tuple of two arrays, the round numbers and the validity flags (1 or 0)
+        '''
+        index = np.searchsorted(self.starts, self.to_minutes(timestamps), side='right') - 1
+        before_first = index < 0
+        index[before_first] = 0
+        round_numbers = self.round_numbers[index]
+        is_valid = np.where(before_first, 0, self.is_valid[index])
+        return round_numbers, is_valid
@@ -0,0 +1,56 @@
+import pytest
+
+
+
+from data_processing.internal_events.aggregation_engine import AggregationEngine
+import pandas as pd
+import numpy as np
+
+
+
+
+def getRows():
+    return pd.DataFrame({
+        'value': [1.0, 3.0, 2.0, 6.0, 5.0],
+        'time': ['2021-01-01 08:00:00', '2021-01-01 09:00:00', '2021-01-01 10:00:00', '2021-01-02 07:00:00', '2021-01-02 08:00:00'],
+        'x': [1, 1, 2, 1, -1],
+        'y': [1, 1, 1, 1, -1],
+        'z': [0, 0, 0, 0, 0],
+        'round_id': ['r'] * 5,
+        'day_of_production': [0, 0, 0, 1, 1],
+        'observable_name': ['temperature'] * 5,
+    })
+
+
+def testOverSpaceMatchesPandasPerWindow():
+    engine = AggregationEngine('ambient')
+    df = engine.prepare(getRows())
+    space = engine.over_space(df, 'day_of_production')
+    assert space['day_of_production'].tolist() == [0, 1]
+    assert space['mean'].tolist() == [2.0, 5.5]
+    assert np.isclose(space['sd'][0], np.std([1.0, 3.0, 2.0], ddof=1))
+    assert space['total'].tolist() == [None, None]
+    assert space['time'].tolist() == [pd.Timestamp('2021-01-01 10:00:00'), pd.Timestamp('2021-01-02 08:00:00')]
+
+
+def testOverSpaceAnomalyKeepsTotal():
+    engine = AggregationEngine('anomaly')
+    space = engine.over_space(engine.prepare(getRows()), ddof=0, decimals=2).iloc[0]
+    mean, sd, total = engine.get_aggregations(space)
+    assert mean is None
+    assert total == 17.0
+    assert sd == round(np.std([1.0, 3.0, 2.0, 6.0, 5.0]), 2)
+
+
+def testOverTimeOneValuePerCell():
+    df = AggregationEngine('ambient').prepare(getRows())
+    cells = AggregationEngine('ambient').over_time(df, 'day_of_production')
+    assert cells[['day_of_production', 'x', 'y', 'value']].values.tolist() == [[0, 1, 1, 2.0], [0, 2, 1, 2.0], [1, 1, 1, 6.0]]
+    cells = AggregationEngine('anomaly').over_time(df, 'day_of_production')
+    assert cells['value'].tolist() == [3.0, 2.0, 6.0]
+
+
+def testToRowsFormatsTimeAndNone():
+    engine = AggregationEngine('ambient')
+    space = engine.over_space(engine.prepare(getRows()))
+    assert engine.to_rows(space, ['mean', 'total', 'time']) == [[3.4, None, '2021-01-02 08:00:00']]
@@ -0,0 +1,35 @@
+import pytest
+
+
+
+from data_processing.cache.cache import TTLCache
+from data_processing.cache import cache
+
+
+
+
+def testLeastRecentlyUsedIsEvicted():
+    ttl_cache = TTLCache(maxsize=2, ttl=60)
+    ttl_cache.set('a', 1)
+    ttl_cache.set('b', 2)
+    ttl_cache.get('a')
+    ttl_cache.set('c', 3)
+
+    assert ttl_cache.get('a') == 1
+    assert 'b' not in ttl_cache
+    assert ttl_cache.get('c') == 3
+
+
+def testExpiredEntryIsReloaded(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache, 'monotonic', lambda: now[0])
+    ttl_cache = TTLCache(maxsize=10, ttl=5)
+    loads = []
+    load = lambda: loads.append(1) or len(loads)
+
+    assert ttl_cache.get_or_load('a', load) == 1
+    assert ttl_cache.get_or_load('a', load) == 1
+    now[0] += 6
+    assert ttl_cache.get_or_load('a', load) == 2
+    ttl_cache.invalidate('a')
+    assert ttl_cache.get_or_load('a', load) == 3
@@ -0,0 +1,47 @@
+import pytest
+
+
+
+from data_processing.data_cleaning.cell_aggregation import CellAggregates, RunningMoments
+from datetime import datetime
+import pandas as pd
+import numpy as np
+
+
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['x', 'y', 'z', 'round_number', 'value', 'time'])
+
+
+def testChunksGiveSameResultAsOneBatch():
+    rows = [
+        [1, 2, 0, 1, 10.0, datetime(2021, 11, 1, 9, 0, 0)],
+        [1, 2, 0, 1, 20.0, datetime(2021, 11, 1, 9, 0, 10)],
+        [3, 4, 0, 1, 5.0, datetime(2021, 11, 1, 9, 0, 30)],
+        [1, 2, 0, 1, 30.0, datetime(2021, 11, 1, 9, 0, 20)],
+    ]
+    aggregates = CellAggregates()
+    aggregates.update(frame(rows[:2]))
+    aggregates.update(frame(rows[2:]))
+
+    df = aggregates.to_frame('mean').set_index(['x', 'y'])
+    assert len(aggregates) == 2
+    assert df.loc[(1, 2), 'value'] == 20.0
+    assert df.loc[(1, 2), 'time'] == datetime(2021, 11, 1, 9, 0, 10)
+    assert df.loc[(3, 4), 'value'] == 5.0
+
+    df = aggregates.to_frame('sum').set_index(['x', 'y'])
+    assert df.loc[(1, 2), 'value'] == 60.0
+    assert df.loc[(1, 2), 'maximum'] == 30.0
+
+
+def testRunningMomentsMatchPandas():
+    values = pd.Series(np.linspace(20, 25, 101))
+    moments = RunningMoments()
+    moments.update(values[:30])
+    moments.update(values[30:])
+
+    assert moments.count == 101
+    assert moments.std() == pytest.approx(values.std())
+    assert np.isnan(RunningMoments().update([1.0]).std())
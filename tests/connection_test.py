@@ -0,0 +1,64 @@
+import pytest
+
+
+
+connector = pytest.importorskip("mysql.connector")
+from data_processing.db_connection.connection import DbConnection
+
+
+
+
+class RawConnection:
+
+    def __init__(self):
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+
+class PooledConnection:
+
+    def __init__(self, raw):
+        self._cnx = raw
+        self.closed = False
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        raise connector.Error("server has gone away")
+
+    def close(self):
+        self.closed = True
+
+
+class Pool:
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.added = []
+
+    def get_connection(self):
+        self.borrowed = PooledConnection(self.raw)
+        return self.borrowed
+
+    def add_connection(self, cnx=None):
+        self.added.append(cnx)
+
+
+def testBrokenPooledConnectionIsDiscarded(monkeypatch):
+    raw = RawConnection()
+    pool = Pool(raw)
+    fresh = object()
+    monkeypatch.setattr(DbConnection, 'pools', {False: pool})
+    monkeypatch.setattr(DbConnection, 'connect', lambda self: fresh)
+    assert DbConnection().connect_to_db() is fresh
+    # the socket is closed and the slot given back without the session reset of close
+    assert not raw.connected
+    assert pool.added == [raw]
+    assert not pool.borrowed.closed and pool.borrowed._cnx is None
+
+
+def testLocalInfileIsLimitedToTheStagingDir():
+    assert 'allow_local_infile' not in DbConnection().get_config()
+    assert 'allow_local_infile_in_path' not in DbConnection().get_config()
+    assert 'allow_local_infile' not in DbConnection(local_infile=True).get_config()
+    assert 'allow_local_infile_in_path' in DbConnection(local_infile=True).get_config()
@@ -2,3 +2,33 @@ import pytest
 
 
 
+from data_processing.download.download import DownloadRoundData
+import pandas as pd
+from datetime import datetime
+
+
+
+
+def getRows():
+    return pd.DataFrame({
+        'value': [1.0, 2.0, 3.0, 4.0, 5.0],
+        'time': ['2021-01-01 08:00:00', '2021-01-01 12:00:00', '2021-01-02 08:00:00', '2021-01-02 12:00:00', '2021-01-03 08:00:00'],
+        'round_number': [1, 1, 2, 2, 3],
+        'day_of_production': [0, 0, 1, 1, 2],
+    })
+
+
+def testSelectMatchesTheRangeCondition():
+    download = DownloadRoundData(None, 'r', 'temperature')
+    df = getRows()
+    assert download.select(df, round_start=1, round_end=3).tolist() == [True, True, True, True, False]
+    assert download.select(df, day_start=1, day_end=2).tolist() == [False, False, True, True, False]
+    assert download.select(df, time=datetime(2021, 1, 2, 8)).tolist() == [False, False, False, True, True]
+    assert download.select(df, time_start='2021-01-01 12:00:00', time_end='2021-01-02 08:00:00').tolist() == [False, True, True, False, False]
+    assert download.select(df).all()
+
+
+def testRangeCondition():
+    download = DownloadRoundData(None, 'r', 'temperature')
+    assert download.range_condition(round_start=1, round_end=3) == "1 = 1 and round_number >= 1 and round_number < 3"
+    assert download.range_condition() == "1 = 1"
@@ -0,0 +1,47 @@
+import pytest
+
+
+
+from data_processing.frontend.downsampling import downsample, lttb, minmax, display_series
+import numpy as np
+
+
+
+
+def getSeries(n=5000):
+    rng = np.random.default_rng(0)
+    values = np.sin(np.linspace(0, 20, n)) + rng.normal(0, 0.05, n)
+    values[n // 4] = 10.0
+    return values
+
+
+def testShortSeriesAreKept():
+    values = np.array([1.0, np.nan, 3.0])
+    np.testing.assert_array_equal(downsample(values, 10, 'lttb'), [0, 1, 2])
+    np.testing.assert_array_equal(downsample(getSeries(50), 10, 'none'), np.arange(50))
+
+
+def testLttbKeepsEndsAndPeaks():
+    values = getSeries()
+    kept = lttb(values, 200)
+    assert len(kept) == 200
+    assert kept[0] == 0 and kept[-1] == len(values) - 1
+    assert np.all(np.diff(kept) > 0)
+    assert len(values) // 4 in kept
+
+
+def testMinmaxKeepsBucketExtremes():
+    values = getSeries()
+    kept = minmax(values, 200)
+    assert len(kept) <= 200
+    assert kept[0] == 0 and kept[-1] == len(values) - 1
+    assert values[kept].max() == values.max() and values[kept].min() == values.min()
+
+
+def testDisplaySeriesDropsNaN():
+    values = getSeries(300)
+    values[10:20] = np.nan
+    dates = [str(i) for i in range(300)]
+    display, display_dates = display_series(values, dates, 50, 'lttb')
+    assert len(display) == 50 and not np.isnan(display).any()
+    assert display_dates == [dates[int(np.flatnonzero(values == v)[0])] for v in display]
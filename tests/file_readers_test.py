@@ -0,0 +1,53 @@
+import pytest
+
+
+
+from data_processing.data_cleaning.file_readers import read_sensor_file, sniff_format, FileFormat
+from datetime import datetime
+
+
+
+
+def testCsvFileIsParsedAndSwapped(tmp_path):
+    file = tmp_path / "temperature.csv"
+    file.write_text('x , y, z ,value, timestamp\n1 , 2, 0 , 21.5, "2021-11-01T09:00:01Z"\n3, 4 ,0,22.25 ,"2021-11-01T09:00:05Z" \n')
+
+    df = read_sensor_file(str(file))
+
+    assert list(df['x']) == [2, 4]
+    assert list(df['y']) == [1, 3]
+    assert list(df['data']) == [21.5, 22.25]
+    assert df['timestamp'].iloc[0] == datetime(2021, 11, 1, 9, 0, 1)
+    assert df['timestamp'].iloc[1] == datetime(2021, 11, 1, 9, 0, 5)
+    assert 'value' not in df.columns
+
+
+def testLegacyFileIsSniffed(tmp_path):
+    file = tmp_path / "temperature.json"
+    file.write_text('{"coordinates": [1, 2, 0], "timestamp": "2021-11-01T09:00:01Z", "data": 21.5, "unit": "C"}\n{"coordinates": [3, 4, 0], "timestamp": "2021-11-01T09:00:05Z", "data": 22.25, "unit": "C"}\n')
+
+    df = read_sensor_file(str(file))
+
+    assert sniff_format(file.read_text()) == FileFormat.LEGACY_JSON
+    assert list(df['x']) == [1, 3]
+    assert list(df['y']) == [2, 4]
+    assert list(df['data']) == [21.5, 22.25]
+    assert df['timestamp'].iloc[1] == datetime(2021, 11, 1, 9, 0, 5)
+
+
+def testCsvWithMissingColumnRaises(tmp_path):
+    file = tmp_path / "temperature.csv"
+    file.write_text('x, y, value, timestamp\n1, 2, 21.5, "2021-11-01T09:00:01Z"\n')
+
+    with pytest.raises(KeyError):
+        read_sensor_file(str(file))
+
+
+def testCsvIsParsedFromMemoryview():
+    payload = 'x, y, z, value, timestamp\n1, 2, 0, 21.5, "2021-11-01T09:00:01Z"\n'.encode()
+
+    df = read_sensor_file(memoryview(payload))
+
+    assert list(df['x']) == [2]
+    assert list(df['data']) == [21.5]
+    assert df['timestamp'].iloc[0] == datetime(2021, 11, 1, 9, 0, 1)
@@ -0,0 +1,82 @@
+import pytest
+
+
+
+from data_processing.frontend.encoder import encode, encode_array, get_decimals, encode_grids, QUANTIZED_NAN, QUANTIZED_LIMIT
+import numpy as np
+import base64
+import zlib
+import json
+
+
+
+
+def testEncodeArrayMatchesJsonDumps():
+    grid = np.random.default_rng(0).normal(20, 3, (4, 5, 3))
+    grid[grid < 20] = np.nan
+    expected = json.loads(json.dumps(np.round(grid, 3).tolist()).replace('NaN', 'null'))
+    assert json.loads(encode_array(grid, 3)) == expected
+
+
+def testEncodeKeepsShapes():
+    assert encode_array(np.array([[1.0], [2.0]]), 2) == '[[1.0],[2.0]]'
+    assert encode_array(np.array([1.26, np.nan]), 1) == '[1.3,null]'
+    assert encode_array(np.zeros((2, 0)), 2) == '[[],[]]'
+
+
+def testEncodePayload():
+    payload = {'data': {'Round 1': np.array([[1.23456, np.nan]]), 'Round 2': None}, 'date': [np.int64(1), 'a']}
+    assert encode(payload, 2) == '{"data":{"Round 1":[[1.23,null]],"Round 2":null},"date":[1,"a"]}'
+    assert encode([float('nan'), 0.123456], 3) == '[null,0.123]'
+
+
+def testGetDecimals():
+    assert get_decimals(None) == 3
+    assert get_decimals(0.01) == 2
+    assert get_decimals(1) == 1
+    assert get_decimals(0.5) == 0
+
+
+def getGrids():
+    grids = np.round(np.random.default_rng(1).normal(20, 3, (3, 4, 5)), 3)
+    grids[grids < 19] = np.nan
+    return list(grids)
+
+
+def unpack(payload, dtype, shape=(4, 5)):
+    return np.frombuffer(zlib.decompress(base64.b64decode(payload)), dtype=dtype).reshape(shape)
+
+
+def testSparseAndFloat32Decode():
+    grids = getGrids()
+    for grid, sparse in zip(grids, encode_grids(grids, 'sparse')):
+        decoded = np.full(grid.size, np.nan)
+        decoded[sparse['index']] = sparse['value']
+        np.testing.assert_array_equal(decoded.reshape(grid.shape), grid)
+    for grid, payload in zip(grids, encode_grids(grids, 'float32')):
+        np.testing.assert_allclose(unpack(payload, '<f4'), grid, rtol=1e-6)
+
+
+def testDeltaDecodesWithThePreviousGrid():
+    grids = getGrids()
+    previous = None
+    for grid, payload in zip(grids, encode_grids(grids, 'delta', 3)):
+        delta = unpack(payload, '<i4').astype(np.int64)
+        quantized = np.where(delta == QUANTIZED_NAN, np.nan, delta).astype(np.float64)
+        if previous is not None:
+            quantized = np.where(np.isnan(previous) | np.isnan(quantized), quantized, previous + quantized)
+        np.testing.assert_allclose(quantized / 1000, grid)
+        previous = quantized
+
+
+def testDeltaRejectsValuesOutOfInt32():
+    with pytest.raises(OverflowError):
+        encode_grids([np.array([[30000.5, np.nan]])], 'delta', 5)
+    with pytest.raises(OverflowError):
+        encode_grids([np.array([[-QUANTIZED_LIMIT - 1.0]])], 'delta', 0)
+    with pytest.raises(OverflowError):
+        encode_grids([np.array([[QUANTIZED_LIMIT]]), np.array([[-QUANTIZED_LIMIT]])], 'delta', 0)
+    with pytest.raises(OverflowError):
+        encode_grids([np.array([[np.inf]])], 'delta', 3)
+    payload = encode_grids([np.array([[QUANTIZED_LIMIT, -QUANTIZED_LIMIT]], dtype=np.float64)], 'delta', 0)[0]
+    assert unpack(payload, '<i4', (1, 2)).tolist() == [[QUANTIZED_LIMIT, -QUANTIZED_LIMIT]]
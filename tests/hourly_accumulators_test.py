@@ -0,0 +1,92 @@
+import pytest
+
+
+
+from data_processing.data_cleaning.hourly_accumulators import hourly_deltas, hourly_statistics, period_bounds, accumulator_lock, rebuild_hourly_accumulators
+import pandas as pd
+import numpy as np
+
+
+
+
+def getRows(values, times):
+    return pd.DataFrame({'value': values, 'time': times, 'round_number': 1, 'day_of_production': 0})
+
+
+def testDeltasMoveAReplacedRowToItsNewHour():
+    old = getRows([2.0], ['2021-01-01 08:59:00'])
+    new = getRows([4.0, 1.0], ['2021-01-01 09:01:00', '2021-01-01 09:30:00'])
+    deltas = hourly_deltas(new, old).set_index('time')
+    assert deltas.loc['2021-01-01 08:00:00', ['count', 'total', 'sumsq']].tolist() == [-1.0, -2.0, -4.0]
+    assert deltas.loc['2021-01-01 09:00:00', ['count', 'total', 'sumsq']].tolist() == [2.0, 5.0, 17.0]
+
+
+def testDeltasDropUnchangedHoursAndRowsBeforeProduction():
+    old = getRows([2.0], ['2021-01-01 08:10:00'])
+    new = getRows([2.0], ['2021-01-01 08:20:00'])
+    early = getRows([5.0], ['2021-01-01 07:00:00']).assign(day_of_production=-1)
+    assert hourly_deltas(pd.concat([new, early]), old).empty
+
+
+def testStatisticsMatchMysqlAggregates():
+    values = np.array([1.0, 2.5, 4.0, 7.25])
+    acc = pd.DataFrame({'count': [len(values)], 'total': [values.sum()], 'sumsq': [(values ** 2).sum()]})
+    ambient = hourly_statistics(acc, 'ambient').iloc[0]
+    assert ambient['mean'] == round(values.mean(), 2)
+    assert ambient['sd'] == round(values.std(ddof=0), 2)
+    assert ambient['total'] is None
+    anomaly = hourly_statistics(acc, 'anomaly').iloc[0]
+    assert anomaly['sd'] is None
+    assert anomaly['total'] == round(values.sum(), 2)
+
+
+def testPeriodBoundsStartWeeksOnSunday():
+    times = pd.Series(pd.to_datetime(['2021-11-03 10:00:00', '2021-11-07 01:00:00']))
+    assert period_bounds(times, 'day') == (pd.Timestamp('2021-11-03'), pd.Timestamp('2021-11-08'))
+    assert period_bounds(times, 'week') == (pd.Timestamp('2021-10-31'), pd.Timestamp('2021-11-14'))
+    assert period_bounds(times, 'month') == (pd.Timestamp('2021-11-01'), pd.Timestamp('2021-12-01'))
+
+
+class LockConnection:
+
+    def __init__(self, acquired):
+        self.acquired = acquired
+        self.queries = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        self.queries.append((query, params))
+
+    def fetchone(self):
+        return (self.acquired,)
+
+    def commit(self):
+        pass
+
+
+def testLockIsReleasedAfterAnError():
+    cnx = LockConnection(1)
+    with pytest.raises(ValueError):
+        with accumulator_lock(cnx, 'temperature', 'abcdefg'):
+            raise ValueError()
+    (get, (name, _)), (release, (released,)) = cnx.queries
+    assert get.startswith('SELECT GET_LOCK') and release.startswith('SELECT RELEASE_LOCK')
+    assert name == released and len(name) <= 64
+
+
+def testLockTimeoutRaises():
+    cnx = LockConnection(0)
+    with pytest.raises(TimeoutError):
+        with accumulator_lock(cnx, 'temperature', 'abcdefg'):
+            pass
+    assert len(cnx.queries) == 1
+
+
+def testOnlyAFullRebuildIsRecorded():
+    for start, end, recorded in ((None, None, True), ('2021-11-01 09:00:00', '2021-11-01 10:00:00', False)):
+        cnx = LockConnection(1)
+        rebuild_hourly_accumulators(cnx, 'temperature', 'abcdefg', start, end)
+        built = [params for query, params in cnx.queries if 'event_hourly_accumulator_built' in query]
+        assert built == ([('abcdefg', 'temperature')] if recorded else [])
@@ -0,0 +1,76 @@
+import pytest
+
+
+
+from data_processing.data_processing_events.data_processing_events import DPEvents
+from datetime import datetime
+
+
+
+
+def getRanges(rows):
+    return DPEvents.__new__(DPEvents).get_invalid_ranges(rows)
+
+
+def testInvalidRowsAroundTheValidOne():
+    rows = [
+        (datetime(2021, 11, 1, 9, 0), 0),
+        (datetime(2021, 11, 1, 9, 5), 0),
+        (datetime(2021, 11, 1, 9, 10), 1),
+        (datetime(2021, 11, 1, 9, 40), 0),
+        (datetime(2021, 11, 1, 9, 50), 0),
+    ]
+
+    assert getRanges(rows) == [(datetime(2021, 11, 1, 9, 0), datetime(2021, 11, 1, 9, 10)), (datetime(2021, 11, 1, 9, 40), None)]
+
+
+def testOnlyInvalidRows():
+    rows = [(datetime(2021, 11, 1, 9, 0), 0), (datetime(2021, 11, 1, 9, 5), 0)]
+
+    assert getRanges(rows) == [(datetime(2021, 11, 1, 9, 0), None)]
+
+
+class RangeCursor:
+
+    def __init__(self, stored):
+        self.stored = stored
+        self.rowcount = 0
+
+    def execute(self, query, args=None):
+        if query.startswith('Select'):
+            return
+        key = args[:4]
+        self.rowcount = 0 if key in self.stored else 1
+        self.stored.add(key)
+
+    def fetchall(self):
+        return [(datetime(2021, 11, 1, 9, 0), 0), (datetime(2021, 11, 1, 9, 10), 1), (datetime(2021, 11, 1, 9, 40), 0)]
+
+
+class RangeConnection:
+
+    def __init__(self):
+        self.stored = set()
+
+    def cursor(self):
+        return RangeCursor(self.stored)
+
+    def commit(self):
+        pass
+
+
+def testRoundIsInvalidatedOnce(monkeypatch):
+    import data_processing.data_processing_events.data_processing_events as events
+    rebuilt, alerts = [], []
+    monkeypatch.setattr(events, 'rebuild_hourly_accumulators', lambda cnx, observable_name, round_id, start, end: rebuilt.append(start))
+    monkeypatch.setattr(events, 'trigger_event', lambda event, params: alerts.append(params['ranges']))
+    cnx = RangeConnection()
+    for _ in range(2):
+        dp_events = DPEvents.__new__(DPEvents)
+        dp_events.cnx, dp_events.cursor, dp_events.state_cache = cnx, cnx.cursor(), None
+        dp_events.round_id, dp_events.observable_name = 'r', 'temperature'
+        dp_events.invalidate_round(4)
+
+    assert len(cnx.stored) == 2
+    assert rebuilt == [datetime(2021, 11, 1, 9, 0), datetime(2021, 11, 1, 9, 40)]
+    assert len(alerts) == 1
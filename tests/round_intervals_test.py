@@ -0,0 +1,34 @@
+import pytest
+
+
+
+from data_processing.production_cycle_details.round_intervals import RoundIntervals
+from datetime import datetime
+
+
+
+
+def testTimestampsGetTheRoundThatStartedBeforeThem():
+    times = [datetime(2021, 11, 1, 9, 0, 30), datetime(2021, 11, 1, 9, 10, 45), datetime(2021, 11, 1, 9, 20, 0)]
+    intervals = RoundIntervals(times, [4, 5, 5], [1, 0, 1])
+
+    timestamps = [
+        datetime(2021, 11, 1, 9, 0, 10),
+        datetime(2021, 11, 1, 9, 9, 59),
+        datetime(2021, 11, 1, 9, 10, 5),
+        datetime(2021, 11, 1, 9, 19, 59),
+        datetime(2021, 11, 1, 9, 25, 0),
+    ]
+    round_numbers, is_valid = intervals.assign(timestamps)
+
+    # seconds are ignored so 9:00:10 is in the round that started at 9:00:30 and 9:10:05 in the one that started at 9:10:45
+    assert list(round_numbers) == [4, 4, 5, 5, 5]
+    assert list(is_valid) == [1, 1, 0, 0, 1]
+
+
+def testTimestampsBeforeTheFirstRoundAreInvalid():
+    intervals = RoundIntervals([datetime(2021, 11, 1, 9, 0, 0)], [4], [1])
+
+    round_numbers, is_valid = intervals.assign([datetime(2021, 11, 1, 8, 59, 0)])
+
+    assert list(is_valid) == [0]
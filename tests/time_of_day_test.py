@@ -1,5 +1,7 @@
-from data_processing.data_processing_events.data_processing_events import TimeofDayComputation, TimeofDayPeriod, TimeofDay
+from data_processing.data_processing_events.data_processing_events import TimeofDayComputation, TimeofDayPeriod, TimeofDay, label_time_of_day, time_of_day_window_bounds
 from datetime import datetime
+import pandas as pd
+import numpy as np
 
 
 
@@ -52,6 +54,20 @@ def testNumberofLoopsAndEndResult():
     assert x ==  datetime(2021, 11, 2, 8, 0)
     assert y ==  datetime(2021, 11, 2, 11, 59, 59)
     assert t.get_current_quadrant() ==  TimeofDay.MORNING
-    
-    
 
+
+
+def testLabelTimeofDayMatchesQuadrants():
+    times = pd.to_datetime(['2021-11-01 07:59:59', '2021-11-01 08:00:00', '2021-11-01 12:00:00', '2021-11-01 19:59:59', '2021-11-01 20:00:00', '2021-11-02 03:00:00'])
+    quadrants, windows = label_time_of_day(times)
+    assert quadrants.tolist() == [TimeofDay.NIGHT.value, TimeofDay.MORNING.value, TimeofDay.AFTERNOON.value, TimeofDay.EVENING.value, TimeofDay.NIGHT.value, TimeofDay.NIGHT.value]
+    assert (windows - windows[0]).tolist() == [0, 1, 2, 3, 4, 4]
+
+
+def testWindowBoundsMatchTimeofDayComputation():
+    t = TimeofDayComputation(datetime(2021, 11, 1, 9, 0, 1), TimeofDay.MORNING, datetime(2021, 11, 2, 13, 0, 1), TimeofDay.AFTERNOON)
+    _, windows = label_time_of_day([datetime(2021, 11, 1, 9, 0, 1)])
+    for i, (x, y) in enumerate(t, start=1):
+        start, end = time_of_day_window_bounds(windows + i)
+        assert start[0] == np.datetime64(x)
+        assert end[0] == np.datetime64(y)